@@ -0,0 +1,66 @@
+"""
+ベンチマーク用の再現可能な和音コーパス生成器。
+同じ引数（seed を含む）からは常に同じボイシング列が得られる。
+"""
+import random
+from typing import Iterator, List, Sequence
+from models.note import Note
+from dictionaries.chord_dict import CHORD_DICT
+from utils.interval_calc import add_interval, interval_semitone
+
+# 移調に使うルートの綴り（幹音 × ♭/♮/♯ の21通り）
+ROOT_SPELLINGS = [(step, alter) for step in "CDEFGAB" for alter in (-1, 0, 1)]
+
+def random_voicings(count: int, note_counts: Sequence[int] = (3, 4, 5, 6, 7, 8), max_spread: int = 24,
+                    spelling: str = "default", seed: int = 0) -> List[List[Note]]:
+    """
+    ランダムなボイシングを count 個作る。
+    note_counts から音数を選び、最低音から max_spread 半音以内に音を置く。
+    spelling: "default"（DEFAULT_SPELLING で綴る）/ "random"（♭・♯・ダブル記号を混ぜる）
+    """
+    rng = random.Random(seed)
+    voicings = []
+    for _ in range(count):
+        n = rng.choice(note_counts)
+        bass = rng.randint(36, 60)
+        pitches = [bass] + [bass + rng.randint(1, max_spread) for _ in range(n - 1)]
+        notes = []
+        for midi_number in pitches:
+            if spelling == "random":
+                alter = rng.choice((0, 0, 1, -1, 1, -1, 2, -2))
+                while (midi_number - alter) % 12 not in Note.INDEX_TO_SEMITONE:
+                    alter = rng.choice((0, 1, -1))
+                notes.append(Note.from_midi(midi_number, alter))
+            else:
+                notes.append(Note.from_midi(midi_number))
+        rng.shuffle(notes)
+        voicings.append(notes)
+    return voicings
+
+def _close_position(root: Note, intervals) -> List[Note]:
+    """ルートから辞書の音程を積んだ密集配置（複合音程はそのまま1オクターブ上に置く）"""
+    ordered = sorted(intervals, key=lambda i: (int(i[1:]) >= 9, interval_semitone(i)))
+    return sorted((add_interval(root, i) for i in ordered), key=lambda n: n.absolute_semitone)
+
+def dictionary_voicings(octave: int = 3) -> Iterator[List[Note]]:
+    """CHORD_DICT の全コードを、21通りのルートの綴り × 全転回形で順に返す"""
+    for intervals in CHORD_DICT:
+        for step, alter in ROOT_SPELLINGS:
+            close = _close_position(Note(step, alter, octave), intervals)
+            for inversion in range(len(close)):
+                # 下から inversion 個の音を1オクターブ上げる
+                voicing = [Note.from_index(n.step_index, n.alter, n.octave + 1) for n in close[:inversion]]
+                yield close[inversion:] + voicing
+
+def build_suite(name: str, size: int, seed: int) -> List[List[Note]]:
+    if name == "dictionary":
+        return list(dictionary_voicings())
+    if name == "random":
+        return random_voicings(size, seed=seed)
+    if name == "random-spelled":
+        return random_voicings(size, spelling="random", seed=seed)
+    if name == "dense":
+        return random_voicings(size, note_counts=(7, 8), max_spread=36, seed=seed)
+    raise ValueError(f"Unknown suite: '{name}'")
+
+SUITES = ["dictionary", "random", "random-spelled", "dense"]
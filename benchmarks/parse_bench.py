@@ -0,0 +1,92 @@
+"""
+音名リストのパーサーのベンチマーク。リポジトリのルートで実行する:
+
+    python -m benchmarks.parse_bench              # 正規表現版（以前の実装）と比較
+    python -m benchmarks.parse_bench --size 50000
+
+同じ入力を両方のパーサーに通し、結果が一致することも確かめる。
+"""
+import argparse
+import random
+import re
+import time
+from typing import List, Optional
+from models.note import Note, parse_notes, parse_note_tuples
+
+def regex_note_from_string(note_str: str, default_octave: Optional[int] = None) -> Note:
+    """以前の Note.from_string（比較用）"""
+    match = re.match(r"^([a-gA-G])([#bx]*)(-?\d+)?$", note_str.strip())
+    if not match: raise ValueError(f"Invalid format: '{note_str}'")
+    step_str, alter_str, octave_str = match.groups()
+    alter = {'': 0, '#': 1, 'b': -1, 'bb': -2, 'x': 2}.get(alter_str.lower(), 0)
+    octave = int(octave_str) if octave_str is not None else default_octave
+    if octave is None: octave = 4
+    return Note(step=step_str, alter=alter, octave=octave)
+
+def regex_parse_notes(notes_csv: str, start_octave: int = 4) -> List[Note]:
+    """以前の parse_notes（比較用）"""
+    note_strs = [s.strip() for s in notes_csv.split(",")]
+    notes = []
+    current_octave = start_octave
+    last_pc = -1
+    for n_str in note_strs:
+        temp_note = regex_note_from_string(n_str, default_octave=None)
+        if re.search(r"-?\d+$", n_str) is None:
+            if temp_note.pitch_class < last_pc:
+                current_octave += 1
+            temp_note.octave = current_octave
+            last_pc = temp_note.pitch_class
+        else:
+            current_octave = temp_note.octave
+            last_pc = temp_note.pitch_class
+        notes.append(temp_note)
+    return notes
+
+def random_chord_lines(count: int, seed: int = 0) -> List[str]:
+    """3〜8音の和音。半分はオクターブ付き、残りはオクターブ省略（推定規則を通す）"""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        with_octave = rng.random() < 0.5
+        tokens = []
+        for _ in range(rng.randint(3, 8)):
+            token = rng.choice("CDEFGAB") + rng.choice(("", "", "#", "b", "bb", "x"))
+            if with_octave:
+                token += str(rng.randint(1, 6))
+            tokens.append(token)
+        lines.append(", ".join(tokens))
+    return lines
+
+def _time(parse, lines: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            parse(line)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="音名リストのパーサーのベンチマーク")
+    parser.add_argument("--size", type=int, default=20000, help="和音の行数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数（最速値を使う）")
+    args = parser.parse_args(argv)
+
+    lines = random_chord_lines(args.size, args.seed)
+    for line in lines:
+        if regex_parse_notes(line) != parse_notes(line):
+            raise SystemExit(f"Mismatch: '{line}'")
+
+    results = [
+        ("regex parse_notes", _time(regex_parse_notes, lines, args.repeat)),
+        ("parse_notes", _time(parse_notes, lines, args.repeat)),
+        ("parse_note_tuples", _time(parse_note_tuples, lines, args.repeat)),
+    ]
+    baseline = results[0][1]
+    for name, elapsed in results:
+        print(f"{name:20s} {len(lines) / elapsed:10.0f} chords/s  {elapsed / len(lines) * 1e6:6.2f}us/chord  "
+              f"x{baseline / elapsed:.2f}")
+
+if __name__ == "__main__":
+    main()
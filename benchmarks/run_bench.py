@@ -0,0 +1,129 @@
+"""
+ChordAnalyzer のベンチマーク。リポジトリのルートで実行する:
+
+    python -m benchmarks.run_bench                       # 全スイートを計測して表示
+    python -m benchmarks.run_bench -o before.json        # 結果を保存
+    python -m benchmarks.run_bench --compare before.json # 保存した結果と比較（劣化があれば終了コード 1）
+
+スループットとレイテンシは計測フックなしで、フェーズ別の時間は PhaseStatsTracer を付けた別パスで、
+ピークメモリは tracemalloc を有効にした別パスで測る（互いの計測コストが混ざらないようにするため）。
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+from models.note import Note
+from engine.analyzer import ChordAnalyzer
+from engine.tracing import PhaseStatsTracer
+from main import positive_int
+from benchmarks.corpus import SUITES, build_suite
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def bench_suite(voicings: List[List[Note]], cache_size: int, repeat: int, top_k: Optional[int] = None) -> Dict:
+    # 1. スループットとレイテンシ
+    analyzer = ChordAnalyzer(cache_size=cache_size)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for notes in voicings:
+            t0 = time.perf_counter_ns()
+            analyzer.analyze(notes, top_k=top_k)
+            latencies.append(time.perf_counter_ns() - t0)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    # 2. フェーズ別の時間
+    tracer = PhaseStatsTracer()
+    traced = ChordAnalyzer(tracer=tracer, cache_size=cache_size)
+    for notes in voicings:
+        traced.analyze(notes, top_k=top_k)
+
+    # 3. ピークメモリ（解析器の構築を含む）
+    tracemalloc.start()
+    measured = ChordAnalyzer(cache_size=cache_size)
+    for notes in voicings:
+        measured.analyze(notes, top_k=top_k)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "chords": len(latencies),
+        "chords_per_sec": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_us": _percentile(latencies, 0.50) / 1000,
+        "p99_us": _percentile(latencies, 0.99) / 1000,
+        "peak_memory_kb": peak / 1024,
+        "phases": {
+            phase: {"seconds": stat["seconds"], "candidates": stat["candidates"],
+                    "us_per_call": stat["seconds"] / stat["calls"] * 1e6 if stat["calls"] else 0.0}
+            for phase, stat in tracer.stats.items()
+        },
+    }
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """baseline より tolerance（割合）以上悪化した指標を列挙する"""
+    regressions = []
+    for suite, result in current["suites"].items():
+        base = baseline.get("suites", {}).get(suite)
+        if base is None:
+            continue
+        checks = [("chords_per_sec", True), ("p50_us", False), ("p99_us", False), ("peak_memory_kb", False)]
+        for metric, higher_is_better in checks:
+            old, new = base[metric], result[metric]
+            if old <= 0:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            print(f"  {suite:15s} {metric:15s} {old:12.1f} -> {new:12.1f} ({change:+.1%})")
+            if worse > tolerance:
+                regressions.append(f"{suite}.{metric} {change:+.1%}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ChordAnalyzer のベンチマーク")
+    parser.add_argument("--suite", action="append", choices=SUITES, help="計測するスイート（複数指定可、既定は全部）")
+    parser.add_argument("--size", type=int, default=2000, help="ランダム系スイートのボイシング数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="スループット計測の繰り返し回数")
+    parser.add_argument("--cache-size", type=int, default=0, help="解析キャッシュの大きさ（既定 0 = 無効で素の探索を測る）")
+    parser.add_argument("--top-k", type=positive_int, help="上位 K 件モードで計測する（既定は全候補）")
+    parser.add_argument("-o", "--output", help="結果を書き出す JSON ファイル")
+    parser.add_argument("--compare", help="比較対象の JSON ファイル")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="劣化とみなす割合（既定 10%%）")
+    args = parser.parse_args(argv)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"size": args.size, "seed": args.seed, "repeat": args.repeat, "cache_size": args.cache_size, "top_k": args.top_k},
+        "suites": {},
+    }
+    for suite in args.suite or SUITES:
+        voicings = build_suite(suite, args.size, args.seed)
+        result = bench_suite(voicings, args.cache_size, args.repeat, args.top_k)
+        report["suites"][suite] = result
+        phases = ", ".join(f"{p} {s['us_per_call']:.1f}us" for p, s in result["phases"].items())
+        print(f"{suite:15s} {result['chords']:7d} chords  {result['chords_per_sec']:9.0f} chords/s  "
+              f"p50 {result['p50_us']:7.1f}us  p99 {result['p99_us']:7.1f}us  peak {result['peak_memory_kb']:8.0f}KB")
+        print(f"{'':15s} {phases}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"--- compare with {args.compare} ---")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("Regressions: " + ", ".join(regressions))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
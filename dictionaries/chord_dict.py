@@ -75,4 +75,4 @@ CHORD_DICT = {
     # --- クラスター・その他 ---
     frozenset(['P1', 'm2', 'M2']): "Tone Cluster", # 音の塊（長2度と短2度の密集）
     frozenset(['P1', 'P5', 'M9']): "Quintal(3-note)", # 5度堆積 (C - G - D)
-}
\ No newline at end of file
+}
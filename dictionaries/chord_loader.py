@@ -0,0 +1,66 @@
+# dictionaries/chord_loader.py
+"""
+ユーザー定義のコード種別を JSON / TOML から読み込む。
+
+    {"chords": {"maj7#11": ["P1", "M3", "P5", "M7", "A11"]}, "remove": ["5"]}
+
+TOML では [chords] テーブルに同じ形で書く（remove は省略可）:
+
+    remove = ["5"]
+    [chords]
+    "maj7#11" = ["P1", "M3", "P5", "M7", "A11"]
+"""
+import json
+import os
+from typing import Dict, FrozenSet, List, Tuple
+from utils.interval_calc import INTERVAL_SEMITONES
+
+# (追加・置き換えする 音程集合 -> コード種別, 削除するコード種別)
+ChordDefinitions = Tuple[Dict[FrozenSet[str], str], List[str]]
+
+def validate_intervals(intervals) -> FrozenSet[str]:
+    """音程名の集合を検証して frozenset にする（未知の音程名やルート(P1)が無い場合は ValueError）"""
+    # null や数値など反復できない値も TypeError ではなく ValueError にする（POST /chords は ValueError を 400 で返す）
+    if not isinstance(intervals, (list, tuple, set, frozenset)) or not all(isinstance(i, str) for i in intervals):
+        raise ValueError(f"Intervals must be a list of names: {intervals!r}")
+    intervals = frozenset(intervals)
+    for interval in sorted(intervals):
+        if interval not in INTERVAL_SEMITONES:
+            raise ValueError(f"Unknown interval: '{interval}'")
+    if 'P1' not in intervals:
+        raise ValueError(f"Chord intervals must include 'P1': {sorted(intervals)}")
+    return intervals
+
+def parse_chord_definitions(data) -> ChordDefinitions:
+    """読み込んだ JSON / TOML の内容を検証して (追加分, 削除分) にする"""
+    if not isinstance(data, dict):
+        raise ValueError('Expected {"chords": {...}, "remove": [...]}')
+    unknown = set(data) - {"chords", "remove"}
+    if unknown:
+        raise ValueError(f"Unknown keys: {sorted(unknown)}")
+
+    chords = data.get("chords", {})
+    if not isinstance(chords, dict):
+        raise ValueError('"chords" must map chord names to interval lists')
+    additions = {}
+    for quality, intervals in chords.items():
+        intervals = validate_intervals(intervals)
+        if intervals in additions:
+            raise ValueError(f"Duplicate interval set for '{quality}' and '{additions[intervals]}'")
+        additions[intervals] = quality
+
+    removals = data.get("remove", [])
+    if not isinstance(removals, list) or not all(isinstance(q, str) for q in removals):
+        raise ValueError('"remove" must be a list of chord names')
+    return additions, removals
+
+def read_chord_definitions(path: str) -> ChordDefinitions:
+    """拡張子が .toml なら TOML、それ以外は JSON として読み込む"""
+    if os.path.splitext(path)[1].lower() == ".toml":
+        import tomllib
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    return parse_chord_definitions(data)
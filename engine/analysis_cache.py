@@ -0,0 +1,71 @@
+from collections import OrderedDict, namedtuple
+from typing import Any, Hashable, List, Optional, Tuple
+from models.note import Note
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "maxsize", "currsize"])
+
+def voicing_fingerprint(sorted_notes: List[Note]) -> Optional[Tuple[Tuple[int, int, int], ...]]:
+    """
+    移調しても変わらないボイシングの指紋。各音について
+    (ベースからの音名差 mod 7, ベースからの実半音差, 仮ルートとして置いたときのベースからの半音差) を並べる。
+    3つ目は探索フェーズが「ベースと同じオクターブに置き、ベースより上なら1オクターブ下げる」仮ルートの位置で、
+    これが一致すれば全ルート候補の音程計算結果が一致する。
+    ダブルシャープ・ダブルフラットを含む場合は None（表示名で変化記号が省略され、
+    移調によって候補名の重複判定が変わりうるためキャッシュしない）。
+    """
+    bass = sorted_notes[0]
+    bass_step = bass.step_index
+    bass_abs = bass.absolute_semitone
+    bass_in_octave = bass.absolute_semitone - bass.octave * 12
+
+    fingerprint = []
+    for n in sorted_notes:
+        if not -1 <= n.alter <= 1:
+            return None
+        root_offset = n.absolute_semitone - n.octave * 12 - bass_in_octave
+        if root_offset > 0:
+            root_offset -= 12
+        fingerprint.append(((n.step_index - bass_step) % 7, n.absolute_semitone - bass_abs, root_offset))
+    return tuple(fingerprint)
+
+def pitch_fingerprint(semitones: List[int]) -> Tuple[str, int, Tuple[int, ...]]:
+    """
+    MIDIノート番号の入力（昇順の絶対半音値）の指紋: ベースのピッチクラスと、各音のベースからの半音差。
+    UST・生成コードの探索はピッチクラスごとに決まった既定の綴り(DEFAULT_SPELLING)の音で行うので、
+    移調不変ではない。同じ音の並びをオクターブ単位で動かしたもの（と完全な繰り返し）だけを同じ指紋にする。
+    voicing_fingerprint の指紋とは形が違うので、同じ AnalysisCache に入れても衝突しない。
+    """
+    bass = semitones[0]
+    return "pitches", bass % 12, tuple(s - bass for s in semitones)
+
+class AnalysisCache:
+    """解析結果の LRU キャッシュ（ヒット・ミス・追い出し回数を数える）"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self._entries))
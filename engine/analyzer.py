@@ -1,174 +1,541 @@
-from typing import List, Dict, Any, Set
-from models.note import Note
-from utils.interval_calc import get_interval
+import time
+from functools import lru_cache
+from dataclasses import replace
+from typing import Callable, List, Dict, Any, FrozenSet, Iterable, Iterator, Mapping, Optional, Sequence, Tuple
+from models.note import Note, DEFAULT_SPELLING
+from models.result import AnalysisResult, ChordCandidate
+from utils.interval_calc import interval_id, interval_bit, SIMPLE_INTERVAL_IDS
 from dictionaries.chord_dict import CHORD_DICT
-from engine.fallback_generator import RuleBasedGenerator
+from dictionaries.chord_loader import validate_intervals, read_chord_definitions
+from engine.fallback_generator import RuleBasedGenerator, RULE_BITS
+from engine.chord_index import ChordIndex, pcs_to_mask, rotate_mask, is_rootless_quality, UPPER_STRUCTURE_MASKS, SEVENTH_SHAPES
+from engine.tracing import AnalysisTracer, IntervalFunction, PhaseEvent
+from engine.index_file import default_index
+from engine.analysis_cache import AnalysisCache, CacheInfo, pitch_fingerprint, voicing_fingerprint
+from engine.top_k import can_improve_top_k, phase_max_score
+from engine.consonance import shared_model
+from engine.voicing_search import VoicingIndex, NoteLike
+from engine.search_context import AnalysisContext, SearchPhase, root_semitone
+from engine.spelling import SPELLINGS_BY_PC, PitchGroups, best_spelling, can_spell, pitch_name, relative_pitches, spelled_note
+
+# 相対マスクに m3(3半音) か M3(4半音) が無ければ、フォールバック生成は骨格を作れない
+THIRD_MASK = (1 << 3) | (1 << 4)
+
+# 探索で参照する音程IDのビット
+P1_BIT = interval_bit('P1')
+P5_BIT = interval_bit('P5')
+M3_BIT = interval_bit('M3')
+m3_BIT = interval_bit('m3')
+M7_BIT = interval_bit('M7')
+m7_BIT = interval_bit('m7')
+d5_BIT = interval_bit('d5')
+
+# 粗さ 1.0（短2度1つ分）あたりの減点（consonance_weight を掛けて使う）
+CONSONANCE_POINTS = 10
+
+# ポリコードの上下それぞれとして認める辞書のコード種別
+POLYCHORD_QUALITIES = {"Major", "Minor", "Dim", "Aug", "sus4", "7", "Maj7", "m7", "m7b5", "dim7", "mM7"}
+
+def _bottom_quality(bottom_bits: int) -> Optional[str]:
+    """UST のボトムの音程ビットから骨格（7th 系など）を判定する。和音にならなければ None"""
+    has_M3 = bottom_bits & M3_BIT
+    has_m3 = bottom_bits & m3_BIT
+    has_m7 = bottom_bits & m7_BIT
+    has_M7 = bottom_bits & M7_BIT
+
+    if has_M3 and has_m7: return "7"
+    elif has_m3 and has_m7: return "m7"
+    elif has_M3 and has_M7: return "Maj7"
+    elif has_m3 and bottom_bits & d5_BIT and has_m7: return "m7b5"
+    elif has_M3: return "" # Major
+    elif has_m3: return "m"
+    return None
+
+@lru_cache(maxsize=None)
+def _generated_qualities(rule_bits: int) -> Tuple[Tuple[str, int], ...]:
+    """
+    フォールバック生成の名前のうち候補にするもの（テンション付き・特殊表記）と、テンション数による加点。
+    RULE_BITS で絞った音程IDマスクごとに一度だけ作る。
+    """
+    entries = []
+    for quality in RuleBasedGenerator.chord_names_for_bits(rule_bits):
+        if "(" in quality or "aug" in quality:
+            tension_count = quality.count(',') + 1 if "(" in quality and "omit5" not in quality else 0
+            entries.append((quality, tension_count * 5))
+    return tuple(entries)
+
+# ピッチクラス -> 既定の綴りの音名（綴りを決める前の候補に仮に付ける）
+DEFAULT_NAMES = [Note.from_index(Note.STEP_TO_INDEX[step], alter, 4).pitch_name for step, alter in (DEFAULT_SPELLING[pc] for pc in range(12))]
 
 class ChordAnalyzer:
-    def __init__(self):
+    def __init__(self, tracer: Optional[AnalysisTracer] = None, cache_size: int = 4096, index: Optional[ChordIndex] = None,
+                 consonance_weight: float = 0.0):
         self.chord_dictionary = CHORD_DICT
+        # 辞書をピッチクラス・マスクで引ける形に展開した索引（ビルド済みの索引ファイルがあれば mmap で共有する）
+        self.index = index if index is not None else default_index(self.chord_dictionary)
+        # 計測フック（None の場合は計測しない）
+        self.tracer = tracer
+        # 移調不変な指紋をキーにした解析結果の LRU キャッシュ（0 で無効）
+        self.cache = AnalysisCache(cache_size) if cache_size > 0 else None
+        # 辞書を書き換えるときは、共有の索引を壊さないよう最初に自分専用の複製を作る
+        self._owns_index = False
+        # 粗さによる減点の倍率（0 で無効。有効にするには NumPy が必要）
+        self.consonance_weight = consonance_weight
+        self.consonance = shared_model() if consonance_weight > 0 else None
+        # コードシンボル -> ボイシングの逆引き表（辞書から必要になったときに作る）
+        self._voicing_index: Optional[VoicingIndex] = None
+        # 入力マスク -> ルートごとの減点（最大 4096 通り）
+        self._penalty_tables: Dict[int, Tuple[int, ...]] = {}
+        # 探索フェーズ（この順に実行する。add_phase で足せる）。ルートレスは仮想ルートを固定の綴り(DEFAULT_SPELLING)で
+        # 置くため移調不変ではなく、キャッシュが当たっても毎回探索する
+        self.phases: List[SearchPhase] = [
+            SearchPhase("normal", self._search_normal),
+            SearchPhase("rootless", self._search_rootless, cacheable=False),
+            SearchPhase("ust", self._search_ust_and_polychord),
+            SearchPhase("fallback", self._search_fallback_rulebased),
+        ]
+        # MIDIノート番号の入力で、綴りを持たない版に差し替えるフェーズ
+        self._pitch_searches = {self._search_normal: self._search_normal_pitches,
+                                self._search_rootless: self._search_rootless_pitches}
+        self._pitch_phases: Optional[List[SearchPhase]] = None
 
-    def analyze(self, notes: List[Note], threshold: int = 10) -> str:
+    def analyze(self, notes: List[Note], threshold: int = 10, *, top_k: Optional[int] = None) -> str:
         if not notes: return "No notes"
 
+        result = self.analyze_result(notes, threshold, top_k=top_k)
+        if self.tracer is None:
+            return self._format_output(result, threshold)
+        self.tracer.on_phase_start("format")
+        start = time.perf_counter()
+        text = self._format_output(result, threshold)
+        self.tracer.on_phase(PhaseEvent("format", 0, time.perf_counter() - start, len(result.notes)))
+        return text
+
+    def analyze_result(self, notes: List[Note], threshold: int = 10, *, top_k: Optional[int] = None) -> AnalysisResult:
+        """
+        解析結果を構造化オブジェクトで返す（文字列への整形は行わない）。
+        top_k を指定すると上位 K 件だけを残し、上位 K 件を変えられないフェーズは実行しない。
+        threshold は top_k 指定時のみ使う（閾値未満の候補は上位 K 件に数えない）。
+        """
+        if top_k is not None and top_k < 1:
+            raise ValueError(f"top_k must be positive: {top_k}")
+        if not notes:
+            return AnalysisResult([], "", "")
+        result = self._collect_candidates(notes, top_k, threshold)
+        if top_k is not None:
+            result.keep_top(top_k, threshold)
+        return result
+
+    def analyze_pitches(self, pitches: Iterable[int], threshold: int = 10, *, top_k: Optional[int] = None) -> AnalysisResult:
+        """
+        MIDIノート番号（C4 = 60）の和音を、音名の文字列を経由せずに解析する（鍵盤・MIDI 入力用）。
+        辞書との一致（基本形・転回形・5度省略・ルートレス）は、ピッチクラスと音域からありうるすべての綴りについて判定するので、
+        It+6 と 7(omit5) のように綴りだけが違う種別はどちらも候補になる。順位を決めた後に残った候補にだけ、
+        その解釈で変化記号が最も少なくなる綴りでルート名・ベース名を付け、結果の notes は1位の解釈で綴る。
+        UST・ポリコード・生成コードの探索は既定の綴り(DEFAULT_SPELLING)の音で行う。
+        解析キャッシュは、ベースのピッチクラスと各音のベースからの半音差が同じ入力（完全な繰り返しとオクターブ違い）で共有する。
+        """
+        if top_k is not None and top_k < 1:
+            raise ValueError(f"top_k must be positive: {top_k}")
+        semitones = sorted(int(p) - 12 for p in pitches)
+        if not semitones:
+            return AnalysisResult([], "", "")
+
+        sorted_notes = [spelled_note(*SPELLINGS_BY_PC[semitone % 12][0], semitone) for semitone in semitones]
+        voicing_type = "Open" if semitones[-1] - semitones[0] > 12 else "Closed"
+        groups: PitchGroups = {}
+        for semitone in semitones:
+            groups.setdefault(semitone % 12, []).append(semitone)
+        input_mask = pcs_to_mask(groups)
+        ctx = AnalysisContext(sorted_notes, voicing_type, input_mask, self.index.rotations[input_mask], self._lookups()[0], groups)
+
+        phases = self._pitch_phases
+        if phases is None:
+            # 綴りを持たない版はピッチだけで決まり、キャッシュの指紋もベースのピッチクラスを含むので、ルートレスもキャッシュできる
+            phases = self._pitch_phases = [
+                replace(p, search=self._pitch_searches[p.search], cacheable=True) if p.search in self._pitch_searches else p
+                for p in self.phases]
+        # 同じ音の並び（オクターブ違いを含む）の候補は綴りを付ける前の形で再利用し、キャッシュしないフェーズだけを実行する
+        fingerprint = pitch_fingerprint(semitones) if self.cache is not None else None
+        cached = self.cache.get(fingerprint) if fingerprint is not None else None
+        if cached is not None:
+            collector, targets = ctx.collector, ctx.targets
+            for c, target in cached:
+                if collector.add(c) and target is not None:
+                    targets[id(c)] = target
+            self._run_phases([p for p in phases if not p.cacheable], ctx, top_k, threshold)
+        elif self._run_phases(phases, ctx, top_k, threshold) and fingerprint is not None:
+            self.cache.put(fingerprint, tuple((c, ctx.targets.get(id(c))) for c in ctx.cacheable_candidates()))
+        result = ctx.result
+        if top_k is not None:
+            result.keep_top(top_k, threshold)
+        self._spell_pitch_candidates(result, groups, ctx.targets)
+        return result
+
+    def analyze_batch(self, pitches, spellings=None, threshold: int = 10):
+        """
+        MIDIノート番号の2次元配列 (N, max_notes) をまとめて解析し、各行の最良解釈を構造化配列で返す。
+        詳細は engine.batch.analyze_batch を参照。
+        """
+        from engine.batch import analyze_batch
+        return analyze_batch(self, pitches, spellings, threshold)
+
+    def cache_info(self) -> Optional[CacheInfo]:
+        """キャッシュのヒット・ミス・追い出し回数（キャッシュ無効時は None）"""
+        return self.cache.info() if self.cache is not None else None
+
+    def add_phase(self, name: str, search: Callable[[AnalysisContext], None], max_score: Optional[int] = None,
+                  cacheable: bool = True, before: Optional[str] = None) -> SearchPhase:
+        """
+        探索フェーズを足す（before に既存のフェーズ名を渡すとその前、省略すると最後に実行する）。
+        search は AnalysisContext を受け取り、context.collector へ候補を追加する。
+        ルートごとの音程IDは context.interval_ids / root_bits で他のフェーズと共有できる。
+        """
+        phase = SearchPhase(name, search, max_score, cacheable)
+        position = len(self.phases)
+        if before is not None:
+            position = next((i for i, p in enumerate(self.phases) if p.name == before), None)
+            if position is None:
+                raise KeyError(f"Phase not found: '{before}'")
+        self.phases.insert(position, phase)
+        self._phases_changed()
+        return phase
+
+    def remove_phase(self, name: str) -> SearchPhase:
+        """名前が name の探索フェーズを外して返す（無ければ KeyError）"""
+        for i, phase in enumerate(self.phases):
+            if phase.name == name:
+                del self.phases[i]
+                self._phases_changed()
+                return phase
+        raise KeyError(f"Phase not found: '{name}'")
+
+    def _phases_changed(self):
+        # キャッシュの結果は変更前のフェーズで作ったものなので使えない
+        self._pitch_phases = None
+        if self.cache is not None:
+            self.cache.clear()
+
+    def register_chord(self, intervals: Iterable[str], quality: str):
+        """
+        コード種別を辞書に登録する（同じ音程集合が既にあれば種別名を置き換える）。
+        索引は登録した1件が影響する行だけを更新し、解析キャッシュは破棄する。
+        """
+        intervals = validate_intervals(intervals)
+        self._own_index().add(intervals, quality)
+        self._dictionary_changed()
+
+    def unregister_chord(self, intervals: Iterable[str]) -> str:
+        """音程集合の登録を取り消し、そのコード種別を返す（未登録なら KeyError）"""
+        intervals = frozenset(intervals)
+        if intervals not in self.chord_dictionary:
+            raise KeyError(f"Chord not registered: {sorted(intervals)}")
+        quality = self._own_index().remove(intervals)
+        self._dictionary_changed()
+        return quality
+
+    def unregister_quality(self, quality: str) -> int:
+        """指定したコード種別の音程集合をすべて取り除き、取り除いた数を返す"""
+        targets = [intervals for intervals, q in self.chord_dictionary.items() if q == quality]
+        if targets:
+            index = self._own_index()
+            for intervals in targets:
+                index.remove(intervals)
+            self._dictionary_changed()
+        return len(targets)
+
+    def apply_chord_definitions(self, additions: Dict[FrozenSet[str], str], removals: Iterable[str] = ()):
+        """parse_chord_definitions の結果を反映する（削除を先に行う）"""
+        for quality in removals:
+            self.unregister_quality(quality)
+        for intervals, quality in additions.items():
+            self.register_chord(intervals, quality)
+
+    def load_chords(self, path: str) -> int:
+        """JSON / TOML ファイルのコード定義を読み込んで反映し、登録した数を返す"""
+        additions, removals = read_chord_definitions(path)
+        self.apply_chord_definitions(additions, removals)
+        return len(additions)
+
+    def voicings(self, symbol: str, low: NoteLike = "C3", high: NoteLike = "C6", **constraints) -> Iterator[List[Note]]:
+        """
+        analyze の逆引き。この解析器の辞書（登録したコードを含む）でシンボルを解釈し、
+        low〜high に収まるボイシングを順に返す。制約は VoicingIndex.voicings と同じ。
+        """
+        if self._voicing_index is None:
+            self._voicing_index = VoicingIndex(self.chord_dictionary)
+        return self._voicing_index.voicings(symbol, low, high, **constraints)
+
+    def _own_index(self) -> ChordIndex:
+        if not self._owns_index:
+            self.index = ChordIndex.copy_of(self.index)
+            self.chord_dictionary = self.index.chord_dictionary
+            self._owns_index = True
+        return self.index
+
+    def _dictionary_changed(self):
+        # キャッシュの結果・逆引き表は変更前の辞書で作ったものなので使えない
+        if self.cache is not None:
+            self.cache.clear()
+        self._voicing_index = None
+
+    def _collect_candidates(self, notes: List[Note], top_k: Optional[int] = None, threshold: int = 10) -> AnalysisResult:
+        """全探索フェーズを実行し、カテゴリ別の候補を集めた AnalysisResult を返す（top_k があれば不要なフェーズを飛ばす）"""
         sorted_notes = sorted(notes, key=lambda n: n.absolute_semitone)
-        bass_note = sorted_notes[0]
-        bass_alter_str = "#" if bass_note.alter == 1 else "b" if bass_note.alter == -1 else ""
-        bass_name = f"{bass_note.step}{bass_alter_str}"
-        
         spread = sorted_notes[-1].absolute_semitone - sorted_notes[0].absolute_semitone
         voicing_type = "Open" if spread > 12 else "Closed"
+        input_mask = pcs_to_mask(n.pitch_class for n in sorted_notes)
+        ctx = AnalysisContext(sorted_notes, voicing_type, input_mask, self.index.rotations[input_mask], self._lookups()[0])
+
+        # 移調不変なフェーズの結果は、同じ形のボイシングなら綴り直して再利用し、そうでないフェーズだけを実行する
+        fingerprint = None
+        if self.cache is not None:
+            fingerprint = voicing_fingerprint(sorted_notes)
+            cached = self.cache.get(fingerprint) if fingerprint is not None else None
+            if cached is not None:
+                self._respell_cached(cached, ctx)
+                self._run_phases([p for p in self.phases if not p.cacheable], ctx, top_k, threshold)
+                return ctx.result
+
+        completed = self._run_phases(self.phases, ctx, top_k, threshold)
+
+        # フェーズを飛ばした結果は不完全なのでキャッシュしない
+        if fingerprint is not None and completed:
+            self.cache.put(fingerprint, (ctx.bass_note.pitch_class, self._cache_entries(ctx)))
+        return ctx.result
+
+    @staticmethod
+    def _cache_entries(ctx: AnalysisContext) -> Tuple[Tuple[ChordCandidate, int, int], ...]:
+        """
+        キャッシュに入れる (候補, ルート名を取った音の位置, 上部構造のルート名を取った音の位置) の列。
+        ポリコードの下側のルートのように、同じピッチクラスの最も高い音以外の綴りで名付けた候補もあるので、
+        名前ではなく音の位置（低い順の番号）を覚えておき、キャッシュが当たったら今回の入力の同じ位置の音で名付け直す。
+        """
+        positions = {}
+        for position, n in enumerate(ctx.notes):
+            positions[n.pitch_class, n.pitch_name] = position
+        return tuple(
+            (c, positions.get((c.root_pc, c.root_name), -1), positions.get((c.upper_root_pc, c.upper_root_name), -1))
+            for c in ctx.cacheable_candidates())
+
+    def _run_phases(self, phases: Sequence[SearchPhase], ctx: AnalysisContext, top_k: Optional[int] = None, threshold: int = 10) -> bool:
+        """フェーズを順に実行する。上位 top_k 件を変えられないフェーズを飛ばしたら False を返す"""
+        completed = True
+        if top_k is not None:
+            note_count = len(ctx.notes)
+            pc_count = len(ctx.input_pcs)
+        for phase in phases:
+            if top_k is not None:
+                max_score = phase.max_score if phase.max_score is not None else phase_max_score(phase.name, note_count, pc_count)
+                if not can_improve_top_k(ctx.result.candidates, top_k, threshold, max_score):
+                    completed = False
+                    continue
+            before = len(ctx.collector)
+            if self.tracer is None:
+                phase.search(ctx)
+            else:
+                self._run_traced_phase(phase, ctx)
+            if not phase.cacheable:
+                ctx.mark_uncacheable(before)
+        return completed
 
-        input_pcs = {n.pitch_class for n in sorted_notes}
-        unique_cands = {n.pitch_class: n for n in sorted_notes}
-
-        categorized_results = {
-            "基本形 (Root Position)": [],
-            "転回形 (Inversion)": [],
-            "オンコード (On-Chord)": [],
-            "ルートレス (Rootless)": [],
-            "特殊形 (Special)": []
-        }
-
-        # 各探索フェーズの実行（今後フェーズが増えたらここに足す）
-        self._search_normal(sorted_notes, unique_cands, bass_note, bass_name, voicing_type, categorized_results)
-        self._search_rootless(sorted_notes, input_pcs, bass_note, bass_name, voicing_type, categorized_results)
-        
-        
-        self._search_ust_and_polychord(sorted_notes, unique_cands, input_pcs, bass_note, bass_name, voicing_type, categorized_results)
-        self._search_fallback_rulebased(sorted_notes, unique_cands, bass_note, bass_name, voicing_type, categorized_results)
-
-        return self._format_output(sorted_notes, bass_name, categorized_results, threshold)
-    
-    def _search_fallback_rulebased(self, sorted_notes: List[Note], unique_cands: dict, bass_note: Note, bass_name: str, voicing_type: str, results: dict):
+    def _lookups(self) -> Tuple[IntervalFunction, Mapping[int, str]]:
+        """探索フェーズが使う音程計算と辞書。tracer があれば差し替えを許す（プロファイラが回数を数える）"""
+        if self.tracer is None:
+            return interval_id, self.index.qualities
+        return self.tracer.instrument(interval_id, self.index.qualities)
+
+    def _consonance_penalties(self, input_mask: int) -> Tuple[int, ...]:
+        """
+        ルートのピッチクラスごとの減点(12個)。解釈する和音 = 入力のピッチクラス + ルートなので、
+        ルートが入力にある候補は減点されず、ルートレスのように入力に無いルートを補う候補だけが、補った音が濁らせる分だけ下がる。
+        仮想ルートを置くのはルートレスの探索だけなので、減点もそこで候補を作るときに行う（top_k の枝刈りも減点後のスコアで判定する）。
+        """
+        penalties = self._penalty_tables.get(input_mask)
+        if penalties is None:
+            # 入力そのものと、12通りのルートを補った和音の粗さを一度に計算する
+            base, *rough = self.consonance.roughness_batch([input_mask] + [input_mask | 1 << pc for pc in range(12)]).tolist()
+            scale = self.consonance_weight * CONSONANCE_POINTS
+            penalties = self._penalty_tables[input_mask] = tuple(round(scale * (r - base)) for r in rough)
+        return penalties
+
+    def _respell_cached(self, cached: tuple, ctx: AnalysisContext):
+        """キャッシュした候補を今回の入力の調へ移し、ルート名を今回の入力の同じ位置の音から付け直す"""
+        cached_bass_pc, cached_entries = cached
+        shift = (ctx.bass_note.pitch_class - cached_bass_pc) % 12
+        notes = ctx.notes
+        unique_cands = ctx.unique_cands
+        bass_name = ctx.bass_name
+        collector = ctx.collector
+
+        for c, root_position, upper_position in cached_entries:
+            root_pc = (c.root_pc + shift) % 12
+            if c.upper_root_pc >= 0:
+                upper_pc = (c.upper_root_pc + shift) % 12
+                upper = notes[upper_position] if upper_position >= 0 else unique_cands[upper_pc]
+                c = replace(c, upper_root_pc=upper_pc, upper_root_name=upper.pitch_name)
+            root = notes[root_position] if root_position >= 0 else unique_cands[root_pc]
+            collector.add(replace(c, root_pc=root_pc, root_name=root.pitch_name, bass_name=bass_name))
+
+    def _run_traced_phase(self, phase: SearchPhase, ctx: AnalysisContext):
+        """フェーズの所要時間と追加候補数を tracer へ通知しながら実行する"""
+        before = len(ctx.collector)
+        self.tracer.on_phase_start(phase.name)
+        start = time.perf_counter()
+        phase.search(ctx)
+        elapsed = time.perf_counter() - start
+        self.tracer.on_phase(PhaseEvent(phase.name, len(ctx.collector) - before, elapsed, len(ctx.notes)))
+
+    def _search_fallback_rulebased(self, ctx: AnalysisContext):
         """辞書にないテンションの組み合わせを動的生成する"""
-        for root_pc, cand in unique_cands.items():
-            dummy_root = Note(cand.step, cand.alter, bass_note.octave)
-            if dummy_root.absolute_semitone > bass_note.absolute_semitone:
-                dummy_root.octave -= 1
-                
-            intervals = {get_interval(dummy_root, note) for note in sorted_notes}
-            cand_alter_str = "#" if cand.alter == 1 else "b" if cand.alter == -1 else ""
-            root_name = f"{cand.step}{cand_alter_str}"
+        qualities = self._lookups()[1]
+        rotations, bass_note, bass_name, voicing_type, collector = ctx.rotations, ctx.bass_note, ctx.bass_name, ctx.voicing_type, ctx.collector
+        for root_pc, cand in ctx.unique_cands.items():
+            # 3度が存在し得ないルートは骨格を作れないので音程計算ごと省く
+            if not rotations[root_pc] & THIRD_MASK:
+                continue
+
+            # 音程IDマスクは基本形の探索で計算済みならそれを使う
+            bits = ctx.root_bits(root_pc)
+            root_name = cand.pitch_name
             is_root_pos = (root_pc == bass_note.pitch_class)
 
-            if self.chord_dictionary.get(frozenset(intervals)):
+            if qualities.get(bits):
                 continue
             
-            intervals_with_p5 = set(intervals)
-            intervals_with_p5.add('P5')
-            if 'P5' not in intervals and self.chord_dictionary.get(frozenset(intervals_with_p5)):
+            if not bits & P5_BIT and qualities.get(bits | P5_BIT):
                 continue
 
-            # ★ 変更点：複数の解釈（表記ブレ）をリストで受け取る
-            generated_qualities = RuleBasedGenerator.generate_chord_names(intervals)
-            
-            for generated_quality in generated_qualities:
-                # テンションが含まれている、または特殊な表記の場合
-                if "(" in generated_quality or "aug" in generated_quality:
-                    category = self._get_category(is_root_pos, False, generated_quality, root_pc, bass_note)
-                    
-                    score = 55 if is_root_pos else 35 
-                    tension_count = generated_quality.count(',') + 1 if "(" in generated_quality and "omit5" not in generated_quality else 0
-                    score += tension_count * 5
-
-                    name = f"{root_name} {generated_quality}" if is_root_pos else f"{root_name} {generated_quality} / {bass_name}"
-                    
-                    if not any(r['name'].startswith(name) for r in results[category]):
-                        results[category].append({"name": f"{name} ({voicing_type}) [生成]", "score": score})
-
-    def _search_ust_and_polychord(self, sorted_notes: List[Note], unique_cands: Dict[int, Note], input_pcs: Set[int], bass_note: Note, bass_name: str, voicing_type: str, results: Dict):
-        """アッパーストラクチャートライアド（UST）およびポリコードの分割探索"""
+            for generated_quality, tension_bonus in _generated_qualities(bits & RULE_BITS):
+                category = self._get_category(is_root_pos, False, generated_quality, root_pc, bass_note)
+                score = (55 if is_root_pos else 35) + tension_bonus
+                collector.add(ChordCandidate(category, score, "generated", root_pc, root_name, generated_quality,
+                                             bass_name, voicing_type, is_root_pos))
+
+    def _search_ust_and_polychord(self, ctx: AnalysisContext):
+        """アッパーストラクチャー（トライアド / 4和音）およびポリコードの分割探索"""
         # 構成音が4音未満の場合はUSTを構成できないためスキップ
-        if len(input_pcs) < 4:
+        if len(ctx.input_pcs) < 4:
             return
 
-        # トライアドの構成音程（半音差）
-        triads = {
-            "Major": [0, 4, 7],
-            "Minor": [0, 3, 7],
-            "Aug": [0, 4, 8],
-            "Dim": [0, 3, 6]
-        }
-
         # ボトム（下部構造）のルートはベース音であると仮定
+        sorted_notes, bass_note, bass_name, voicing_type, collector = ctx.notes, ctx.bass_note, ctx.bass_name, ctx.voicing_type, ctx.collector
+        unique_cands = ctx.unique_cands
         bottom_root_pc = bass_note.pitch_class
-        bottom_cand = unique_cands.get(bottom_root_pc)
-        if not bottom_cand:
-            return
+        bottom_name = unique_cands[bottom_root_pc].pitch_name
+        input_mask = ctx.input_mask
 
-        bottom_dummy_root = Note(bottom_cand.step, bottom_cand.alter, bass_note.octave)
-        if bottom_dummy_root.absolute_semitone > bass_note.absolute_semitone:
-            bottom_dummy_root.octave -= 1
+        # 各ピッチクラス（の最低音）のボトムルートからの音程ビット。
+        # 骨格判定のため、9, 11, 13度は1オクターブ内(2, 4, 6度)に丸める
+        pc_bits = [0] * 12
+        for n, i in zip(reversed(sorted_notes), reversed(ctx.interval_ids(bottom_root_pc))):
+            pc_bits[n.pitch_class] = 1 << SIMPLE_INTERVAL_IDS[i]
 
         # 入力音の中から「上部構造（トップ）のルート」となる候補をすべて試す
         for top_pc, top_cand in unique_cands.items():
             if top_pc == bottom_root_pc:
                 continue # トップとボトムのルートが同じならUSTではない
 
-            for triad_name, intervals_semi in triads.items():
-                # 仮定したトップトライアドのピッチクラス集合を生成
-                top_triad_pcs = {(top_pc + i) % 12 for i in intervals_semi}
-                
-                # トップトライアドが入力音に「完全に」含まれているかチェック
-                if top_triad_pcs.issubset(input_pcs):
-                    
-                    # トップの音を除外した残りの音をボトムとする
-                    bottom_pcs = input_pcs - top_triad_pcs
-                    bottom_pcs.add(bottom_root_pc) # ボトムルートは必ず含むものとする
-
-                    # ボトムの音程（インターバル）を計算
-                    bottom_intervals = set()
-                    for pc in bottom_pcs:
-                        note_for_interval = next((n for n in sorted_notes if n.pitch_class == pc), None)
-                        if note_for_interval:
-                            interval = get_interval(bottom_dummy_root, note_for_interval)
-                            # 骨格判定のため、9, 11, 13度を1オクターブ内(2, 4, 6度)に丸め直す
-                            if interval[1:] in ['9', '11', '13']:
-                                interval = f"{interval[0]}{int(interval[1:]) - 7}"
-                            bottom_intervals.add(interval)
-
-                    # ボトムが特定のコード骨格（特に 7th 系）を形成しているか判定
-                    has_M3 = 'M3' in bottom_intervals
-                    has_m3 = 'm3' in bottom_intervals
-                    has_m7 = 'm7' in bottom_intervals
-                    has_M7 = 'M7' in bottom_intervals
-
-                    bottom_quality = None
-                    if has_M3 and has_m7: bottom_quality = "7"
-                    elif has_m3 and has_m7: bottom_quality = "m7"
-                    elif has_M3 and has_M7: bottom_quality = "Maj7"
-                    elif has_m3 and 'd5' in bottom_intervals and has_m7: bottom_quality = "m7b5"
-                    elif has_M3: bottom_quality = "" # Major
-                    elif has_m3: bottom_quality = "m"
-
-                    # ボトムが和音として成立していれば、USTとして出力！
-                    if bottom_quality is not None:
-                        
-                        # --- 誤って省略してしまった名前の生成処理 ---
-                        top_alter_str = "#" if top_cand.alter == 1 else "b" if top_cand.alter == -1 else ""
-                        top_name = f"{top_cand.step}{top_alter_str}"
-                        top_chord_name = top_name if triad_name == "Major" else f"{top_name} {triad_name}"
-
-                        bottom_alter_str = "#" if bottom_cand.alter == 1 else "b" if bottom_cand.alter == -1 else ""
-                        bottom_name = f"{bottom_cand.step}{bottom_alter_str}"
-
-                        ust_name = f"{top_chord_name} / {bottom_name}{bottom_quality}"
-                        
-                        # --- USTスコアリングの精緻化 ---
-                        root_diff = (top_pc - bottom_root_pc) % 12
-                        score = 70 # 基礎点
-                        
-                        # 王道のインターバル (M2: 2, m3: 3, d5/A4: 6, M6: 9) はジャズで頻出するためボーナス
-                        if root_diff in [2, 3, 6, 9] and triad_name in ["Major", "Minor"]:
-                            score += 15 # 最大85点になる（通常探索の基本形80点を超える！）
-                            
-                        # AugやDimは対称構造ゆえの「数学的なこじつけ」が発生しやすいためペナルティ
-                        if triad_name in ["Aug", "Dim"]:
-                            score -= 10 
-                        
-                        if not any(r['name'].startswith(ust_name) for r in results["特殊形 (Special)"]):
-                            results["特殊形 (Special)"].append({"name": f"{ust_name} (UST) ({voicing_type})", "score": score})
+            for shape_name, top_mask in UPPER_STRUCTURE_MASKS[top_pc]:
+                # トップの和音が入力音に「完全に」含まれているかをビット演算で判定
+                if input_mask & top_mask != top_mask:
+                    continue
+                is_seventh = shape_name in SEVENTH_SHAPES
+                if is_seventh and top_mask >> bottom_root_pc & 1:
+                    continue # 4和音の上部構造はボトムのルートを含まないものに限る
+
+                # トップの音を除外した残りの音をボトムとする（ボトムルートは必ず含む）
+                bottom_mask = (input_mask & ~top_mask) | (1 << bottom_root_pc)
+                bottom_bits = 0
+                while bottom_mask:
+                    lowest = bottom_mask & -bottom_mask
+                    bottom_bits |= pc_bits[lowest.bit_length() - 1]
+                    bottom_mask ^= lowest
+
+                # ボトムが和音として成立していれば、USTとして出力！
+                bottom_quality = _bottom_quality(bottom_bits)
+                if bottom_quality is None:
+                    continue
+
+                top_name = top_cand.pitch_name
+
+                # --- USTスコアリングの精緻化 ---
+                root_diff = (top_pc - bottom_root_pc) % 12
+                if is_seventh:
+                    # 4和音の上部構造はトライアドより稀なので基礎点を下げる（ボーナス込みでも最大80点）
+                    score = 65
+                    if root_diff in [2, 3, 6, 9] and shape_name != "m7b5":
+                        score += 15
+                else:
+                    score = 70 # 基礎点
+
+                    # 王道のインターバル (M2: 2, m3: 3, d5/A4: 6, M6: 9) はジャズで頻出するためボーナス
+                    if root_diff in [2, 3, 6, 9] and shape_name in ["Major", "Minor"]:
+                        score += 15 # 最大85点になる（通常探索の基本形80点を超える！）
+
+                    # AugやDimは対称構造ゆえの「数学的なこじつけ」が発生しやすいためペナルティ
+                    if shape_name in ["Aug", "Dim"]:
+                        score -= 10
+
+                collector.add(ChordCandidate("特殊形 (Special)", score, "ust", bottom_root_pc, bottom_name,
+                                             bottom_quality, bass_name, voicing_type,
+                                             upper_root_pc=top_pc, upper_root_name=top_name, upper_quality=shape_name))
+
+        self._search_polychord_splits(ctx)
+
+    def _search_polychord_splits(self, ctx: AnalysisContext):
+        """音域で上下2つに分け、それぞれが辞書のトライアド / 4和音になるものをポリコードとして出力する"""
+        sorted_notes, bass_note, bass_name, voicing_type, collector = ctx.notes, ctx.bass_note, ctx.bass_name, ctx.voicing_type, ctx.collector
+        for split in range(3, len(sorted_notes) - 2):
+            lower, upper = sorted_notes[:split], sorted_notes[split:]
+            if lower[-1].absolute_semitone >= upper[0].absolute_semitone:
+                continue # 同じ高さの音を上下に分けることはしない
+
+            lower_chord = self._identify_polychord_side(lower, bass_note.pitch_class)
+            if lower_chord is None:
+                continue
+            upper_chord = self._identify_polychord_side(upper)
+            if upper_chord is None:
+                continue
+
+            lower_root, lower_quality = lower_chord
+            upper_root, upper_quality = upper_chord
+            if upper_root.pitch_class == lower_root.pitch_class:
+                continue
+
+            # 上下で構成音を共有しない、きれいな分割ほど高く評価する
+            lower_mask = pcs_to_mask(n.pitch_class for n in lower)
+            upper_mask = pcs_to_mask(n.pitch_class for n in upper)
+            score = 60 if lower_mask & upper_mask else 70
+
+            collector.add(ChordCandidate("特殊形 (Special)", score, "poly", lower_root.pitch_class, lower_root.pitch_name,
+                                         lower_quality, bass_name, voicing_type, upper_root_pc=upper_root.pitch_class,
+                                         upper_root_name=upper_root.pitch_name, upper_quality=upper_quality))
+
+    def _identify_polychord_side(self, notes: List[Note], root_pc: Optional[int] = None) -> Optional[Tuple[Note, str]]:
+        """ポリコードの片側を辞書のトライアド / 4和音として解釈し、(ルートの音, コード種別) を返す"""
+        side_cands = {n.pitch_class: n for n in notes}
+        if len(side_cands) < 3:
+            return None
+        side_bass = notes[0]
+        rotations = self.index.rotations[pcs_to_mask(side_cands)]
+        interval_id, qualities = self._lookups()
+
+        for cand_pc, cand in side_cands.items():
+            if root_pc is not None and cand_pc != root_pc:
+                continue
+            if not self.index.exact[rotations[cand_pc]]:
+                continue
+            # 片側の最低音と同じか下に仮ルートを置く（ピッチクラスのみで決まるので移調しても変わらない）
+            root_semitone = side_bass.absolute_semitone - (side_bass.pitch_class - cand_pc) % 12
+            bits = 0
+            for n in notes:
+                bits |= 1 << interval_id(cand.step_index, root_semitone, n.step_index, n.absolute_semitone)
+            quality = qualities.get(bits)
+            if quality in POLYCHORD_QUALITIES:
+                return cand, quality
+        return None
+
     def _calculate_inversion_penalty(self, bass_interval: int) -> int:
         """
         ベース音のインターバルから、転回形やオンコードの不安定さをペナルティとして返す
@@ -198,125 +565,179 @@ class ChordAnalyzer:
         else:
             return "オンコード (On-Chord)"
 
-    def _search_normal(self, sorted_notes: List[Note], unique_cands: Dict[int, Note], bass_note: Note, bass_name: str, voicing_type: str, results: Dict):
-        for root_pc, cand in unique_cands.items():
-            dummy_root = Note(cand.step, cand.alter, bass_note.octave)
-            if dummy_root.absolute_semitone > bass_note.absolute_semitone:
-                dummy_root.octave -= 1
-                
-            # --- 修正・追加部分 ---
-            cand_alter_str = "#" if cand.alter == 1 else "b" if cand.alter == -1 else ""
-            root_name = f"{cand.step}{cand_alter_str}"
-            
-            # 各音に対して計算されたインターバルをデバッグ表示
-            interval_details = []
-            intervals = set()
-            for note in sorted_notes:
-                inter = get_interval(dummy_root, note)
-                intervals.add(inter)
-                interval_details.append(f"{note}: {inter}")
-            
-            print(f"Candidate Root: {root_name} | Intervals: {', '.join(interval_details)}")
-            # ----------------------
+    def _dictionary_score(self, category: str, is_root_position: bool, root_pc: int, bass_note: Note, is_omit5: bool) -> int:
+        """辞書一致（基本形・転回形・5度省略）のスコア"""
+        if is_omit5:
+            base = 65  # Omit5なので基礎点は65
+        elif category == "特殊形 (Special)":
+            return 75
+        else:
+            base = 80  # 基本形は満点(80)
+        if is_root_position:
+            return base
+        # 転回形・オンコードはベース音の度数によってペナルティを引く
+        bass_interval = (bass_note.pitch_class - root_pc) % 12
+        return base - self._calculate_inversion_penalty(bass_interval)
+
+    @staticmethod
+    def _rootless_score(quality: str, is_omit5: bool) -> int:
+        tension_bonus = 0
+        if '9' in quality: tension_bonus += 10
+        if '11' in quality: tension_bonus += 15
+        if '13' in quality: tension_bonus += 20
+        return 30 + tension_bonus - (10 if is_omit5 else 0)
+
+    def _search_normal(self, ctx: AnalysisContext):
+        qualities = self._lookups()[1]
+        rotations, bass_note, bass_name, voicing_type, collector = ctx.rotations, ctx.bass_note, ctx.bass_name, ctx.voicing_type, ctx.collector
+        for root_pc, cand in ctx.unique_cands.items():
+            # ピッチクラスの段階で辞書と一致し得ないルートは音程計算をしない
+            if not self.index.may_match(rotations[root_pc]):
+                continue
+
+            root_name = cand.pitch_name
+            bits = ctx.root_bits(root_pc)
             is_root_pos = (root_pc == bass_note.pitch_class)
             # A. 完全一致
-            quality = self.chord_dictionary.get(frozenset(intervals))
+            quality = qualities.get(bits)
             if quality:
                 category = self._get_category(is_root_pos, False, quality, root_pc, bass_note)
-                
-                # スコア計算の精緻化
-                if category == "特殊形 (Special)":
-                    score = 75 
-                elif is_root_pos:
-                    score = 80 # 基本形は満点(80)
-                else:
-                    # 転回形・オンコードはベース音の度数によってペナルティを引く
-                    bass_interval = (bass_note.pitch_class - root_pc) % 12
-                    score = 80 - self._calculate_inversion_penalty(bass_interval)
-                
-                if category == "特殊形 (Special)":
-                    name = f"{quality} on {bass_name}"
-                else:
-                    name = f"{root_name} {quality}" if is_root_pos else f"{root_name} {quality} / {bass_name}"
-                    
-                results[category].append({"name": f"{name} ({voicing_type})", "score": score})
+                score = self._dictionary_score(category, is_root_pos, root_pc, bass_note, False)
+                collector.add(ChordCandidate(category, score, "dict", root_pc, root_name, quality,
+                                             bass_name, voicing_type, is_root_pos))
             
             # B. Omit5 補完
             # （※ここでquality_omitを定義する処理が必要でした）
-            if not quality and 'P5' not in intervals:
-                intervals_with_p5 = set(intervals)
-                intervals_with_p5.add('P5')
-                quality_omit = self.chord_dictionary.get(frozenset(intervals_with_p5))
+            if not quality and not bits & P5_BIT:
+                quality_omit = qualities.get(bits | P5_BIT)
                 
                 if quality_omit:
                     category = self._get_category(is_root_pos, False, quality_omit, root_pc, bass_note)
-                    
-                    # スコア計算の精緻化 (Omit5なので基礎点は65)
-                    if is_root_pos:
-                        score = 65
-                    else:
-                        bass_interval = (bass_note.pitch_class - root_pc) % 12
-                        score = 65 - self._calculate_inversion_penalty(bass_interval)
-                        
-                    name = f"{root_name} {quality_omit}(omit5)" if is_root_pos else f"{root_name} {quality_omit}(omit5) / {bass_name}"
-                    results[category].append({"name": f"{name} ({voicing_type})", "score": score})
-
-    def _search_rootless(self, sorted_notes: List[Note], input_pcs: Set[int], bass_note: Note, bass_name: str, voicing_type: str, results: Dict):
-        missing_pcs = [pc for pc in range(12) if pc not in input_pcs]
-        phantom_map = {0:('C',0), 1:('C',1), 2:('D',0), 3:('E',-1), 4:('E',0), 5:('F',0), 6:('F',1), 7:('G',0), 8:('A',-1), 9:('A',0), 10:('B',-1), 11:('B',0)}
-        
+                    score = self._dictionary_score(category, is_root_pos, root_pc, bass_note, True)
+                    collector.add(ChordCandidate(category, score, "omit5", root_pc, root_name, f"{quality_omit}(omit5)",
+                                                 bass_name, voicing_type, is_root_pos))
+
+    def _search_normal_pitches(self, ctx: AnalysisContext):
+        """_search_normal の綴りを持たない版。どれかの綴りで一致する辞書エントリをすべて候補にする"""
+        qualities = self._lookups()[1]
+        groups, rotations, bass_note, voicing_type, collector, targets = ctx.groups, ctx.rotations, ctx.bass_note, ctx.voicing_type, ctx.collector, ctx.targets
+        bass_semitone = bass_note.absolute_semitone
+        for root_pc in groups:
+            relative_mask = rotations[root_pc]
+            if not self.index.may_match(relative_mask):
+                continue
+            is_root_pos = (root_pc == bass_note.pitch_class)
+            distances = relative_pitches(root_pc, groups, bass_semitone)
+            matches = [(bits, bits, False) for bits in self.index.exact[relative_mask]]
+            # 5度を足すと一致するエントリ（5度抜きの音程集合そのものが辞書にある場合は、spelled 版と同じく完全一致を優先する）
+            matches.extend((bits, bits & ~P5_BIT, True) for bits in self.index.omit5[relative_mask]
+                           if (bits & ~P5_BIT) not in qualities)
+            for bits, target, is_omit5 in matches:
+                if not can_spell(root_pc, distances, target):
+                    continue
+                quality = qualities[bits]
+                category = self._get_category(is_root_pos, False, quality, root_pc, bass_note)
+                score = self._dictionary_score(category, is_root_pos, root_pc, bass_note, is_omit5)
+                candidate = ChordCandidate(category, score, "omit5" if is_omit5 else "dict", root_pc, DEFAULT_NAMES[root_pc],
+                                           f"{quality}(omit5)" if is_omit5 else quality, bass_note.pitch_name, voicing_type, is_root_pos)
+                if collector.add(candidate):
+                    targets[id(candidate)] = (root_pc, target)
+
+    def _search_rootless_pitches(self, ctx: AnalysisContext):
+        """_search_rootless の綴りを持たない版。仮想ルートの綴りも含めて、どれかの綴りで一致すればよい"""
+        groups, input_mask, bass_note, voicing_type, collector, targets = ctx.groups, ctx.input_mask, ctx.bass_note, ctx.voicing_type, ctx.collector, ctx.targets
+        missing_pcs = self.index.rootless[input_mask]
+        if not missing_pcs:
+            return
+        penalties = self._consonance_penalties(input_mask) if self.consonance is not None else None
+        qualities = self._lookups()[1]
+        bass_semitone = bass_note.absolute_semitone
+        for phantom_pc in missing_pcs:
+            relative_mask = rotate_mask(input_mask, phantom_pc) | 1
+            distances = relative_pitches(phantom_pc, groups, bass_semitone)
+            matches = [(bits, bits & ~P1_BIT, False) for bits in self.index.exact[relative_mask]]
+            matches.extend((bits, bits & ~P1_BIT & ~P5_BIT, True) for bits in self.index.omit5[relative_mask]
+                           if (bits & ~P5_BIT) not in qualities)
+            for bits, target, is_omit5 in matches:
+                quality = qualities[bits]
+                if not is_rootless_quality(quality) or not can_spell(phantom_pc, distances, target):
+                    continue
+                score = self._rootless_score(quality, is_omit5)
+                if penalties is not None:
+                    score -= penalties[phantom_pc]
+                candidate = ChordCandidate("ルートレス (Rootless)", score, "rootless", phantom_pc, DEFAULT_NAMES[phantom_pc],
+                                           f"{quality}(omit5)" if is_omit5 else quality, bass_note.pitch_name, voicing_type)
+                if collector.add(candidate):
+                    targets[id(candidate)] = (phantom_pc, target)
+
+    def _spell_pitch_candidates(self, result: AnalysisResult, groups: PitchGroups, targets: Dict[int, Tuple[int, int]]):
+        """
+        残った辞書一致の候補に、その解釈で変化記号が最も少ない綴りのルート名・ベース名を付ける。
+        結果の notes とベース名は、綴りを選んだ候補のうち最上位のものに合わせて綴り直す。
+        """
+        if not targets:
+            return
+        bass_semitone = result.notes[0].absolute_semitone
+        bass_pc = bass_semitone % 12
+        best_spelling_found = None
+        distances_by_root: Dict[int, Tuple[int, ...]] = {}
+        for candidates in result.candidates.values():
+            for i, c in enumerate(candidates):
+                target = targets.get(id(c))
+                if target is None:
+                    continue
+                root_pc, target_bits = target
+                distances = distances_by_root.get(root_pc)
+                if distances is None:
+                    distances = distances_by_root[root_pc] = relative_pitches(root_pc, groups, bass_semitone)
+                (root_step, root_alter), spelling = best_spelling(root_pc, distances, target_bits)
+                candidates[i] = replace(c, root_name=pitch_name(root_step, root_alter), bass_name=pitch_name(*spelling[bass_pc]))
+                if best_spelling_found is None or c.score > best_spelling_found[0]:
+                    best_spelling_found = (c.score, spelling)
+
+        if best_spelling_found is not None:
+            spelling = best_spelling_found[1]
+            result.notes = [n if (n.step_index, n.alter) == spelling[n.pitch_class] else spelled_note(*spelling[n.pitch_class], n.absolute_semitone)
+                            for n in result.notes]
+            result.bass_name = result.notes[0].pitch_name
+
+    def _search_rootless(self, ctx: AnalysisContext):
+        # 仮想ルートを足すとルートレス対象の辞書エントリと一致し得るピッチクラスだけを索引から一度に引く
+        input_mask = ctx.input_mask
+        missing_pcs = self.index.rootless[input_mask]
+        if not missing_pcs:
+            return
+        penalties = self._consonance_penalties(input_mask) if self.consonance is not None else None
+        phantom_map = DEFAULT_SPELLING
+        interval_id, qualities = self._lookups()
+        sorted_notes, bass_note, bass_name, voicing_type, collector = ctx.notes, ctx.bass_note, ctx.bass_name, ctx.voicing_type, ctx.collector
+
         for phantom_pc in missing_pcs:
             p_step, p_alter = phantom_map[phantom_pc]
-            phantom_root = Note(p_step, p_alter, bass_note.octave)
-            if phantom_root.absolute_semitone > bass_note.absolute_semitone:
-                phantom_root.octave -= 1
-                
-            intervals = {'P1'}
+            p_index = Note.STEP_TO_INDEX[p_step]
+            phantom_semitone = root_semitone(p_index, p_alter, bass_note)
+
+            bits = P1_BIT
             for note in sorted_notes:
-                intervals.add(get_interval(phantom_root, note))
+                bits |= 1 << interval_id(p_index, phantom_semitone, note.step_index, note.absolute_semitone)
                 
-            quality = self.chord_dictionary.get(frozenset(intervals))
+            quality = qualities.get(bits)
             is_omit5 = False
             
-            if not quality and 'P5' not in intervals:
-                intervals_with_p5 = set(intervals)
-                intervals_with_p5.add('P5')
-                quality = self.chord_dictionary.get(frozenset(intervals_with_p5))
+            if not quality and not bits & P5_BIT:
+                quality = qualities.get(bits | P5_BIT)
                 if quality: is_omit5 = True
 
-            if quality and any(ext in quality for ext in ['7', '9', '11', '13', 'dim']):
+            if quality and is_rootless_quality(quality):
                 p_alter_str = "#" if p_alter == 1 else "b" if p_alter == -1 else ""
                 root_name = f"{p_step}{p_alter_str}"
                 
-                tension_bonus = 0
-                if '9' in quality: tension_bonus += 10
-                if '11' in quality: tension_bonus += 15
-                if '13' in quality: tension_bonus += 20
-                
-                score = 30 + tension_bonus - (10 if is_omit5 else 0)
+                score = self._rootless_score(quality, is_omit5)
+                if penalties is not None:
+                    score -= penalties[phantom_pc]
                 omit_str = "(omit5)" if is_omit5 else ""
-                name = f"{root_name} {quality}{omit_str}(Rootless) / {bass_name}"
-                results["ルートレス (Rootless)"].append({"name": f"{name} ({voicing_type})", "score": score})
-
-    def _format_output(self, sorted_notes: List[Note], bass_name: str, categorized_results: Dict, threshold: int) -> str:
-        notes_str = ", ".join(str(n) for n in sorted_notes)
-        output_lines = [f"Input: [{notes_str}] (Bass: {bass_name})", "-"*40]
-        
-        has_results = False
-        for category, results in categorized_results.items():
-            filtered_results = sorted([r for r in results if r['score'] >= threshold], key=lambda x: x['score'], reverse=True)
-            
-            if filtered_results:
-                has_results = True
-                output_lines.append(f"■ {category}")
-                seen = set()
-                for res in filtered_results:
-                    if res['name'] not in seen:
-                        seen.add(res['name'])
-                        output_lines.append(f"  - {res['name']} [Score: {res['score']}]")
-
-        if not has_results:
-            output_lines.append(f"Analyzed: Unknown (No interpretation scored above {threshold})")
-            
-        output_lines.append("-" * 40)
-        return "\n".join(output_lines)
+                collector.add(ChordCandidate("ルートレス (Rootless)", score, "rootless", phantom_pc, root_name,
+                                             f"{quality}{omit_str}", bass_name, voicing_type))
+
+    def _format_output(self, result: AnalysisResult, threshold: int) -> str:
+        return result.to_text(threshold)
@@ -0,0 +1,191 @@
+from models.note import Note
+from models.result import ChordCandidate
+from engine.chord_index import PC_MASK_SIZE
+from engine.spelling import best_spelling, pitch_name, spelled_note
+from engine.top_k import PHASE_MAX_SCORES, phase_max_score
+from utils.interval_calc import INTERVAL_NAMES
+from utils.optional_numpy import np, require_numpy
+
+PAD = -1  # 音の無いセルを表すパディング値（負の値はすべて「音なし」として扱う）
+
+STEP_SEMITONES = [0, 2, 4, 5, 7, 9, 11]
+
+ROOT_POSITION = "基本形 (Root Position)"
+ROOT_POSITION_SCORE = PHASE_MAX_SCORES["normal"]  # 基本形の完全一致のスコア
+
+# 1オクターブ以上離れると別の音程IDになる度数（2度 <-> 9度 など）
+REGISTER_DEPENDENT_NUMBERS = {"2", "4", "6", "9", "11", "13"}
+
+def _natural_to_step():
+    """幹音のピッチクラス -> 音名インデックス の参照表（幹音でなければ -1）"""
+    natural_to_step = np.full(12, -1, dtype=np.int64)
+    for step_index, semitone in enumerate(STEP_SEMITONES):
+        natural_to_step[semitone] = step_index
+    return natural_to_step
+
+def _is_register_independent(bits: int) -> bool:
+    return all(INTERVAL_NAMES[i][1:] not in REGISTER_DEPENDENT_NUMBERS for i in range(bits.bit_length()) if bits >> i & 1)
+
+def _root_position_table(index):
+    """
+    ベースからの相対マスク -> 完全一致する唯一の辞書エントリの番号と、番号 -> 音程IDマスク の表。
+    エントリが無いか複数ある相対マスクと、音域で音程IDが変わる音程を含むエントリ（綴れるかが音域で変わる）は -1。
+    """
+    table = np.full(PC_MASK_SIZE, -1, dtype=np.int64)
+    targets = []
+    for relative_mask in range(1, PC_MASK_SIZE, 2):
+        entries = index.exact[relative_mask]
+        if len(entries) == 1 and _is_register_independent(entries[0]):
+            table[relative_mask] = len(targets)
+            targets.append(entries[0])
+    return table, targets
+
+def _other_phase_max_scores(analyzer, max_notes: int):
+    """(音の数, ピッチクラスの数) -> normal 以外の探索フェーズが出しうる最高スコア（top_k の枝刈りと同じ上限）"""
+    scores = np.zeros((max_notes + 1, 13), dtype=np.int64)
+    for note_count in range(1, max_notes + 1):
+        for pc_count in range(1, min(note_count, 12) + 1):
+            scores[note_count, pc_count] = max(
+                (p.max_score if p.max_score is not None else phase_max_score(p.name, note_count, pc_count)
+                 for p in analyzer.phases if p.name != "normal"), default=0)
+    return scores
+
+def batch_result_dtype():
+    return np.dtype([
+        ('root_pc', np.int8),    # ルートのピッチクラス（解釈なしは -1）
+        ('root', object),        # ルート音名
+        ('quality', object),     # コード種別
+        ('category', object),    # 基本形 / 転回形 / ... のカテゴリ
+        ('score', np.int16),
+        ('name', object),        # 表示用の完全な名前
+    ])
+
+def _empty_results(n: int):
+    results = np.zeros(n, dtype=batch_result_dtype())
+    results['root_pc'] = -1
+    for field in ('root', 'quality', 'category', 'name'):
+        results[field] = ""
+    return results
+
+def _root_position_rows(analyzer, pitches, valid, threshold: int):
+    """
+    ベースをルートとする辞書の完全一致（80点）で1位が決まる行を、表引きだけで解析する。
+    ベースからの相対ピッチクラス・マスクで ChordIndex.exact を引き、一致するエントリが1つで、
+    他のフェーズの上限スコアが 80 未満（3音以下のピッチクラスで6音以下）の行だけを対象にする。
+    ルート名はその行の音の数の内訳ごとに一度だけ綴る。
+    戻り値は (表引きで決まった行のマスク (N,), その行の結果)。
+    """
+    n = len(pitches)
+    if threshold > ROOT_POSITION_SCORE or not any(p.name == "normal" and p.search == analyzer._search_normal for p in analyzer.phases):
+        return np.zeros(n, dtype=bool), _empty_results(0)
+
+    note_counts = valid.sum(axis=1)
+    bass = pitches[:, 0]
+    # ベースからの相対ピッチクラスごとの音の数 (N, 12) と、そのピッチクラス・マスク
+    relative_pcs = np.mod(pitches - bass[:, None], 12)
+    counts = ((relative_pcs[:, :, None] == np.arange(12)) & valid[:, :, None]).sum(axis=1)
+    present = counts > 0
+    relative_masks = present @ (1 << np.arange(12))
+
+    table, targets = _root_position_table(analyzer.index)
+    entries = table[relative_masks]
+    other_scores = _other_phase_max_scores(analyzer, pitches.shape[1])[note_counts, present.sum(axis=1)]
+    rows = np.flatnonzero((note_counts > 0) & (entries >= 0) & (other_scores < ROOT_POSITION_SCORE))
+    if len(rows) == 0:
+        return np.zeros(n, dtype=bool), _empty_results(0)
+
+    is_open = pitches[rows, note_counts[rows] - 1] - bass[rows] > 12
+    keys = np.column_stack([np.mod(bass[rows], 12), entries[rows], is_open, counts[rows]])
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    unique_results = _empty_results(len(unique_keys))
+    found = np.zeros(len(unique_keys), dtype=bool)
+    for u, (root_pc, entry, key_open, *pc_counts) in enumerate(unique_keys.tolist()):
+        # 綴れるかと変化記号の最も少ない綴りは、音域に依らない音程だけなので1オクターブ内の音の数だけで決まる
+        distances = tuple(pc for pc, count in enumerate(pc_counts) for _ in range(count))
+        spelled = best_spelling(root_pc, distances, targets[entry])
+        if spelled is None:
+            continue
+        (root_step, root_alter), _ = spelled
+        quality = analyzer.index.qualities[targets[entry]]
+        if analyzer._get_category(True, False, quality, root_pc, spelled_note(root_step, root_alter, root_pc)) != ROOT_POSITION:
+            continue  # 特殊形は 75 点なので、他のフェーズの候補が上回りうる
+        root_name = pitch_name(root_step, root_alter)
+        best = ChordCandidate(ROOT_POSITION, ROOT_POSITION_SCORE, "dict", root_pc, root_name, quality, root_name,
+                              "Open" if key_open else "Closed", True)
+        unique_results[u] = (best.root_pc, best.root_name, best.quality, best.category, best.score, best.label)
+        found[u] = True
+
+    matched = np.zeros(n, dtype=bool)
+    matched[rows[found[inverse.reshape(-1)]]] = True
+    return matched, unique_results[inverse.reshape(-1)][found[inverse.reshape(-1)]]
+
+def analyze_batch(analyzer, pitches, spellings=None, threshold: int = 10):
+    """
+    (N, max_notes) の MIDIノート番号配列を一括解析する。
+    spellings は同じ形の変化記号配列（-2〜2）で、その綴りの Note として解析する。
+    省略時は analyzer.analyze_pitches で解析する（綴りを決めずに照合し、Db / F / Ab も Db メジャーと判定される）。
+    ソート・ピッチクラス・綴りの計算はバッチ全体でベクトル化する。綴りの指定が無ければ、
+    ベースをルートとする辞書の完全一致で1位が決まる行は表引きだけで解析し（_root_position_rows）、
+    残りの行を重複を除いて1行ずつ analyzer の探索フェーズで解析する。
+    戻り値は batch_result_dtype() の構造化配列 (N,)。
+    """
+    require_numpy("analyze_batch")
+
+    pitches = np.asarray(pitches, dtype=np.int64)
+    if pitches.ndim != 2:
+        raise ValueError(f"pitches must be 2-D (N, max_notes), got shape {pitches.shape}")
+    valid = pitches >= 0
+
+    if spellings is None:
+        alters = np.zeros_like(pitches)
+    else:
+        alters = np.asarray(spellings, dtype=np.int64)
+        if alters.shape != pitches.shape:
+            raise ValueError(f"spellings shape {alters.shape} does not match pitches shape {pitches.shape}")
+        alters = np.where(valid, alters, 0)
+        steps = _natural_to_step()[np.mod(pitches - alters, 12)]
+        if np.any(valid & (steps < 0)):
+            row, col = np.argwhere(valid & (steps < 0))[0]
+            raise ValueError(f"Invalid spelling: alter {alters[row, col]} for MIDI note {pitches[row, col]} (row {row})")
+
+    # 行ごとに音高順へ並べ替える（安定ソートなので同音の順序は analyze の sorted と一致する）
+    sort_keys = np.where(valid, pitches, np.iinfo(np.int64).max)
+    order = np.argsort(sort_keys, axis=1, kind='stable')
+    pitches = np.take_along_axis(pitches, order, axis=1)
+    alters = np.take_along_axis(alters, order, axis=1)
+    valid = np.take_along_axis(valid, order, axis=1)
+    if spellings is not None:
+        steps = np.take_along_axis(steps, order, axis=1)
+        octaves = (pitches - 12 - alters - np.asarray(STEP_SEMITONES)[steps]) // 12
+
+    results = _empty_results(len(pitches))
+    remaining = valid[:, 0] if pitches.shape[1] else np.zeros(len(pitches), dtype=bool)
+    if spellings is None:
+        matched, matched_results = _root_position_rows(analyzer, pitches, valid, threshold)
+        results[matched] = matched_results
+        remaining &= ~matched
+    rows = np.flatnonzero(remaining)
+    if len(rows) == 0:
+        return results
+
+    # 綴りまで同一のボイシングは一度だけ解析し、結果を全行へ配り直す（綴りの指定が無ければ音高だけで比べる）
+    keys = np.where(valid[rows], pitches[rows], PAD)
+    if spellings is not None:
+        keys = np.concatenate([keys, alters[rows]], axis=1)
+    _, first_rows, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+
+    unique_results = _empty_results(len(first_rows))
+    for u, row in enumerate(rows[first_rows]):
+        columns = [i for i in range(pitches.shape[1]) if valid[row, i]]
+        if spellings is None:
+            result = analyzer.analyze_pitches([int(pitches[row, i]) for i in columns], threshold, top_k=1)
+        else:
+            notes = [Note.from_index(int(steps[row, i]), int(alters[row, i]), int(octaves[row, i])) for i in columns]
+            result = analyzer.analyze_result(notes, threshold, top_k=1)
+        best = result.best(threshold)
+        if best is None:
+            continue
+        unique_results[u] = (best.root_pc, best.root_name, best.quality, best.category, best.score, best.label)
+
+    results[rows] = unique_results[inverse.reshape(-1)]
+    return results
@@ -0,0 +1,167 @@
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+from utils.interval_calc import interval_semitone, intervals_to_bits
+
+PC_MASK_SIZE = 4096  # 12音のピッチクラス集合 = 2^12 通り
+
+def pcs_to_mask(pcs: Iterable[int]) -> int:
+    """ピッチクラスの集合を12bitのビットマスクに変換する"""
+    mask = 0
+    for pc in pcs:
+        mask |= 1 << pc
+    return mask
+
+def rotate_mask(mask: int, root_pc: int) -> int:
+    """root_pc を 0 とみなした相対ピッチクラス・マスクに回転する"""
+    return ((mask >> root_pc) | (mask << (12 - root_pc))) & 0xFFF
+
+def intervals_to_mask(intervals: Iterable[str]) -> int:
+    """音程名の集合を、ルートからの相対ピッチクラス・マスクに変換する"""
+    mask = 0
+    for interval in intervals:
+        semitone = interval_semitone(interval)
+        if semitone is None:
+            return -1  # 未知の音程を含むエントリはどのマスクにも一致しない
+        mask |= 1 << semitone
+    return mask
+
+# 上部構造（アッパーストラクチャー）の形: ルートからの半音。トライアドに加えて4和音も試す
+UPPER_STRUCTURE_SHAPES = (
+    ("Major", (0, 4, 7)),
+    ("Minor", (0, 3, 7)),
+    ("Aug", (0, 4, 8)),
+    ("Dim", (0, 3, 6)),
+    ("Maj7", (0, 4, 7, 11)),
+    ("m7", (0, 3, 7, 10)),
+    ("7", (0, 4, 7, 10)),
+    ("m7b5", (0, 3, 6, 10)),
+)
+SEVENTH_SHAPES = {"Maj7", "m7", "7", "m7b5"}
+
+# 上部構造のルート(0〜11) -> ((形の名前, ピッチクラス・マスク), ...)
+UPPER_STRUCTURE_MASKS: List[Tuple[Tuple[str, int], ...]] = [
+    tuple((name, pcs_to_mask((root_pc + i) % 12 for i in shape)) for name, shape in UPPER_STRUCTURE_SHAPES)
+    for root_pc in range(12)
+]
+
+# ルートレスとして解釈するコード種別（7th 以上の響きを持つもの）
+ROOTLESS_EXTENSIONS = ('7', '9', '11', '13', 'dim')
+
+def is_rootless_quality(quality: str) -> bool:
+    return any(ext in quality for ext in ROOTLESS_EXTENSIONS)
+
+class ChordIndex:
+    """
+    CHORD_DICT を構築時に一度だけ展開した索引。
+    入力のピッチクラス・マスク(4096通り)を各ルートへ回転した相対マスクから、
+    辞書と一致しうる解釈を表引きで得る。音名(綴り)による最終判定は呼び出し側で行う。
+    add / remove でエントリを増減すると、そのエントリが載る行だけを書き換える（全体は作り直さない）。
+    """
+
+    def __init__(self, chord_dictionary: Dict[FrozenSet[str], str]):
+        self.chord_dictionary = chord_dictionary
+        # 音程IDのビットマスク -> コード種別（探索の最終判定はこちらを引く）
+        self.qualities: Dict[int, str] = {}
+
+        # 相対マスク -> 一致しうる辞書エントリの音程IDマスク(完全一致 / 5度省略)
+        self.exact: List[Tuple[int, ...]] = [()] * PC_MASK_SIZE
+        self.omit5: List[Tuple[int, ...]] = [()] * PC_MASK_SIZE
+
+        # 入力マスク -> 各ルート(0〜11)へ回転した相対マスク
+        self.rotations: List[Tuple[int, ...]] = [
+            tuple(rotate_mask(mask, root_pc) for root_pc in range(12))
+            for mask in range(PC_MASK_SIZE)
+        ]
+
+        for intervals, quality in chord_dictionary.items():
+            mask = intervals_to_mask(intervals)
+            if mask < 0:
+                continue
+            bits = intervals_to_bits(intervals)
+            self.qualities[bits] = quality
+            self.exact[mask] += (bits,)
+
+            # 5度抜きで入力された場合のマスク（P5を除いた音程群）
+            if 'P5' in intervals:
+                omit_mask = intervals_to_mask(intervals - {'P5'})
+                self.omit5[omit_mask] += (bits,)
+
+        # 入力マスク -> ルートレスとして一致しうる仮想ルート(入力に無いピッチクラス)の昇順タプル。
+        # ルートを抜いた相対マスク（とその5度抜き）を12通りに移調して入力マスク側から引けるようにする
+        phantoms: List[Set[int]] = [set() for _ in range(PC_MASK_SIZE)]
+        for relative_mask in range(1, PC_MASK_SIZE, 2):
+            if not self._has_rootless_entry(relative_mask):
+                continue
+            rootless_mask = relative_mask & ~1
+            for phantom_pc in range(12):
+                phantoms[rotate_mask(rootless_mask, (12 - phantom_pc) % 12)].add(phantom_pc)
+        self.rootless: List[Tuple[int, ...]] = [tuple(sorted(pcs)) for pcs in phantoms]
+
+    @classmethod
+    def copy_of(cls, index) -> 'ChordIndex':
+        """
+        他の索引（MappedChordIndex を含む）を、書き換えできるメモリ上の索引として複製する。
+        回転表は辞書に依存しないのでそのまま共有する。
+        """
+        copied = cls.__new__(cls)
+        copied.chord_dictionary = dict(index.chord_dictionary)
+        copied.qualities = dict(index.qualities)
+        copied.exact = [index.exact[mask] for mask in range(PC_MASK_SIZE)]
+        copied.omit5 = [index.omit5[mask] for mask in range(PC_MASK_SIZE)]
+        copied.rootless = [index.rootless[mask] for mask in range(PC_MASK_SIZE)]
+        copied.rotations = index.rotations
+        return copied
+
+    def add(self, intervals: FrozenSet[str], quality: str):
+        """エントリを1つ追加し、影響する表の行だけを更新する（同じ音程集合が既にあれば置き換える）"""
+        mask = intervals_to_mask(intervals)
+        if mask < 0:
+            raise ValueError(f"Unknown interval in {sorted(intervals)}")
+        if intervals in self.chord_dictionary:
+            self.remove(intervals)
+
+        bits = intervals_to_bits(intervals)
+        self.chord_dictionary[intervals] = quality
+        self.qualities[bits] = quality
+        self.exact[mask] += (bits,)
+        self._update_rootless(mask)
+        if 'P5' in intervals:
+            omit_mask = intervals_to_mask(intervals - {'P5'})
+            self.omit5[omit_mask] += (bits,)
+            self._update_rootless(omit_mask)
+
+    def remove(self, intervals: FrozenSet[str]) -> str:
+        """エントリを1つ取り除き、そのコード種別を返す（無ければ KeyError）"""
+        quality = self.chord_dictionary.pop(intervals)
+        bits = intervals_to_bits(intervals)
+        del self.qualities[bits]
+        mask = intervals_to_mask(intervals)
+        self.exact[mask] = tuple(b for b in self.exact[mask] if b != bits)
+        self._update_rootless(mask)
+        if 'P5' in intervals:
+            omit_mask = intervals_to_mask(intervals - {'P5'})
+            self.omit5[omit_mask] = tuple(b for b in self.omit5[omit_mask] if b != bits)
+            self._update_rootless(omit_mask)
+        return quality
+
+    def _has_rootless_entry(self, relative_mask: int) -> bool:
+        return any(is_rootless_quality(self.qualities[bits])
+                   for bits in self.exact[relative_mask] + self.omit5[relative_mask])
+
+    def _update_rootless(self, relative_mask: int):
+        """相対マスク1つ分の変更を、それを移調した12個の入力マスクのルートレス表へ反映する"""
+        if not relative_mask & 1:
+            return  # ルート(P1)を含まないマスクはルートレスの対象外
+        matches = self._has_rootless_entry(relative_mask)
+        rootless_mask = relative_mask & ~1
+        for phantom_pc in range(12):
+            mask = rotate_mask(rootless_mask, (12 - phantom_pc) % 12)
+            phantoms = set(self.rootless[mask])
+            if matches:
+                phantoms.add(phantom_pc)
+            else:
+                phantoms.discard(phantom_pc)
+            self.rootless[mask] = tuple(sorted(phantoms))
+
+    def may_match(self, relative_mask: int) -> bool:
+        """相対マスクが辞書のいずれか(完全一致 or 5度省略)と一致しうるか"""
+        return bool(self.exact[relative_mask] or self.omit5[relative_mask])
@@ -0,0 +1,103 @@
+"""
+INTERVAL_INFO_DICT の純正律の周波数比から、和音の粗さ（roughness, 不協和の度合い）を求める。
+
+音程クラス(1〜6)ごとの粗さは、その比の2つの倍音列の部分音どうしのうなりを
+Plomp-Levelt 曲線（Sethares の近似式）で合計したもので、起動時に NumPy で一度だけ計算する。
+和音の粗さは、全音対の音程クラス・ベクトル(6要素)とこの表の内積で、音程クラス・ベクトルごとにキャッシュする。
+移調・転回で音程クラス・ベクトルは変わらないので、異なるベクトルはピッチクラス集合 4096 通りに対して約200個しかない。
+"""
+from typing import Dict, Optional, Tuple
+from dictionaries.interval_dict import INTERVAL_INFO_DICT
+from utils.interval_calc import INTERVAL_SEMITONES
+from utils.optional_numpy import np, require_numpy
+
+REFERENCE_FREQUENCY = 261.63  # 下の音を C4 に置いて計算する
+HARMONICS = 6                 # 各音の倍音の数
+AMPLITUDE_DECAY = 0.88        # 第 n 倍音の振幅は AMPLITUDE_DECAY ** (n - 1)
+
+def _partial_roughness(ratios):
+    """周波数比の配列 (n,) -> 2つの倍音列のあいだの粗さ (n,)（Sethares の Plomp-Levelt 近似）"""
+    harmonics = np.arange(1, HARMONICS + 1)
+    amplitudes = AMPLITUDE_DECAY ** (harmonics - 1)
+    f1 = REFERENCE_FREQUENCY * harmonics                              # (H,)
+    f2 = REFERENCE_FREQUENCY * np.asarray(ratios)[:, None] * harmonics  # (n, H)
+    low = np.minimum(f1[None, :, None], f2[:, None, :])               # (n, H, H)
+    diff = np.abs(f2[:, None, :] - f1[None, :, None])
+    s = 0.24 / (0.021 * low + 19)
+    weights = amplitudes[:, None] * amplitudes[None, :]
+    return (weights * (np.exp(-3.5 * s * diff) - np.exp(-5.75 * s * diff))).sum(axis=(1, 2))
+
+def _interval_class_roughness():
+    """音程クラス 0〜6 の粗さ (7,)。同じ音程クラスになる音程（転回・異名同音）の平均で、最大を 1 に正規化する"""
+    ratios = {ic: [] for ic in range(7)}
+    for name, info in INTERVAL_INFO_DICT.items():
+        semitone = INTERVAL_SEMITONES.get(name)
+        if semitone is None or int(name[1:]) > 7:
+            continue  # オクターブ・複合音程は単音程と同じ音程クラスの比を重ねて数えない
+        numerator, denominator = info['ratio']
+        ratios[min(semitone, 12 - semitone)].append(numerator / denominator)
+
+    table = np.zeros(7)
+    for ic in range(1, 7):
+        table[ic] = _partial_roughness(ratios[ic]).mean()
+    return table / table.max()
+
+def interval_class_vectors(pc_masks):
+    """ピッチクラス・マスクの配列 (n,) -> 全音対の音程クラス(1〜6)の個数 (n, 6)"""
+    require_numpy("粗さの計算")
+    bits = (np.asarray(pc_masks, dtype=np.int64)[:, None] >> np.arange(12)) & 1  # (n, 12)
+    counts = np.stack([(bits * np.roll(bits, -ic, axis=1)).sum(axis=1) for ic in range(1, 7)], axis=1)
+    counts[:, 5] //= 2  # 三全音は両方向から同じ対を数えている
+    return counts
+
+def interval_class_vector(pc_mask: int) -> Tuple[int, ...]:
+    pcs = [pc for pc in range(12) if pc_mask >> pc & 1]
+    counts = [0] * 6
+    for i, a in enumerate(pcs):
+        for b in pcs[i + 1:]:
+            diff = b - a
+            counts[min(diff, 12 - diff) - 1] += 1
+    return tuple(counts)
+
+class ConsonanceModel:
+    """ピッチクラス集合の粗さ。音程クラス・ベクトルごとに一度だけ計算する"""
+
+    def __init__(self):
+        require_numpy("粗さの計算")
+        self.interval_class_roughness = _interval_class_roughness()[1:]
+        self._by_vector: Dict[Tuple[int, ...], float] = {}
+        self._by_mask: Dict[int, float] = {}
+
+    def roughness(self, pc_mask: int) -> float:
+        """ピッチクラス・マスクの和音の粗さ（全音対の粗さの合計。音が1つ以下なら 0）"""
+        value = self._by_mask.get(pc_mask)
+        if value is None:
+            vector = interval_class_vector(pc_mask)
+            value = self._by_vector.get(vector)
+            if value is None:
+                value = self._by_vector[vector] = float(np.dot(vector, self.interval_class_roughness))
+            self._by_mask[pc_mask] = value
+        return value
+
+    def roughness_batch(self, pc_masks):
+        """ピッチクラス・マスクの配列 (n,) の粗さ (n,)。未計算の音程クラス・ベクトルだけをまとめて計算する"""
+        vectors = interval_class_vectors(pc_masks)
+        if len(vectors) == 0:
+            return np.zeros(0)
+        unique, inverse = np.unique(vectors, axis=0, return_inverse=True)
+        keys = [tuple(int(x) for x in row) for row in unique]
+        missing = [i for i, key in enumerate(keys) if key not in self._by_vector]
+        if missing:
+            for i, value in zip(missing, unique[missing] @ self.interval_class_roughness):
+                self._by_vector[keys[i]] = float(value)
+        values = np.array([self._by_vector[key] for key in keys])
+        return values[inverse.reshape(-1)]
+
+_shared_model: Optional[ConsonanceModel] = None
+
+def shared_model() -> ConsonanceModel:
+    """プロセス内で共有するモデル（表とキャッシュを解析器どうしで使い回す）"""
+    global _shared_model
+    if _shared_model is None:
+        _shared_model = ConsonanceModel()
+    return _shared_model
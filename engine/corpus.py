@@ -0,0 +1,89 @@
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from models.note import parse_notes
+from engine.analyzer import ChordAnalyzer
+from dictionaries.chord_loader import ChordDefinitions
+
+# ワーカープロセスごとに1つだけ作る解析器（辞書索引・キャッシュをプロセス内で使い回す）
+_worker_analyzer: Optional[ChordAnalyzer] = None
+
+def _init_worker(chord_definitions: Sequence[ChordDefinitions] = ()):
+    global _worker_analyzer
+    _worker_analyzer = make_analyzer(chord_definitions)
+
+def make_analyzer(chord_definitions: Sequence[ChordDefinitions] = (), **options) -> ChordAnalyzer:
+    """ユーザー定義のコード（read_chord_definitions の結果の列）を順に反映した解析器を作る（options は ChordAnalyzer へ渡す）"""
+    analyzer = ChordAnalyzer(**options)
+    for additions, removals in chord_definitions:
+        analyzer.apply_chord_definitions(additions, removals)
+    return analyzer
+
+def analyze_record(analyzer: ChordAnalyzer, line: str, threshold: int, top_k: Optional[int] = None) -> dict:
+    """1行（parse_notes 形式の音名リスト）を解析し、JSON にできる dict にして返す（top_k 指定時は上位 K 件だけ）"""
+    record = {"input": line}
+    try:
+        record.update(analyzer.analyze_result(parse_notes(line), threshold, top_k=top_k).to_dict(threshold))
+    except ValueError as e:
+        record["error"] = str(e)
+    return record
+
+def analyze_line(analyzer: ChordAnalyzer, line_no: int, line: str, threshold: int, top_k: Optional[int] = None) -> str:
+    """analyze_record の結果に行番号を付けて JSON 1行にして返す"""
+    record = {"line": line_no}
+    record.update(analyze_record(analyzer, line, threshold, top_k))
+    return json.dumps(record, ensure_ascii=False)
+
+def _analyze_chunk(chunk: List[Tuple[int, str]], threshold: int, top_k: Optional[int] = None) -> List[str]:
+    if _worker_analyzer is None:
+        _init_worker()
+    return [analyze_line(_worker_analyzer, line_no, line, threshold, top_k) for line_no, line in chunk]
+
+def _analyze_records(lines: List[str], threshold: int, top_k: Optional[int] = None) -> List[dict]:
+    if _worker_analyzer is None:
+        _init_worker()
+    return [analyze_record(_worker_analyzer, line, threshold, top_k) for line in lines]
+
+def _numbered_lines(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """空行を除いた (行番号, 行) を返す。行番号は入力全体で 1 始まり"""
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if line:
+            yield line_no, line
+
+def _chunks(items: Iterator, size: int) -> Iterator[list]:
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+def analyze_corpus(lines: Iterable[str], jobs: int = 1, chunk_size: int = 256, threshold: int = 10,
+                   top_k: Optional[int] = None, chord_definitions: Sequence[ChordDefinitions] = ()) -> Iterator[str]:
+    """
+    音名リストの行を解析し、入力順に JSON Lines の行を返すジェネレータ。
+    jobs > 1 ならチャンク単位でプロセスプールへ分配する。未完了のチャンク数を jobs の数倍に抑え、
+    巨大な入力でもメモリを使い切らないようにする。
+    chord_definitions はユーザー定義のコード（各ワーカーの解析器にも同じものを反映する）。
+    """
+    chunks = _chunks(_numbered_lines(lines), chunk_size)
+
+    if jobs <= 1:
+        analyzer = make_analyzer(chord_definitions)
+        for chunk in chunks:
+            for line_no, line in chunk:
+                yield analyze_line(analyzer, line_no, line, threshold, top_k)
+        return
+
+    max_pending = jobs * 4
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(tuple(chord_definitions),)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_analyze_chunk, chunk, threshold, top_k))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -1,8 +1,27 @@
-from typing import Set, List
+from functools import lru_cache
+from typing import Set, List, Tuple
+from utils.interval_calc import intervals_to_bits, bits_to_intervals
+
+# generate_chord_names が参照する音程（これ以外の音程の有無は結果を変えない）
+RULE_INTERVALS = ('M3', 'm3', 'M7', 'm7', 'P5', 'd5', 'A5', 'd7',
+                  'm9', 'M9', 'A9', 'P11', 'A11', 'm13', 'M13')
+RULE_BITS = intervals_to_bits(RULE_INTERVALS)
+
+@lru_cache(maxsize=None)
+def _compiled_chord_names(rule_bits: int) -> Tuple[str, ...]:
+    return tuple(RuleBasedGenerator.generate_chord_names(bits_to_intervals(rule_bits)))
 
 class RuleBasedGenerator:
     """辞書にない未知のテンション和音を、骨格とテンションに分解して動的生成するクラス"""
 
+    @staticmethod
+    def chord_names_for_bits(bits: int) -> Tuple[str, ...]:
+        """
+        音程IDマスクから generate_chord_names と同じ名前を返す。
+        規則が参照する音程のビットだけを鍵にして、組み合わせごとに一度だけ生成した結果を使い回す。
+        """
+        return _compiled_chord_names(bits & RULE_BITS)
+
     @staticmethod
     def generate_chord_names(intervals: Set[str]) -> List[str]:
         # 1. 骨格の判定（3度、5度、7度の組み合わせ）
@@ -0,0 +1,229 @@
+"""
+ChordIndex をバイナリファイルへ書き出し、mmap で読み込むためのモジュール。
+
+    python -m engine.index_file                 # dictionaries/chord_index.bin を作る
+    python -m engine.index_file -o /tmp/x.bin   # 出力先を指定
+
+読み込んだ索引の 4096 通りの表（完全一致 / 5度省略 / ルートレス / 回転）は mmap 上のまま参照するので、
+プロセスごとに表を組み立て直さず、同じファイルを開いた複数のワーカーはページキャッシュを共有する。
+プロセスごとに作るのは「音程IDマスク -> コード種別」の辞書（エントリ数ぶん）だけ。
+ファイルの辞書が現在の辞書と一致しない場合（辞書を編集した後など）は読み込まずにメモリ上で索引を作る。
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from engine.chord_index import ChordIndex, PC_MASK_SIZE
+from utils.interval_calc import INTERVAL_NAMES, intervals_to_bits, bits_to_intervals
+
+MAGIC = b"CHIX"
+FORMAT_VERSION = 1
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dictionaries", "chord_index.bin")
+
+# magic, version, エントリ数, 辞書の指紋(sha1), 各セクションの開始位置(7個)
+_HEADER = struct.Struct("<4sHI20s7I")
+_BITS_SIZE = 16  # 音程IDマスク（97bit）を 128bit で格納する
+
+def dictionary_fingerprint(chord_dictionary: Dict[FrozenSet[str], str]) -> bytes:
+    """辞書の内容と音程IDの割り当てから決まる指紋（どちらかが変わればファイルは使えない）"""
+    h = hashlib.sha1()
+    h.update("\n".join(INTERVAL_NAMES).encode("utf-8"))
+    for bits, quality in sorted((intervals_to_bits(i), q) for i, q in chord_dictionary.items()):
+        h.update(f"\n{bits:x}={quality}".encode("utf-8"))
+    return h.digest()
+
+def _csr(table: List[Tuple[int, ...]], entry_ids: Dict[int, int]) -> Tuple[array, array]:
+    """マスク -> エントリ列の表を (開始位置 4097個, エントリ番号) の2つの配列にする"""
+    starts, ids = array("I", [0]), array("H")
+    for entries in table:
+        ids.extend(entry_ids[bits] for bits in entries)
+        starts.append(len(ids))
+    return starts, ids
+
+def write_index(index: ChordIndex, path: str = DEFAULT_INDEX_PATH):
+    """索引をファイルへ書き出す（一時ファイルに書いてから置き換えるので、読み込み中のプロセスを壊さない）"""
+    entries = sorted(index.qualities.items())
+    entry_ids = {bits: i for i, (bits, _) in enumerate(entries)}
+
+    strings = bytearray()
+    string_refs = array("I")
+    bits_blob = bytearray()
+    for bits, quality in entries:
+        encoded = quality.encode("utf-8")
+        string_refs.extend((len(strings), len(encoded)))
+        strings += encoded
+        bits_blob += bits.to_bytes(_BITS_SIZE, "little")
+
+    exact_starts, exact_ids = _csr(index.exact, entry_ids)
+    omit5_starts, omit5_ids = _csr(index.omit5, entry_ids)
+    rootless = array("H", (sum(1 << pc for pc in pcs) for pcs in index.rootless))
+    rotations = array("H", (r for rotated in index.rotations for r in rotated))
+
+    sections = [bytes(bits_blob), string_refs.tobytes() + bytes(strings),
+                exact_starts.tobytes(), exact_ids.tobytes(), omit5_starts.tobytes(), omit5_ids.tobytes(),
+                rootless.tobytes() + rotations.tobytes()]
+    offsets, position = [], _HEADER.size
+    for section in sections:
+        position += (-position) % 8  # 各セクションを8バイト境界に揃える
+        offsets.append(position)
+        position += len(section)
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), dictionary_fingerprint(index.chord_dictionary), *offsets)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for offset, section in zip(offsets, sections):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(section)
+    os.replace(tmp_path, path)
+
+class _MappedEntries:
+    """mmap 上の「マスク -> 辞書エントリの音程IDマスク列」表（ChordIndex.exact / omit5 と同じ引き方ができる）"""
+
+    def __init__(self, starts: memoryview, ids: memoryview, entry_bits: List[int]):
+        self._starts = starts
+        self._ids = ids
+        self._entry_bits = entry_bits
+
+    def __getitem__(self, mask: int) -> Tuple[int, ...]:
+        start, end = self._starts[mask], self._starts[mask + 1]
+        if start == end:
+            return ()
+        entry_bits = self._entry_bits
+        return tuple(entry_bits[i] for i in self._ids[start:end])
+
+    def __len__(self) -> int:
+        return PC_MASK_SIZE
+
+    def any(self, mask: int) -> bool:
+        return self._starts[mask] != self._starts[mask + 1]
+
+class _MappedRootless:
+    """入力マスク -> 仮想ルートの昇順タプル（ファイルには12bitのマスクで持つ）"""
+
+    def __init__(self, masks: memoryview):
+        self._masks = masks
+
+    def __getitem__(self, mask: int) -> Tuple[int, ...]:
+        phantoms = self._masks[mask]
+        if not phantoms:
+            return ()
+        return tuple(pc for pc in range(12) if phantoms >> pc & 1)
+
+    def __len__(self) -> int:
+        return PC_MASK_SIZE
+
+class _MappedRotations:
+    """入力マスク -> 各ルートへ回転した相対マスクの12個組"""
+
+    def __init__(self, rotations: memoryview):
+        self._rotations = rotations
+
+    def __getitem__(self, mask: int) -> Tuple[int, ...]:
+        base = mask * 12
+        return tuple(self._rotations[base:base + 12])
+
+    def __len__(self) -> int:
+        return PC_MASK_SIZE
+
+class MappedChordIndex:
+    """
+    write_index で書き出したファイルを mmap した ChordIndex 互換の索引。
+    qualities / exact / omit5 / rootless / rotations / may_match を ChordIndex と同じように使える。
+    """
+
+    def __init__(self, path: str, buffer: mmap.mmap, fingerprint: bytes, qualities: Dict[int, str],
+                 exact: _MappedEntries, omit5: _MappedEntries, rootless: _MappedRootless, rotations: _MappedRotations):
+        self.path = path
+        self.fingerprint = fingerprint
+        self._buffer = buffer
+        self.qualities = qualities
+        self.exact = exact
+        self.omit5 = omit5
+        self.rootless = rootless
+        self.rotations = rotations
+        self._chord_dictionary: Optional[Dict[FrozenSet[str], str]] = None
+
+    @property
+    def chord_dictionary(self) -> Dict[FrozenSet[str], str]:
+        """ファイルから復元した辞書（必要になったときに一度だけ作る）"""
+        if self._chord_dictionary is None:
+            self._chord_dictionary = {frozenset(bits_to_intervals(bits)): q for bits, q in self.qualities.items()}
+        return self._chord_dictionary
+
+    def may_match(self, relative_mask: int) -> bool:
+        return self.exact.any(relative_mask) or self.omit5.any(relative_mask)
+
+def load_index(path: str = DEFAULT_INDEX_PATH, chord_dictionary: Optional[Dict[FrozenSet[str], str]] = None) -> MappedChordIndex:
+    """
+    索引ファイルを mmap で開く。chord_dictionary を渡すと指紋を照合し、一致しなければ ValueError。
+    ファイルが無ければ OSError。
+    """
+    if sys.byteorder != "little":
+        raise ValueError("Index files are little-endian; build the index in memory on this platform")
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(buffer) < _HEADER.size:
+        raise ValueError(f"Truncated index file: '{path}'")
+    magic, version, entry_count, fingerprint, *offsets = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported index file: '{path}'")
+    if chord_dictionary is not None and fingerprint != dictionary_fingerprint(chord_dictionary):
+        raise ValueError(f"Index file is stale: '{path}'")
+
+    bits_at, strings_at, exact_at, exact_ids_at, omit5_at, omit5_ids_at, tables_at = offsets
+    if tables_at + PC_MASK_SIZE * 13 * 2 > len(buffer):
+        raise ValueError(f"Truncated index file: '{path}'")
+    view = memoryview(buffer)
+    entry_bits = [int.from_bytes(view[bits_at + i * _BITS_SIZE:bits_at + (i + 1) * _BITS_SIZE], "little")
+                  for i in range(entry_count)]
+    refs = view[strings_at:strings_at + entry_count * 8].cast("I")
+    blob_at = strings_at + entry_count * 8
+    qualities = {
+        bits: bytes(view[blob_at + refs[2 * i]:blob_at + refs[2 * i] + refs[2 * i + 1]]).decode("utf-8")
+        for i, bits in enumerate(entry_bits)
+    }
+
+    def csr(starts_at: int, ids_at: int) -> _MappedEntries:
+        starts = view[starts_at:starts_at + (PC_MASK_SIZE + 1) * 4].cast("I")
+        ids = view[ids_at:ids_at + starts[PC_MASK_SIZE] * 2].cast("H")
+        return _MappedEntries(starts, ids, entry_bits)
+
+    rootless = view[tables_at:tables_at + PC_MASK_SIZE * 2].cast("H")
+    rotations_at = tables_at + PC_MASK_SIZE * 2
+    rotations = view[rotations_at:rotations_at + PC_MASK_SIZE * 12 * 2].cast("H")
+    return MappedChordIndex(path, buffer, fingerprint, qualities, csr(exact_at, exact_ids_at),
+                            csr(omit5_at, omit5_ids_at), _MappedRootless(rootless), _MappedRotations(rotations))
+
+# プロセス内で共有する既定の索引: id(辞書) -> (辞書, 索引)
+_default_indexes: Dict[int, tuple] = {}
+
+def default_index(chord_dictionary: Dict[FrozenSet[str], str], path: str = DEFAULT_INDEX_PATH):
+    """
+    chord_dictionary の索引を返す。最新の索引ファイルがあれば mmap で読み、無ければメモリ上に作る。
+    同じプロセスの解析器どうしは同じ索引を使い回す。
+    """
+    cached = _default_indexes.get(id(chord_dictionary))
+    if cached is not None and cached[0] is chord_dictionary:
+        return cached[1]
+    try:
+        index = load_index(path, chord_dictionary)
+    except (OSError, ValueError):
+        index = ChordIndex(chord_dictionary)
+    _default_indexes[id(chord_dictionary)] = (chord_dictionary, index)
+    return index
+
+def main(argv=None):
+    from dictionaries.chord_dict import CHORD_DICT
+    parser = argparse.ArgumentParser(description="コード辞書の索引をバイナリファイルに書き出す")
+    parser.add_argument("-o", "--output", default=DEFAULT_INDEX_PATH, help="出力先")
+    args = parser.parse_args(argv)
+    write_index(ChordIndex(CHORD_DICT), args.output)
+    print(f"Wrote {args.output} ({os.path.getsize(args.output)} bytes, {len(CHORD_DICT)} chords)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+ChordAnalyzer のフェーズ別プロファイラ。
+
+    profiler = AnalysisProfiler()
+    analyzer = ChordAnalyzer(tracer=profiler)
+    ...
+    profiler.snapshot()       # dict
+    profiler.to_prometheus()  # Prometheus のテキスト形式
+
+フェーズ（normal / rootless / ust / fallback / format）ごとに、呼び出し回数・累計時間・追加候補数と、
+音程計算(interval_id)の回数・辞書（音程IDマスク -> コード種別）の一致 / 不一致の回数を累計する。
+入力音数ごとの回数と時間も持つので、遅い解析がどのフェーズ・どの大きさの和音で起きているかを切り分けられる。
+回数を数える版の関数・辞書に差し替えるのは tracer にこれを渡した解析器だけで、tracer を渡さない解析器には影響しない。
+"""
+from typing import Dict, List, Mapping, Optional, Tuple
+from engine.tracing import AnalysisTracer, IntervalFunction, PhaseEvent
+
+PHASE_FIELDS = ("calls", "seconds", "candidates", "interval_calls", "dictionary_hits", "dictionary_misses")
+
+# (snapshot のキー, メトリクス名, 種類, 説明)
+_METRICS = (
+    ("calls", "phase_calls_total", "counter", "Number of times each analysis phase ran."),
+    ("seconds", "phase_seconds_total", "counter", "Cumulative wall time spent in each analysis phase."),
+    ("candidates", "phase_candidates_total", "counter", "Chord candidates added by each analysis phase."),
+    ("interval_calls", "interval_calls_total", "counter", "Interval computations performed by each analysis phase."),
+    ("dictionary_hits", "dictionary_hits_total", "counter", "Chord dictionary lookups that found a quality."),
+    ("dictionary_misses", "dictionary_misses_total", "counter", "Chord dictionary lookups that found nothing."),
+)
+
+class _CountingQualities:
+    """「音程IDマスク -> コード種別」の辞書を引いた回数を、見つかったかどうかで分けて数える"""
+    __slots__ = ("_qualities", "_counts")
+
+    def __init__(self, qualities: Mapping[int, str], counts: List[int]):
+        self._qualities = qualities
+        self._counts = counts  # [音程計算, 一致, 不一致]
+
+    def get(self, bits: int, default: Optional[str] = None) -> Optional[str]:
+        quality = self._qualities.get(bits)
+        if quality is None:
+            self._counts[2] += 1
+            return default
+        self._counts[1] += 1
+        return quality
+
+    def __getitem__(self, bits: int) -> str:
+        quality = self.get(bits)
+        if quality is None:
+            raise KeyError(bits)
+        return quality
+
+    def __contains__(self, bits: int) -> bool:
+        return self.get(bits) is not None
+
+class AnalysisProfiler(AnalysisTracer):
+    """フェーズ別の累計を集める tracer（ChordAnalyzer(tracer=AnalysisProfiler()) として使う）"""
+
+    def __init__(self, namespace: str = "chord_analyzer"):
+        self.namespace = namespace
+        self.phases: Dict[str, Dict[str, float]] = {}
+        # フェーズ -> 入力音数 -> [回数, 累計時間]
+        self.by_note_count: Dict[str, Dict[int, List[float]]] = {}
+        # 実行中のフェーズの [音程計算, 辞書の一致, 辞書の不一致]
+        self._counts = [0, 0, 0]
+
+    def on_phase_start(self, phase: str) -> None:
+        self._counts[:] = (0, 0, 0)
+
+    def on_phase(self, event: PhaseEvent) -> None:
+        stat = self.phases.get(event.phase)
+        if stat is None:
+            stat = self.phases[event.phase] = dict.fromkeys(PHASE_FIELDS, 0)
+            stat["seconds"] = 0.0
+        interval_calls, hits, misses = self._counts
+        stat["calls"] += 1
+        stat["seconds"] += event.elapsed
+        stat["candidates"] += event.candidates
+        stat["interval_calls"] += interval_calls
+        stat["dictionary_hits"] += hits
+        stat["dictionary_misses"] += misses
+        self._counts[:] = (0, 0, 0)
+
+        by_size = self.by_note_count.setdefault(event.phase, {}).setdefault(event.note_count, [0, 0.0])
+        by_size[0] += 1
+        by_size[1] += event.elapsed
+
+    def instrument(self, interval_id: IntervalFunction, qualities: Mapping[int, str]) -> Tuple[IntervalFunction, Mapping[int, str]]:
+        counts = self._counts
+
+        def counted_interval_id(root_step_index: int, root_semitone: int, target_step_index: int, target_semitone: int) -> int:
+            counts[0] += 1
+            return interval_id(root_step_index, root_semitone, target_step_index, target_semitone)
+
+        return counted_interval_id, _CountingQualities(qualities, counts)
+
+    def reset(self):
+        self.phases.clear()
+        self.by_note_count.clear()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """{フェーズ: {calls, seconds, candidates, interval_calls, dictionary_hits, dictionary_misses, by_note_count}} の複製"""
+        return {
+            phase: dict(stat, by_note_count={
+                notes: {"calls": calls, "seconds": seconds}
+                for notes, (calls, seconds) in sorted(self.by_note_count.get(phase, {}).items())
+            })
+            for phase, stat in self.phases.items()
+        }
+
+    def to_prometheus(self) -> str:
+        """Prometheus のテキスト形式（フェーズを phase ラベル、入力音数を notes ラベルにする）"""
+        lines = []
+        for key, metric, kind, help_text in _METRICS:
+            name = f"{self.namespace}_{metric}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for phase, stat in self.phases.items():
+                lines.append(f'{name}{{phase="{phase}"}} {stat[key]}')
+
+        for index, (metric, help_text) in enumerate((
+                ("phase_note_count_calls_total", "Number of times each analysis phase ran, by input note count."),
+                ("phase_note_count_seconds_total", "Cumulative wall time per analysis phase, by input note count."))):
+            name = f"{self.namespace}_{metric}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for phase, by_size in self.by_note_count.items():
+                for notes, values in sorted(by_size.items()):
+                    lines.append(f'{name}{{phase="{phase}",notes="{notes}"}} {values[index]}')
+        return "\n".join(lines) + "\n"
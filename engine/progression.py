@@ -0,0 +1,202 @@
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+from models.note import Note, DEFAULT_SPELLING
+from models.result import AnalysisResult, ChordCandidate
+from engine.analyzer import ChordAnalyzer
+from engine.chord_index import pcs_to_mask
+
+# Krumhansl-Kessler の調性プロファイル（主音から半音ずつ）
+MAJOR_PROFILE = (6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88)
+MINOR_PROFILE = (6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17)
+
+# 各調の音階上の度数(主音からの半音) -> (度数, 和音の性格)。短調はV・VIIを和声的短音階で扱う
+DIATONIC_DEGREES = {
+    "major": {0: (1, "major"), 2: (2, "minor"), 4: (3, "minor"), 5: (4, "major"),
+              7: (5, "major"), 9: (6, "minor"), 11: (7, "dim")},
+    "minor": {0: (1, "minor"), 2: (2, "dim"), 3: (3, "major"), 5: (4, "minor"),
+              7: (5, "major"), 8: (6, "major"), 10: (7, "major"), 11: (7, "dim")},
+}
+# トニック・サブドミナント・ドミナントの主要三和音
+PRIMARY_DEGREES = {1, 4, 5}
+ROMAN_NUMERALS = ("I", "II", "III", "IV", "V", "VI", "VII")
+
+# 文脈による加点（キー推定の確からしさを掛けて使う）
+DIATONIC_BONUS = 8   # ルートが音階上にあり、和音の性格（長・短・減）も一致
+PRIMARY_BONUS = 4    # さらに主要三和音（I, IV, V）
+NON_DIATONIC_PENALTY = 5  # ルートが音階外
+
+def _correlation(xs: Sequence[float], ys: Sequence[float]) -> float:
+    n = len(xs)
+    mx = sum(xs) / n
+    my = sum(ys) / n
+    cov = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    vx = sum((x - mx) ** 2 for x in xs)
+    vy = sum((y - my) ** 2 for y in ys)
+    if vx == 0 or vy == 0:
+        return 0.0
+    return cov / (vx * vy) ** 0.5
+
+@dataclass(slots=True, frozen=True)
+class KeyEstimate:
+    tonic_pc: int
+    mode: str          # "major" / "minor"
+    confidence: float  # プロファイルとの相関係数（-1〜1）
+
+    @property
+    def name(self) -> str:
+        step, alter = DEFAULT_SPELLING[self.tonic_pc]
+        return f"{step}{'#' if alter == 1 else 'b' if alter == -1 else ''} {self.mode}"
+
+def estimate_key(pc_weights: Sequence[float]) -> Optional[KeyEstimate]:
+    """ピッチクラスごとの重み(12個)から、相関が最も高い長調・短調(24通り)を選ぶ。音が無ければ None"""
+    if not any(pc_weights):
+        return None
+    best = None
+    for mode, profile in (("major", MAJOR_PROFILE), ("minor", MINOR_PROFILE)):
+        for tonic in range(12):
+            rotated = [pc_weights[(tonic + i) % 12] for i in range(12)]
+            r = _correlation(rotated, profile)
+            if best is None or r > best.confidence:
+                best = KeyEstimate(tonic, mode, r)
+    return best
+
+def chord_character(root_pc: int, input_mask: int) -> Optional[str]:
+    """入力音のピッチクラスから、root_pc 上の和音の性格（長・短・減）を判定する。3度が決まらなければ None"""
+    has_M3 = input_mask >> ((root_pc + 4) % 12) & 1
+    has_m3 = input_mask >> ((root_pc + 3) % 12) & 1
+    if has_M3 and not has_m3:
+        return "major"
+    if has_m3 and not has_M3:
+        has_P5 = input_mask >> ((root_pc + 7) % 12) & 1
+        has_d5 = input_mask >> ((root_pc + 6) % 12) & 1
+        return "dim" if has_d5 and not has_P5 else "minor"
+    return None
+
+def roman_numeral(candidate: ChordCandidate, key: KeyEstimate, input_mask: int) -> str:
+    """候補のルートを調の度数で表す（長和音は大文字、短・減和音は小文字、音階外は ♭/♯ 付き）"""
+    offset = (candidate.root_pc - key.tonic_pc) % 12
+    degrees = DIATONIC_DEGREES[key.mode]
+    if offset in degrees:
+        prefix, degree = "", degrees[offset][0]
+    elif (offset + 1) % 12 in degrees:
+        prefix, degree = "b", degrees[(offset + 1) % 12][0]
+    else:
+        prefix, degree = "#", degrees[(offset - 1) % 12][0]
+    numeral = ROMAN_NUMERALS[degree - 1]
+    character = chord_character(candidate.root_pc, input_mask)
+    if character == "minor":
+        numeral = numeral.lower()
+    elif character == "dim":
+        numeral = numeral.lower() + "°"
+    return prefix + numeral
+
+@dataclass(slots=True)
+class ProgressionFrame:
+    """進行中の1つの和音。同じボイシングのフレームは result / best を共有する"""
+    index: int
+    notes: List[Note]
+    result: AnalysisResult
+    best: Optional[ChordCandidate]
+    degree: str = ""   # 推定した調での度数（調が推定できなければ空）
+
+@dataclass(slots=True)
+class ProgressionAnalysis:
+    frames: List[ProgressionFrame]
+    key: Optional[KeyEstimate]
+    distinct_voicings: int
+
+    def to_text(self) -> str:
+        key_name = f"{self.key.name} (r={self.key.confidence:.2f})" if self.key else "Unknown"
+        lines = [f"Key: {key_name}", "-" * 40]
+        for frame in self.frames:
+            label = f"{frame.best.label} [Score: {frame.best.score}]" if frame.best else "Unknown"
+            degree = f" {frame.degree}" if frame.degree else ""
+            lines.append(f"{frame.index + 1:4d}:{degree} {label}")
+        lines.append("-" * 40)
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return self.to_text()
+
+class ChordProgressionAnalyzer:
+    """
+    和音の列（曲のコードトラックなど）をまとめて解析する。
+    1. 同じボイシングは1回だけ解析し（移調・同形のボイシングは ChordAnalyzer のキャッシュが拾う）、
+    2. 列全体のピッチクラス分布から調を推定し、
+    3. 調の中での度数・和音の性格に合う解釈を加点して並べ替える（異なるボイシングごとに1回）。
+    """
+
+    def __init__(self, analyzer: Optional[ChordAnalyzer] = None, threshold: int = 10,
+                 context_weight: float = 1.0, min_confidence: float = 0.5):
+        self.analyzer = analyzer or ChordAnalyzer()
+        self.threshold = threshold
+        # 文脈加点の倍率（0 で並べ替えを行わない）
+        self.context_weight = context_weight
+        # 推定した調の相関がこれ未満なら文脈加点を行わない（調性の薄い曲で誤った加点をしないため）
+        self.min_confidence = min_confidence
+
+    def analyze(self, voicings: Sequence[List[Note]], durations: Optional[Sequence[float]] = None) -> ProgressionAnalysis:
+        """
+        voicings: 各フレームの音のリスト（空のフレームは無音として扱う）
+        durations: 各フレームの長さ（調の推定の重み。省略時はすべて1）
+        """
+        if durations is not None and len(durations) != len(voicings):
+            raise ValueError(f"durations length {len(durations)} != voicings length {len(voicings)}")
+
+        # 1. 異なるボイシングごとに1回だけ解析する
+        distinct: Dict[Tuple[Tuple[int, int, int], ...], Tuple[List[Note], AnalysisResult]] = {}
+        frame_keys = []
+        pc_weights = [0.0] * 12
+        for i, notes in enumerate(voicings):
+            sorted_notes = sorted(notes, key=lambda n: n.absolute_semitone)
+            voicing_key = tuple((n.step_index, n.alter, n.octave) for n in sorted_notes)
+            frame_keys.append(voicing_key)
+            if voicing_key not in distinct:
+                distinct[voicing_key] = (sorted_notes, self.analyzer.analyze_result(sorted_notes))
+
+            # 調の推定用の分布（ベース音は和声の土台なので重みを2倍にする）
+            weight = durations[i] if durations is not None else 1.0
+            for pc in {n.pitch_class for n in sorted_notes}:
+                pc_weights[pc] += weight
+            if sorted_notes:
+                pc_weights[sorted_notes[0].pitch_class] += weight
+
+        # 2. 調の推定
+        key = estimate_key(pc_weights)
+        use_context = key is not None and self.context_weight > 0 and key.confidence >= self.min_confidence
+
+        # 3. 異なるボイシングごとに文脈で並べ替え、同じボイシングのフレームで結果を共有する
+        reranked: Dict[Tuple[Tuple[int, int, int], ...], Tuple[AnalysisResult, Optional[ChordCandidate], str]] = {}
+        for voicing_key, (sorted_notes, result) in distinct.items():
+            input_mask = pcs_to_mask(n.pitch_class for n in sorted_notes)
+            if use_context:
+                result = self.rerank(result, key, input_mask)
+            best = result.best(self.threshold)
+            degree = roman_numeral(best, key, input_mask) if best is not None and key is not None else ""
+            reranked[voicing_key] = (result, best, degree)
+
+        frames = []
+        for i, voicing_key in enumerate(frame_keys):
+            result, best, degree = reranked[voicing_key]
+            frames.append(ProgressionFrame(i, distinct[voicing_key][0], result, best, degree))
+        return ProgressionAnalysis(frames, key, len(distinct))
+
+    def context_bonus(self, candidate: ChordCandidate, key: KeyEstimate, input_mask: int) -> int:
+        """調の中で自然な解釈ほど大きくなる加点（音階外のルートは減点）"""
+        degree = DIATONIC_DEGREES[key.mode].get((candidate.root_pc - key.tonic_pc) % 12)
+        if degree is None:
+            bonus = -NON_DIATONIC_PENALTY
+        elif chord_character(candidate.root_pc, input_mask) == degree[1]:
+            bonus = DIATONIC_BONUS + (PRIMARY_BONUS if degree[0] in PRIMARY_DEGREES else 0)
+        else:
+            bonus = 0
+        return round(bonus * self.context_weight * key.confidence)
+
+    def rerank(self, result: AnalysisResult, key: KeyEstimate, input_mask: int) -> AnalysisResult:
+        """文脈加点を反映した新しい AnalysisResult を返す（元の結果は書き換えない）"""
+        reranked = AnalysisResult(result.notes, result.bass_name, result.voicing_type)
+        for category, results in result.candidates.items():
+            reranked.candidates[category] = [
+                replace(c, score=c.score + self.context_bonus(c, key, input_mask)) for c in results
+            ]
+        return reranked
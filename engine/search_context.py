@@ -0,0 +1,106 @@
+"""
+1回の解析で全探索フェーズが共有する入力の情報（AnalysisContext）と、探索フェーズの登録単位（SearchPhase）。
+
+ルート候補（入力にあるピッチクラス）ごとの音程計算は、最初に必要になったフェーズで一度だけ行い、
+各音への音程IDの配列と、その和集合の音程IDマスクとしてここに持つ。基本形の探索で計算したルートは
+フォールバック生成・UST の探索では計算し直さない。後から足すフェーズも interval_ids / root_bits を使えばよい。
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from models.note import Note
+from models.result import AnalysisResult, CandidateCollector, ChordCandidate
+from engine.tracing import IntervalFunction
+from engine.spelling import PitchGroups
+
+def root_semitone(step_index: int, alter: int, bass_note: Note) -> int:
+    """仮ルートの絶対半音値（ベースと同じオクターブに置き、ベースより上なら1オクターブ下げる）"""
+    semitone = Note.INDEX_TO_SEMITONE[step_index] + alter + bass_note.octave * 12
+    return semitone - 12 if semitone > bass_note.absolute_semitone else semitone
+
+class AnalysisContext:
+    """
+    1回の解析の入力（低い順の音・ベース・ピッチクラス集合など）と、候補の追加先(collector)。
+    ルートごとの音程ID・音程IDマスクは、12個分の表に必要になったものだけ埋めていく。
+    """
+    __slots__ = ("notes", "bass_note", "bass_name", "voicing_type", "input_pcs", "input_mask", "unique_cands",
+                 "rotations", "result", "collector", "groups", "targets", "_uncacheable", "_interval_id", "_interval_ids",
+                 "_root_bits")
+
+    def __init__(self, notes: List[Note], voicing_type: str, input_mask: int, rotations: Tuple[int, ...],
+                 interval_id: IntervalFunction, groups: Optional[PitchGroups] = None):
+        self.notes = notes  # 低い順
+        self.bass_note = notes[0]
+        self.bass_name = self.bass_note.pitch_name
+        self.voicing_type = voicing_type
+        self.input_pcs: Set[int] = {n.pitch_class for n in notes}
+        self.input_mask = input_mask
+        # ピッチクラス -> ルート候補の音（同じピッチクラスが複数あれば最も高い音の綴り）
+        self.unique_cands: Dict[int, Note] = {n.pitch_class: n for n in notes}
+        # 各ルートへ回転した相対マスク（ルート候補の事前枝刈りに使う）
+        self.rotations = rotations
+        self.result = AnalysisResult(notes, self.bass_name, voicing_type)
+        # 全フェーズが候補を追加する先（同じカテゴリ・名前の解釈は1つにまとめる）
+        self.collector = CandidateCollector(self.result)
+        # MIDIノート番号の入力のときだけ: ピッチクラス -> 絶対半音値、綴りを後から決める候補 -> (ルート, 音程IDマスク)
+        self.groups = groups
+        self.targets: Dict[int, Tuple[int, int]] = {}
+        # 移調不変でないフェーズ（SearchPhase.cacheable が False）が追加した (カテゴリ, 名前)
+        self._uncacheable: Set[Tuple[str, str]] = set()
+        self._interval_id = interval_id
+        self._interval_ids: List[Optional[Tuple[int, ...]]] = [None] * 12
+        self._root_bits = [-1] * 12
+
+    def interval_ids(self, root_pc: int) -> Tuple[int, ...]:
+        """入力の音 root_pc をルートとしたときの、各音（notes と同じ順）への音程ID"""
+        ids = self._interval_ids[root_pc]
+        if ids is None:
+            self._compute(root_pc)
+            ids = self._interval_ids[root_pc]
+        return ids
+
+    def root_bits(self, root_pc: int) -> int:
+        """入力の音 root_pc をルートとしたときの音程IDマスク（全音の音程IDの和集合）"""
+        bits = self._root_bits[root_pc]
+        if bits < 0:
+            bits = self._compute(root_pc)
+        return bits
+
+    def mark_uncacheable(self, before: int):
+        """collector に before 件目以降に追加された解釈を、キャッシュしないものとして記録する"""
+        if len(self.collector) > before:
+            self._uncacheable.update(self.collector.keys()[before:])
+
+    def cacheable_candidates(self) -> Iterator[ChordCandidate]:
+        """解析キャッシュに入れてよい候補（移調不変なフェーズが追加したもの）"""
+        uncacheable = self._uncacheable
+        for c in self.result.all_candidates():
+            if not uncacheable or (c.category, c.name) not in uncacheable:
+                yield c
+
+    def _compute(self, root_pc: int) -> int:
+        root = self.unique_cands[root_pc]
+        root_step = root.step_index
+        semitone = root_semitone(root_step, root.alter, self.bass_note)
+        interval_id = self._interval_id
+        ids = []
+        bits = 0
+        for n in self.notes:
+            i = interval_id(root_step, semitone, n.step_index, n.absolute_semitone)
+            ids.append(i)
+            bits |= 1 << i
+        self._interval_ids[root_pc] = tuple(ids)
+        self._root_bits[root_pc] = bits
+        return bits
+
+@dataclass(frozen=True)
+class SearchPhase:
+    """
+    探索フェーズ1つ。search(context) が context.collector へ候補を追加する。
+    max_score:  このフェーズが出しうる最高スコア（top_k の枝刈りに使う。None なら engine.top_k.phase_max_score に任せ、
+                そこにも無ければ上限なしとして常に実行する）
+    cacheable:  結果が移調不変で、解析キャッシュから再利用できるか（False のフェーズはキャッシュが当たっても毎回実行する）
+    """
+    name: str
+    search: Callable[[AnalysisContext], None]
+    max_score: Optional[int] = None
+    cacheable: bool = True
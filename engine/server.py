@@ -0,0 +1,320 @@
+"""
+標準ライブラリ(asyncio)だけで動く解析サーバー。
+
+HTTP:  POST /analyze  {"notes": "C4, E4, G4"} または {"notes": ["C4", "E4", "G4"]}
+                      {"chords": ["C4, E4, G4", ...]} で複数を一度に送れる（結果は "results" に同じ順で入る）
+       POST /chords   {"chords": {"Maj7#11": ["P1", "M3", "P5", "M7", "A11"]}, "remove": ["5"]}
+                      コード辞書を実行中に書き換える（以後の要求から反映。再起動は不要）
+       GET  /health
+       GET  /metrics  フェーズ別の計測値（Prometheus のテキスト形式。profile=True のときだけ）
+TCP:   1行1和音（parse_notes 形式）を送ると、1行1件の JSON を同じ順で返す（パイプライン可）
+
+短い時間窓に届いた要求はまとめて（マイクロバッチ）解析器へ渡す。同じ入力は1回だけ解析し、
+workers > 0 ならバッチをプロセスプールへ、0 なら共有の ChordAnalyzer を持つ専用スレッドへ送る。
+イベントループ自体は解析でブロックしない。
+"""
+import asyncio
+import json
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+from engine.analyzer import ChordAnalyzer
+from engine.profiling import AnalysisProfiler
+from engine.corpus import analyze_record, _analyze_records, _init_worker
+from dictionaries.chord_loader import ChordDefinitions, parse_chord_definitions
+
+MAX_BODY_SIZE = 1 << 20
+MAX_LINE_SIZE = 1 << 16
+
+class AnalysisService:
+    """要求をマイクロバッチにまとめて解析するフロントエンド"""
+
+    def __init__(self, analyzer: Optional[ChordAnalyzer] = None, threshold: int = 10, top_k: Optional[int] = None,
+                 batch_window: float = 0.002, max_batch: int = 256, workers: int = 0,
+                 chord_definitions: Sequence[ChordDefinitions] = (), profile: bool = False):
+        if profile and workers > 0:
+            raise ValueError("Profiling requires workers=0 (the analyzer must run inside the server process)")
+        self.threshold = threshold
+        self.top_k = top_k
+        # 最初の要求からこの秒数だけ待って、届いた分をまとめて解析する
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.workers = workers
+        # 起動後に受け付けたものも含むユーザー定義のコード（ワーカーを作り直すときに最初から反映し直す）
+        self._chord_definitions: List[ChordDefinitions] = list(chord_definitions)
+
+        # 解析器のフェーズ別の計測（profile=True のときだけ。計測しない解析器には一切の処理を足さない）
+        self.profiler: Optional[AnalysisProfiler] = AnalysisProfiler() if profile else None
+        self._analyzer = analyzer
+        self._executor: Optional[Executor] = None
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.requests = 0
+
+    def start(self):
+        if self._executor is not None:
+            return
+        if self.workers > 0:
+            self._executor = self._process_pool()
+        else:
+            # ChordAnalyzer（のキャッシュ）はスレッドセーフではないので、共有の解析器は1本のスレッドからだけ使う
+            self._analyzer = self._analyzer or ChordAnalyzer(tracer=self.profiler)
+            if self.profiler is not None:
+                self._analyzer.tracer = self.profiler
+            for additions, removals in self._chord_definitions:
+                self._analyzer.apply_chord_definitions(additions, removals)
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chord-analyzer")
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        # fork だとワーカーが開いている接続のソケットを引き継ぎ、サーバーが閉じても相手に切断が届かないので
+        # （接続中にプールを作り直すこともある）、ソケットを持たない forkserver からワーカーを作る
+        context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                                   initargs=(tuple(self._chord_definitions),))
+
+    async def update_chords(self, additions: Dict[FrozenSet[str], str], removals: Sequence[str] = ()):
+        """
+        コード辞書を書き換える。workers == 0 なら解析用のスレッドで解析器の索引を差分更新し、
+        workers > 0 ならこれまでの定義を反映したプロセスプールに差し替える（実行中のバッチは古いプールで終える）。
+        """
+        self.start()
+        self._chord_definitions.append((additions, list(removals)))
+        if self.workers > 0:
+            old, self._executor = self._executor, self._process_pool()
+            old.shutdown(wait=False)
+        else:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._analyzer.apply_chord_definitions, additions, removals)
+
+    async def metrics(self) -> str:
+        """Prometheus のテキスト形式の計測値（集計中の表を壊さないよう、解析用のスレッドで書き出す）"""
+        self.start()
+        text = ""
+        if self.profiler is not None:
+            text = await asyncio.get_running_loop().run_in_executor(self._executor, self.profiler.to_prometheus)
+        return text + (
+            "# HELP chord_server_requests_total Analysis requests received.\n"
+            "# TYPE chord_server_requests_total counter\n"
+            f"chord_server_requests_total {self.requests}\n"
+            "# HELP chord_server_batches_total Micro-batches sent to the analyzer.\n"
+            "# TYPE chord_server_batches_total counter\n"
+            f"chord_server_batches_total {self.batches}\n"
+        )
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def analyze(self, line: str) -> dict:
+        """1和音を解析した dict を返す（実際の解析は同じ時間窓の他の要求とまとめて行う）"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((line.strip(), future))
+        self.requests += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    async def analyze_many(self, lines: List[str]) -> List[dict]:
+        return list(await asyncio.gather(*(self.analyze(line) for line in lines)))
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self.batches += 1
+            asyncio.get_running_loop().create_task(self._run_batch(batch))
+
+    def _analyze_lines(self, lines: List[str]) -> List[dict]:
+        return [analyze_record(self._analyzer, line, self.threshold, self.top_k) for line in lines]
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        # 同じ入力は1回だけ解析する
+        unique: Dict[str, int] = {}
+        for line, _ in batch:
+            unique.setdefault(line, len(unique))
+        lines = list(unique)
+
+        loop = asyncio.get_running_loop()
+        try:
+            if self.workers > 0:
+                records = await loop.run_in_executor(self._executor, _analyze_records, lines, self.threshold, self.top_k)
+            else:
+                records = await loop.run_in_executor(self._executor, self._analyze_lines, lines)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for line, future in batch:
+            if not future.done():
+                future.set_result(records[unique[line]])
+
+def _request_lines(payload) -> Tuple[Optional[List[str]], bool]:
+    """リクエストの JSON から (和音の行のリスト, 複数形式か) を取り出す。形式が不正なら (None, False)"""
+    if not isinstance(payload, dict):
+        return None, False
+
+    def to_line(notes) -> Optional[str]:
+        if isinstance(notes, str):
+            return notes
+        if isinstance(notes, list) and all(isinstance(n, str) for n in notes):
+            return ", ".join(notes)
+        return None
+
+    if "chords" in payload:
+        chords = payload["chords"]
+        if not isinstance(chords, list):
+            return None, True
+        lines = [to_line(c) for c in chords]
+        return (None if any(line is None for line in lines) else lines), True
+    line = to_line(payload.get("notes"))
+    return ([line] if line is not None else None), False
+
+async def _write_http(writer: asyncio.StreamWriter, status: HTTPStatus, body: Union[dict, str], keep_alive: bool,
+                      content_type: str = "application/json; charset=utf-8"):
+    data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + data)
+    await writer.drain()
+
+async def handle_http(service: AnalysisService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """HTTP/1.1（keep-alive 対応、Content-Length 必須）の最小限の実装"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, path, version = request_line.decode("latin-1").split()
+            except ValueError:
+                await _write_http(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request line"}, False)
+                break
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+            try:
+                length = int(headers.get("content-length", "0") or 0)
+            except ValueError:
+                await _write_http(writer, HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length"}, False)
+                break
+            if length < 0 or length > MAX_BODY_SIZE:
+                await _write_http(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Body too large"}, False)
+                break
+            body = await reader.readexactly(length) if length else b""
+
+            if method == "GET" and path == "/health":
+                await _write_http(writer, HTTPStatus.OK,
+                                  {"status": "ok", "requests": service.requests, "batches": service.batches}, keep_alive)
+            elif method == "GET" and path == "/metrics":
+                if service.profiler is None:
+                    await _write_http(writer, HTTPStatus.NOT_FOUND, {"error": "Profiling is disabled (start with --profile)"}, keep_alive)
+                else:
+                    await _write_http(writer, HTTPStatus.OK, await service.metrics(), keep_alive,
+                                      "text/plain; version=0.0.4; charset=utf-8")
+            elif path == "/chords" and method == "POST":
+                try:
+                    additions, removals = parse_chord_definitions(json.loads(body.decode("utf-8")))
+                except ValueError as e:  # 不正な UTF-8 / JSON を含む
+                    await _write_http(writer, HTTPStatus.BAD_REQUEST, {"error": str(e)}, keep_alive)
+                else:
+                    await service.update_chords(additions, removals)
+                    await _write_http(writer, HTTPStatus.OK,
+                                      {"status": "ok", "registered": len(additions), "removed": removals}, keep_alive)
+            elif path != "/analyze":
+                await _write_http(writer, HTTPStatus.NOT_FOUND, {"error": f"Not found: {path}"}, keep_alive)
+            elif method != "POST":
+                await _write_http(writer, HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use POST"}, keep_alive)
+            else:
+                try:
+                    lines, many = _request_lines(json.loads(body.decode("utf-8")))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    lines, many = None, False
+                if lines is None:
+                    await _write_http(writer, HTTPStatus.BAD_REQUEST,
+                                      {"error": 'Expected {"notes": ...} or {"chords": [...]}'}, keep_alive)
+                elif many:
+                    await _write_http(writer, HTTPStatus.OK, {"results": await service.analyze_many(lines)}, keep_alive)
+                else:
+                    await _write_http(writer, HTTPStatus.OK, await service.analyze(lines[0]), keep_alive)
+
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass  # ValueError: ヘッダー行が長すぎる
+    finally:
+        writer.close()
+
+async def handle_lines(service: AnalysisService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """1行1和音のテキスト・プロトコル。後続の行の到着を待たずに解析を始め、応答は入力順に返す"""
+    responses: asyncio.Queue = asyncio.Queue()
+
+    async def write_responses():
+        while True:
+            task = await responses.get()
+            if task is None:
+                return
+            writer.write(json.dumps(await task, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+
+    writer_task = asyncio.create_task(write_responses())
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            text = line.decode("utf-8", errors="replace").strip()
+            if text:
+                responses.put_nowait(asyncio.ensure_future(service.analyze(text)))
+    except (ConnectionError, ValueError):
+        pass  # ValueError: 1行が長すぎる
+    finally:
+        responses.put_nowait(None)
+        try:
+            await writer_task
+        except ConnectionError:
+            pass
+        writer.close()
+
+async def start_servers(service: AnalysisService, host: str = "127.0.0.1", http_port: Optional[int] = 8080,
+                        tcp_port: Optional[int] = None) -> List[asyncio.AbstractServer]:
+    """HTTP / TCP の待ち受けを開始する（ポート 0 なら空いているポートを使う。実際のポートは sockets から分かる）"""
+    service.start()
+    servers = []
+    if http_port is not None:
+        servers.append(await asyncio.start_server(partial(handle_http, service), host, http_port, limit=MAX_LINE_SIZE))
+    if tcp_port is not None:
+        servers.append(await asyncio.start_server(partial(handle_lines, service), host, tcp_port, limit=MAX_LINE_SIZE))
+    return servers
+
+async def serve(service: AnalysisService, host: str = "127.0.0.1", http_port: Optional[int] = 8080,
+                tcp_port: Optional[int] = None):
+    """サーバーを起動し、キャンセルされるまで動かし続ける"""
+    servers = await start_servers(service, host, http_port, tcp_port)
+    try:
+        await asyncio.gather(*(s.serve_forever() for s in servers))
+    finally:
+        for s in servers:
+            s.close()
+        service.close()
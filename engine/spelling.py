@@ -0,0 +1,103 @@
+"""
+MIDIノート番号（綴りを持たない音高）の入力に、解釈ごとの綴りを後から付けるための道具。
+
+ChordAnalyzer.analyze_pitches は、辞書との一致をピッチクラスと音域だけで判定し（ありうる綴りのどれかで一致すればよい）、
+順位を決めた後に残った候補にだけ、その解釈で変化記号が最も少なくなる綴りを選ぶ。
+"""
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+from models.note import Note, DEFAULT_SPELLING
+from utils.interval_calc import interval_id
+
+# ピッチクラス -> そのピッチクラスになる綴り (音名インデックス, alter) の一覧。
+# 既定の綴り(DEFAULT_SPELLING)を先頭に、変化記号の少ない順に並べる
+SPELLINGS_BY_PC: Tuple[Tuple[Tuple[int, int], ...], ...] = tuple(
+    tuple(sorted(
+        ((step_index, alter) for step_index in range(7) for alter in (0, -1, 1, -2, 2)
+         if (Note.INDEX_TO_SEMITONE[step_index] + alter) % 12 == pc),
+        key=lambda s: (s != (Note.STEP_TO_INDEX[DEFAULT_SPELLING[pc][0]], DEFAULT_SPELLING[pc][1]), abs(s[1])),
+    ))
+    for pc in range(12)
+)
+
+# ピッチクラス -> その音の絶対半音値(C0 = 0)の一覧
+PitchGroups = Dict[int, List[int]]
+Spelling = Dict[int, Tuple[int, int]]
+
+def default_note(midi_number: int) -> Note:
+    """DEFAULT_SPELLING で綴った Note（文字列を経由しない）"""
+    step_index, alter = SPELLINGS_BY_PC[midi_number % 12][0]
+    return spelled_note(step_index, alter, midi_number - 12)
+
+def spelled_note(step_index: int, alter: int, semitone: int) -> Note:
+    """絶対半音値(C0 = 0)の音を、指定した音名・変化記号で綴る"""
+    octave = (semitone - Note.INDEX_TO_SEMITONE[step_index] - alter) // 12
+    return Note.from_index(step_index, alter, octave)
+
+def root_semitone_below(root_pc: int, bass_semitone: int) -> int:
+    """ルートの絶対半音値（ベース以下で最も高い root_pc の音。ChordAnalyzer の仮ルートの置き方と同じ）"""
+    return bass_semitone - (bass_semitone - root_pc) % 12
+
+def relative_pitches(root_pc: int, groups: PitchGroups, bass_semitone: int) -> Tuple[int, ...]:
+    """入力の各音のルートからの半音数（昇順）。ルートのピッチクラスと合わせて綴りの探索結果のキャッシュの鍵にする"""
+    root_semitone = root_semitone_below(root_pc, bass_semitone)
+    return tuple(sorted(semitone - root_semitone for semitones in groups.values() for semitone in semitones))
+
+def spellings(root_pc: int, distances: Tuple[int, ...], target_bits: int) -> Iterator[Tuple[int, Tuple[int, int], Spelling]]:
+    """
+    ルートから distances 半音上の各音への音程IDの和集合がちょうど target_bits になる綴りを
+    (変化記号の数, ルートの綴り, ピッチクラス -> 綴り) として列挙する。同じピッチクラスの音は同じ綴りにする。
+    """
+    groups: Dict[int, List[int]] = {}
+    for distance in distances:
+        groups.setdefault((root_pc + distance) % 12, []).append(distance)
+    pcs = list(groups)
+    for root_step, root_alter in SPELLINGS_BY_PC[root_pc]:
+        # ピッチクラスごとに、目標に含まれる音程だけを作る綴りの候補 (綴り, 音程ビット, 変化記号の数)
+        options = []
+        for pc in pcs:
+            pc_distances = groups[pc]
+            choices = []
+            for step_index, alter in SPELLINGS_BY_PC[pc]:
+                bits = 0
+                for distance in pc_distances:
+                    bits |= 1 << interval_id(root_step, 0, step_index, distance)
+                if bits & ~target_bits == 0:
+                    choices.append(((step_index, alter), bits, abs(alter) * len(pc_distances)))
+            if not choices:
+                break
+            options.append(choices)
+        else:
+            root_cost = abs(root_alter)
+            for cost, assignment in _combinations(options, 0, target_bits, 0, []):
+                yield cost + root_cost, (root_step, root_alter), dict(zip(pcs, assignment))
+
+def _combinations(options: list, depth: int, target_bits: int, bits: int, chosen: list) -> Iterator[Tuple[int, List[Tuple[int, int]]]]:
+    if depth == len(options):
+        if bits == target_bits:
+            yield sum(cost for _, _, cost in chosen), [spelling for spelling, _, _ in chosen]
+        return
+    for choice in options[depth]:
+        chosen.append(choice)
+        yield from _combinations(options, depth + 1, target_bits, bits | choice[1], chosen)
+        chosen.pop()
+
+@lru_cache(maxsize=65536)
+def can_spell(root_pc: int, distances: Tuple[int, ...], target_bits: int) -> bool:
+    """target_bits になる綴りが1つでもあるか（順位付けの段階ではこれだけを調べる）"""
+    return next(spellings(root_pc, distances, target_bits), None) is not None
+
+@lru_cache(maxsize=4096)
+def best_spelling(root_pc: int, distances: Tuple[int, ...], target_bits: int) -> Optional[Tuple[Tuple[int, int], Spelling]]:
+    """
+    変化記号が最も少ない綴り（同数なら既定の綴りに近いもの）を (ルートの綴り, ピッチクラス -> 綴り) で返す。
+    結果はキャッシュと共有するので書き換えないこと。
+    """
+    best = None
+    for cost, root_spelling, spelling in spellings(root_pc, distances, target_bits):
+        if best is None or cost < best[0]:
+            best = (cost, root_spelling, spelling)
+    return best[1:] if best is not None else None
+
+def pitch_name(step_index: int, alter: int) -> str:
+    return Note.from_index(step_index, alter, 4).pitch_name
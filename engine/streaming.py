@@ -0,0 +1,99 @@
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from models.note import Note
+from models.result import AnalysisResult, ChordCandidate
+from engine.analyzer import ChordAnalyzer
+from utils.midi_file import NoteEvent, read_midi_file
+
+@dataclass(slots=True)
+class ChordChange:
+    """最良解釈が変わった時点のイベント（無音になった場合は result / best が None）"""
+    time: float
+    notes: List[Note]
+    result: Optional[AnalysisResult]
+    best: Optional[ChordCandidate]
+
+class StreamingChordAnalyzer:
+    """
+    ノートオン / オフを逐次受け取り、鳴っている音の集合を差分更新しながらコードの変化を検出する。
+    音集合が変わらないイベント（同じ鍵盤の重複オンなど）では再解析しない。
+    解析は MIDIノート番号のまま ChordAnalyzer.analyze_pitches で行うので、Db / F / Ab も Db メジャーと判定され、
+    ChordChange.notes は1位の解釈の綴りになる。同じ音集合（とそのオクターブ違い）の再登場は
+    ChordAnalyzer の解析キャッシュで探索を省略する（繰り返しの多い MIDI ファイルではほとんどがキャッシュで済む）。
+    """
+
+    def __init__(self, analyzer: Optional[ChordAnalyzer] = None, threshold: int = 10, window: float = 0.0):
+        self.analyzer = analyzer or ChordAnalyzer()
+        self.threshold = threshold
+        # window 秒以内に届いたイベントはまとめて1回だけ解析する（和音の打鍵のずれを吸収）
+        self.window = window
+
+        self._counts: Dict[int, int] = {}   # MIDIノート番号 -> 押されている数（複数チャンネル対応）
+        self._sounding: List[int] = []      # 鳴っているノート番号（昇順）
+        self._analyzed: Optional[Tuple[int, ...]] = ()
+        self._last_label: Optional[str] = None
+
+    def note_on(self, midi_number: int) -> bool:
+        """音を追加する。鳴っている音集合が変わったら True"""
+        count = self._counts.get(midi_number, 0)
+        self._counts[midi_number] = count + 1
+        if count == 0:
+            insort(self._sounding, midi_number)
+            return True
+        return False
+
+    def note_off(self, midi_number: int) -> bool:
+        """音を取り除く。鳴っている音集合が変わったら True"""
+        count = self._counts.get(midi_number, 0)
+        if count == 0:
+            return False  # 対応するノートオンが無いノートオフは無視する
+        if count > 1:
+            self._counts[midi_number] = count - 1
+            return False
+        del self._counts[midi_number]
+        del self._sounding[bisect_left(self._sounding, midi_number)]
+        return True
+
+    def apply(self, event: NoteEvent) -> bool:
+        if event.kind == "on":
+            return self.note_on(event.note)
+        return self.note_off(event.note)
+
+    def flush(self, time: float) -> Optional[ChordChange]:
+        """現在の音集合を（変わっていれば）解析し、最良解釈が変わったら ChordChange を返す"""
+        sounding = tuple(self._sounding)
+        if sounding == self._analyzed:
+            return None
+        self._analyzed = sounding
+
+        result = self.analyzer.analyze_pitches(sounding) if sounding else None
+        best = result.best(self.threshold) if result is not None else None
+        label = best.label if best is not None else None
+        if label == self._last_label:
+            return None
+        self._last_label = label
+        return ChordChange(time, result.notes if result is not None else [], result, best)
+
+    def process(self, events: Iterable[NoteEvent]) -> Iterator[ChordChange]:
+        """イベント列を消費し、コードの変化を順に返すジェネレータ"""
+        group_start = None
+        last_time = 0.0
+        for event in events:
+            if group_start is not None and event.time - group_start > self.window:
+                change = self.flush(last_time)
+                if change is not None:
+                    yield change
+                group_start = None
+            if self.apply(event) and group_start is None:
+                group_start = event.time
+            last_time = event.time
+
+        if group_start is not None:
+            change = self.flush(last_time)
+            if change is not None:
+                yield change
+
+    def process_file(self, path: str) -> Iterator[ChordChange]:
+        """Standard MIDI File を読み込んで process する"""
+        return self.process(read_midi_file(path))
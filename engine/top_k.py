@@ -0,0 +1,35 @@
+from typing import Dict, List
+from models.result import ChordCandidate
+
+# 探索フェーズごとのスコアの上限（各フェーズのスコア計算から導いた値。スコア規則を変えたらここも直す）
+PHASE_MAX_SCORES = {
+    "normal": 80,    # 基本形の完全一致
+    "rootless": 75,  # 30 + 9th/11th/13th のボーナス
+    "ust": 85,       # 王道インターバルのトライアドUST（4和音USTは80、ポリコードは70）
+}
+
+def phase_max_score(phase: str, note_count: int, pc_count: int) -> int:
+    """フェーズが出しうる最高スコア。未知のフェーズは上限なし（常に実行する）として扱う"""
+    if phase == "fallback":
+        # 基本形の生成コードは 55 + テンション数 × 5。テンションはルートと3度以外の音からしか生まれない
+        return 55 + 5 * min(7, max(0, note_count - 2))
+    if phase == "ust" and pc_count < 4:
+        return 0  # 4音未満では上部構造を作れない
+    return PHASE_MAX_SCORES.get(phase, 1 << 30)
+
+def can_improve_top_k(categorized: Dict[str, List[ChordCandidate]], k: int, threshold: int, max_score: int) -> bool:
+    """
+    上限 max_score のフェーズが、現時点の上位 k 件を変えうるか。
+    max_score より高い候補が既に k 件あれば、そのフェーズの候補は上位 k 件に入れない（同点は入りうるとみなす）。
+    候補は CandidateCollector で集めたもの（同じカテゴリ・名前の重複は無い）なので、件数を数えるだけでよい。
+    """
+    if max_score < threshold:
+        return False
+    count = 0
+    for results in categorized.values():
+        for c in results:
+            if c.score > max_score:
+                count += 1
+                if count >= k:
+                    return False
+    return True
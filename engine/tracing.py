@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Mapping, Tuple
+
+# 音程IDの計算 (ルートの音名, ルートの半音, 対象の音名, 対象の半音) -> 音程ID
+IntervalFunction = Callable[[int, int, int, int], int]
+
+@dataclass(slots=True)
+class PhaseEvent:
+    """1回の解析における1つの探索フェーズの計測結果"""
+    phase: str        # "normal" / "rootless" / "ust" / "fallback" / "format"(文字列への整形)
+    candidates: int   # このフェーズで追加された候補数
+    elapsed: float    # 経過時間（秒）
+    note_count: int   # 入力音数
+
+class AnalysisTracer:
+    """
+    ChordAnalyzer の計測フック。必要なメソッドだけ上書きして使う。
+    tracer を渡さない場合（None）は計測処理そのものが実行されない。
+    """
+
+    def on_phase_start(self, phase: str) -> None:
+        pass
+
+    def on_phase(self, event: PhaseEvent) -> None:
+        pass
+
+    def instrument(self, interval_id: IntervalFunction, qualities: Mapping[int, str]) -> Tuple[IntervalFunction, Mapping[int, str]]:
+        """探索フェーズが使う音程計算と「音程IDマスク -> コード種別」の辞書を差し替える（回数を数える場合など）"""
+        return interval_id, qualities
+
+class CallbackTracer(AnalysisTracer):
+    """PhaseEvent を受け取る関数をそのまま tracer として使うためのアダプタ"""
+
+    def __init__(self, callback: Callable[[PhaseEvent], None]):
+        self.callback = callback
+
+    def on_phase(self, event: PhaseEvent) -> None:
+        self.callback(event)
+
+class RecordingTracer(AnalysisTracer):
+    """受け取ったイベントをすべて保持する（デバッグ・テスト用）"""
+
+    def __init__(self):
+        self.events: List[PhaseEvent] = []
+
+    def on_phase(self, event: PhaseEvent) -> None:
+        self.events.append(event)
+
+class PhaseStatsTracer(AnalysisTracer):
+    """フェーズごとの呼び出し回数・累計時間・追加候補数を集計する"""
+
+    def __init__(self):
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def on_phase(self, event: PhaseEvent) -> None:
+        stat = self.stats.get(event.phase)
+        if stat is None:
+            stat = self.stats[event.phase] = {"calls": 0, "seconds": 0.0, "candidates": 0}
+        stat["calls"] += 1
+        stat["seconds"] += event.elapsed
+        stat["candidates"] += event.candidates
@@ -0,0 +1,256 @@
+"""
+ChordAnalyzer の逆引き: コードシンボルから、音域と制約に合うボイシングを列挙する。
+
+    for notes in find_voicings("Cm7/Bb", "C3", "C5", max_spread=12):
+        print(", ".join(map(str, notes)))
+
+コードの構成音は CHORD_DICT の音程集合を add_interval（INTERVAL_MAP の綴り）でルートから綴ったもの。
+音域のどのオクターブに置くかは、ChordAnalyzer と同じくルートを最低音以下に置いたときの音程で決める
+（M9 はルートから1オクターブ以上上、M2 は1オクターブ以内にしか置かない）ので、列挙したボイシングは元のシンボルに判定される。
+列挙はジェネレータで、低い音から順に鍵を選ぶ深さ優先探索（制約に反する枝はその場で打ち切る）なので、
+広い音域でもメモリは声部の数に比例する分しか使わない。
+"""
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple, Union
+from models.note import Note
+from utils.interval_calc import INTERVAL_IDS, INTERVAL_SEMITONES, add_interval, interval_id
+from dictionaries.chord_dict import CHORD_DICT
+from engine.search_context import root_semitone
+
+# 辞書のコード種別名の別表記（辞書に同名があればそちらが優先）
+QUALITY_ALIASES = {
+    "": "Major", "M": "Major", "maj": "Major", "m": "Minor", "min": "Minor", "-": "Minor",
+    "dim": "Dim", "°": "Dim", "aug": "Aug", "+": "Aug",
+    "maj7": "Maj7", "M7": "Maj7", "Δ7": "Maj7", "Δ": "Maj7", "min7": "m7", "-7": "m7",
+    "ø": "m7b5", "ø7": "m7b5", "m7-5": "m7b5", "°7": "dim7", "7#5": "aug7", "+7": "aug7",
+    "maj9": "Maj9", "M9": "Maj9", "mM7": "mM7", "mMaj7": "mM7", "m(maj7)": "mM7",
+}
+OMIT5_SUFFIX = "(omit5)"
+ROOTLESS_SUFFIX = "(Rootless)"
+_ACCIDENTALS = {"": 0, "#": 1, "b": -1, "x": 2, "##": 2, "bb": -2}
+
+NoteLike = Union[Note, str]
+
+@dataclass(frozen=True)
+class ChordTone:
+    """構成音1つ（ルートからの音程と、その綴り）"""
+    interval: str
+    step_index: int
+    alter: int
+
+    @property
+    def pitch_class(self) -> int:
+        return (Note.INDEX_TO_SEMITONE[self.step_index] + self.alter) % 12
+
+@dataclass(frozen=True)
+class ChordSymbol:
+    root_step_index: int
+    root_alter: int
+    quality: str
+    bass: Optional[Tuple[int, int]] = None  # 分数コードのベースの (音名インデックス, alter)
+    omit5: bool = False
+    rootless: bool = False
+
+def _parse_pitch(text: str) -> Optional[Tuple[int, int, str]]:
+    """先頭の音名と変化記号を (音名インデックス, alter, 残り) に分ける（音名は大文字のみ）"""
+    if not text or text[0] not in Note.STEP_TO_INDEX:
+        return None
+    i = 1
+    while i < len(text) and i < 3 and text[i] in "#bx":
+        i += 1
+    accidentals = text[1:i]
+    while accidentals not in _ACCIDENTALS:
+        accidentals = accidentals[:-1]
+    return Note.STEP_TO_INDEX[text[0]], _ACCIDENTALS[accidentals], text[1 + len(accidentals):]
+
+class VoicingIndex:
+    """
+    コード種別名 -> 音程集合 の逆引き表と、(ルート, 種別) ごとに綴った構成音のキャッシュ。
+    同じ辞書に対する問い合わせを繰り返すときは、これを1つ作って使い回す。
+    """
+
+    def __init__(self, chord_dictionary: Dict[FrozenSet[str], str] = CHORD_DICT):
+        self.intervals: Dict[str, Tuple[str, ...]] = {}
+        for intervals, quality in chord_dictionary.items():
+            # ルートから低い順（同じ高さなら音程名順）に並べる
+            self.intervals[quality] = tuple(sorted(intervals, key=lambda i: (INTERVAL_SEMITONES[i], i)))
+        self._folded = {quality.casefold(): quality for quality in self.intervals}
+        self._tones: Dict[Tuple[int, int, str], Tuple[ChordTone, ...]] = {}
+
+    def resolve_quality(self, text: str) -> Optional[str]:
+        """表記からコード種別名を決める（辞書の名前 -> 別表記 -> 大文字小文字を無視した辞書の名前 の順）"""
+        if text in self.intervals:
+            return text
+        alias = QUALITY_ALIASES.get(text)
+        if alias in self.intervals:
+            return alias
+        return self._folded.get(text.casefold())
+
+    def parse_symbol(self, symbol: str) -> ChordSymbol:
+        """"F#m7", "C7(b9)/E", "Bb Maj7", "D m7(Rootless)" のようなシンボルを解釈する（不明なら ValueError）"""
+        text = symbol.strip()
+        root = _parse_pitch(text)
+        if root is None:
+            raise ValueError(f"Invalid chord symbol: '{symbol}'")
+        step_index, alter, rest = root
+
+        bass = None
+        head, slash, tail = rest.rpartition("/")
+        if slash:
+            parsed_bass = _parse_pitch(tail.strip())
+            if parsed_bass is None or parsed_bass[2]:
+                raise ValueError(f"Invalid bass in chord symbol: '{symbol}'")
+            bass = parsed_bass[:2]
+            rest = head
+
+        rest = rest.strip()
+        rootless = rest.endswith(ROOTLESS_SUFFIX)
+        if rootless:
+            rest = rest[:-len(ROOTLESS_SUFFIX)]
+        quality = self.resolve_quality(rest.strip())
+        omit5 = False
+        if quality is None and rest.endswith(OMIT5_SUFFIX):
+            quality = self.resolve_quality(rest[:-len(OMIT5_SUFFIX)].strip())
+            omit5 = True
+        if quality is None:
+            raise ValueError(f"Unknown chord quality: '{rest}'")
+        return ChordSymbol(step_index, alter, quality, bass, omit5, rootless)
+
+    def chord_tones(self, root_step_index: int, root_alter: int, quality: str) -> Tuple[ChordTone, ...]:
+        """ルートとコード種別から構成音を綴る（結果はキャッシュする）"""
+        key = (root_step_index, root_alter, quality)
+        tones = self._tones.get(key)
+        if tones is None:
+            root = Note.from_index(root_step_index, root_alter, 4)
+            tones = []
+            for interval in self.intervals[quality]:
+                note = add_interval(root, interval)
+                tones.append(ChordTone(interval, note.step_index, note.alter))
+            tones = self._tones[key] = tuple(tones)
+        return tones
+
+    def voicings(self, symbol: Union[str, ChordSymbol], low: NoteLike = "C3", high: NoteLike = "C6", *,
+                 max_spread: Optional[int] = None, bass: Optional[str] = None, rootless: bool = False,
+                 omit5: bool = False, max_notes: Optional[int] = None) -> Iterator[List[Note]]:
+        """
+        シンボルの和音を low〜high（両端を含む）の鍵で弾くボイシングを、低い音から順に並べた Note のリストとして列挙する。
+        max_spread: 最低音から最高音までの半音数の上限
+        bass:       最低音にする音名（"E" など。シンボルの "/E" と同じ。構成音でなければ最低音にだけ足す）
+        rootless:   ルートを弾かない / omit5: 5度(P5)を弾かない（シンボルの "(Rootless)" / "(omit5)" でも指定できる）
+        max_notes:  声部数の上限。既定は構成音を1つずつ弾く数で、これを超える分は構成音の重複(ダブリング)になる
+        同じ高さの音を2つ含むボイシングは作らない。
+        """
+        if isinstance(symbol, str):
+            symbol = self.parse_symbol(symbol)
+        low_semitone, high_semitone = _semitone(low), _semitone(high)
+        tones = self.chord_tones(symbol.root_step_index, symbol.root_alter, symbol.quality)
+
+        omitted = set()
+        if rootless or symbol.rootless:
+            omitted.add("P1")
+        if omit5 or symbol.omit5:
+            omitted.add("P5")
+        required = [t for t in tones if t.interval not in omitted]
+
+        bass_pitch = symbol.bass
+        if bass is not None:
+            parsed = _parse_pitch(bass.strip())
+            if parsed is None or parsed[2]:
+                raise ValueError(f"Invalid bass: '{bass}'")
+            bass_pitch = parsed[:2]
+        # 構成音以外のベース（C/D の D など）は最低音にだけ置く
+        extra_bass = None
+        if bass_pitch is not None and not any((t.step_index, t.alter) == bass_pitch for t in required):
+            extra_bass = ChordTone("bass", *bass_pitch)
+
+        voices = max_notes if max_notes is not None else len(required) + (extra_bass is not None)
+        return self._search(symbol, required, extra_bass, bass_pitch, low_semitone, high_semitone, max_spread, voices)
+
+    @staticmethod
+    def _search(symbol: ChordSymbol, required: List[ChordTone], extra_bass: Optional[ChordTone],
+                bass_pitch: Optional[Tuple[int, int]], low_semitone: int, high_semitone: int, max_spread: Optional[int],
+                voices: int) -> Iterator[List[Note]]:
+        if not required or voices < len(required) + (extra_bass is not None):
+            return
+
+        # 音域内の鍵を (絶対半音値, 構成音の番号, Note) として低い順に並べる
+        keys = []
+        for tone_index, tone in enumerate(required):
+            keys.extend((n.absolute_semitone, tone_index, n) for n in _notes_in_range(tone, low_semitone, high_semitone))
+        keys.sort(key=lambda k: (k[0], k[1]))
+        if extra_bass is not None:
+            bass_keys = [(n.absolute_semitone, -1, n) for n in _notes_in_range(extra_bass, low_semitone, high_semitone)]
+        elif bass_pitch is not None:
+            bass_keys = [k for k in keys if (required[k[1]].step_index, required[k[1]].alter) == bass_pitch]
+        else:
+            bass_keys = keys
+
+        # 音域に入らない構成音があれば、どのベースからも作れない
+        if len({tone_index for _, tone_index, _ in keys}) < len(required):
+            return
+
+        root_step = symbol.root_step_index
+        tone_ids = [INTERVAL_IDS[t.interval] for t in required]
+        all_tones = (1 << len(required)) - 1
+        chosen: List[Note] = []
+
+        def extend(voiced: List[Tuple[int, int, Note]], last_position: List[int], start: int, covered: int,
+                   limit: int, last_semitone: int) -> Iterator[List[Note]]:
+            if covered == all_tones:
+                yield list(chosen)
+            slots = voices - len(chosen)
+            if slots == 0:
+                return
+            missing = all_tones & ~covered
+            if bin(missing).count("1") > slots:
+                return
+            for position in range(start, len(voiced)):
+                semitone, tone_index, note = voiced[position]
+                if semitone > limit:
+                    return
+                if semitone == last_semitone:
+                    continue
+                # まだ無い構成音のどれかが、これより後ろに残っていなければ打ち切る
+                if any(last_position[i] < position for i in range(len(required)) if missing >> i & 1):
+                    return
+                chosen.append(note)
+                yield from extend(voiced, last_position, position + 1, covered | (1 << tone_index), limit, semitone)
+                chosen.pop()
+
+        for semitone, tone_index, note in bass_keys:
+            # 解析と同じく、ルートを最低音と同じか下のオクターブに置いたときの音程がシンボルどおりの鍵だけを使う
+            root = root_semitone(root_step, symbol.root_alter, note)
+            if tone_index >= 0 and interval_id(root_step, root, note.step_index, semitone) != tone_ids[tone_index]:
+                continue
+            voiced = [k for k in keys
+                      if k[0] > semitone and interval_id(root_step, root, k[2].step_index, k[0]) == tone_ids[k[1]]]
+            # 各構成音が最後に現れる位置（それより後から始める枝はその音を含められない）
+            last_position = [-1] * len(required)
+            for position, (_, voiced_tone, _) in enumerate(voiced):
+                last_position[voiced_tone] = position
+            limit = semitone + max_spread if max_spread is not None else high_semitone
+            chosen.append(note)
+            yield from extend(voiced, last_position, 0, 0 if tone_index < 0 else 1 << tone_index, limit, semitone)
+            chosen.pop()
+
+def _semitone(note: NoteLike) -> int:
+    if isinstance(note, str):
+        note = Note.from_string(note)
+    return note.absolute_semitone
+
+def _notes_in_range(tone: ChordTone, low_semitone: int, high_semitone: int) -> Iterator[Note]:
+    """同じ綴りの音を low〜high の各オクターブに置いた Note"""
+    in_octave = Note.INDEX_TO_SEMITONE[tone.step_index] + tone.alter
+    octave = (low_semitone - in_octave + 11) // 12
+    while in_octave + octave * 12 <= high_semitone:
+        yield Note.from_index(tone.step_index, tone.alter, octave)
+        octave += 1
+
+_default_index: Optional[VoicingIndex] = None
+
+def find_voicings(symbol: str, low: NoteLike = "C3", high: NoteLike = "C6", **constraints) -> Iterator[List[Note]]:
+    """CHORD_DICT の共有の VoicingIndex で VoicingIndex.voicings を呼ぶ"""
+    global _default_index
+    if _default_index is None:
+        _default_index = VoicingIndex()
+    return _default_index.voicings(symbol, low, high, **constraints)
@@ -1,8 +1,16 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
 from models.note import parse_notes
 from engine.analyzer import ChordAnalyzer
+from engine.corpus import analyze_corpus, make_analyzer
+from engine.progression import ChordProgressionAnalyzer
+from dictionaries.chord_loader import read_chord_definitions
 
-# --- 実行テスト ---
-if __name__ == "__main__":
+def run_demo():
+    """組み込みのテストケースを表示する"""
     analyzer = ChordAnalyzer()
     
     print("Test 1:", analyzer.analyze(parse_notes("C, E, G")))
@@ -47,4 +55,142 @@ if __name__ == "__main__":
     # 左手で C, E, Bb を弾き、右手で A, C#, E (Aメジャー) を弾く
     print("Test 18:", analyzer.analyze(parse_notes("C3, E3, Bb3, A4, C#5, E5")))
 
-    print("Test 19:", analyzer.analyze(parse_notes("C3, G3")))    
\ No newline at end of file
+    print("Test 19:", analyzer.analyze(parse_notes("C3, G3")))
+
+def positive_int(text):
+    """argparse の type: 1 以上の整数"""
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {text}")
+    return value
+
+def _input_lines(paths):
+    """入力ファイル群（'-' は標準入力）の行を順に返す"""
+    for path in paths or ["-"]:
+        if path == "-":
+            yield from sys.stdin
+        else:
+            with open(path, encoding="utf-8") as f:
+                yield from f
+
+def _add_chords_argument(parser: argparse.ArgumentParser):
+    parser.add_argument("--chords", action="append", metavar="FILE", help="追加・削除するコード定義（JSON / TOML、複数指定可）")
+
+def _chord_definitions(args):
+    """--chords で指定したユーザー定義のコードファイルを読み込む"""
+    return [read_chord_definitions(path) for path in args.chords or []]
+
+def run_batch(args):
+    """1行1和音の入力を並列解析し、入力順に JSON Lines で書き出す"""
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    start = time.perf_counter()
+    count = 0
+    try:
+        for line in analyze_corpus(_input_lines(args.inputs), args.jobs, args.chunk_size, args.threshold, args.top_k,
+                                     _chord_definitions(args)):
+            out.write(line + "\n")
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"{count} chords in {elapsed:.2f}s ({rate:.0f} chords/s, {args.jobs} jobs)", file=sys.stderr)
+
+def run_progression(args):
+    """1行1和音のコード進行を調の文脈込みで解析して表示する（空行は無視）"""
+    voicings = [parse_notes(line) for line in _input_lines(args.inputs) if line.strip()]
+    analyzer = ChordProgressionAnalyzer(make_analyzer(_chord_definitions(args)), threshold=args.threshold, context_weight=args.context_weight)
+    print(analyzer.analyze(voicings))
+
+def run_voicings(args):
+    """コードシンボルのボイシングを1行1和音（batch の入力と同じ形式）で列挙する"""
+    analyzer = make_analyzer(_chord_definitions(args), cache_size=0)
+    try:
+        voicings = analyzer.voicings(args.symbol, args.low, args.high, max_spread=args.max_spread, bass=args.bass,
+                                     rootless=args.rootless, omit5=args.omit5, max_notes=args.max_notes)
+        for i, notes in enumerate(voicings):
+            if args.limit is not None and i >= args.limit:
+                break
+            print(", ".join(str(n) for n in notes))
+    except ValueError as e:
+        raise SystemExit(f"error: {e}")
+
+def run_server(args):
+    """HTTP / TCP の解析サーバーを起動する（Ctrl+C で停止）"""
+    from engine.server import AnalysisService, serve
+    try:
+        service = AnalysisService(threshold=args.threshold, top_k=args.top_k, batch_window=args.batch_window / 1000,
+                                  max_batch=args.max_batch, workers=args.workers,
+                                  chord_definitions=_chord_definitions(args), profile=args.profile)
+    except ValueError as e:
+        raise SystemExit(f"error: {e}")
+    tcp = f", tcp {args.host}:{args.tcp_port}" if args.tcp_port is not None else ""
+    print(f"Serving http://{args.host}:{args.port}/analyze{tcp}", file=sys.stderr)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.tcp_port))
+    except KeyboardInterrupt:
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="音名の組み合わせからコードを判定する")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("demo", help="組み込みのテストケースを表示する（既定）")
+
+    batch = sub.add_parser("batch", help="1行1和音（例: 'C4, E4, G4'）の入力を JSON Lines で一括解析する")
+    batch.add_argument("inputs", nargs="*", help="入力ファイル（省略時または '-' は標準入力）")
+    batch.add_argument("-o", "--output", default="-", help="出力先（既定: 標準出力）")
+    batch.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="ワーカープロセス数")
+    batch.add_argument("--chunk-size", type=int, default=256, help="1タスクあたりの行数")
+    batch.add_argument("--threshold", type=int, default=10, help="出力する候補の最低スコア")
+    _add_chords_argument(batch)
+    batch.add_argument("--top-k", type=positive_int, help="各行の上位 K 件だけを出力する（不要な探索フェーズを省く）")
+
+    progression = sub.add_parser("progression", help="1行1和音のコード進行を、推定した調の文脈で解析する")
+    progression.add_argument("inputs", nargs="*", help="入力ファイル（省略時または '-' は標準入力）")
+    progression.add_argument("--threshold", type=int, default=10, help="出力する候補の最低スコア")
+    _add_chords_argument(progression)
+    progression.add_argument("--context-weight", type=float, default=1.0, help="調の文脈による加点の倍率（0 で無効）")
+
+    voicings = sub.add_parser("voicings", help="コードシンボル（例: 'Cm7/Bb'）を音域内で弾くボイシングを列挙する")
+    voicings.add_argument("symbol")
+    voicings.add_argument("--low", default="C3", help="音域の下端（既定: C3）")
+    voicings.add_argument("--high", default="C6", help="音域の上端（既定: C6）")
+    voicings.add_argument("--max-spread", type=int, help="最低音から最高音までの半音数の上限")
+    voicings.add_argument("--bass", help="最低音にする音名")
+    voicings.add_argument("--rootless", action="store_true", help="ルートを弾かない")
+    voicings.add_argument("--omit5", action="store_true", help="5度を弾かない")
+    voicings.add_argument("--max-notes", type=int, help="声部数の上限（構成音の数を超える分は重複）")
+    voicings.add_argument("--limit", type=int, help="出力するボイシング数の上限")
+    _add_chords_argument(voicings)
+
+    server = sub.add_parser("serve", help="HTTP(JSON) / 行単位 TCP の解析サーバーを起動する")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=8080, help="HTTP のポート")
+    server.add_argument("--tcp-port", type=int, help="1行1和音の TCP プロトコルのポート（省略時は無効）")
+    server.add_argument("-j", "--workers", type=int, default=0, help="解析ワーカープロセス数（0 ならサーバー内の1スレッドで解析）")
+    server.add_argument("--batch-window", type=float, default=2.0, help="要求をまとめる時間窓（ミリ秒）")
+    server.add_argument("--max-batch", type=int, default=256, help="1バッチの最大要求数")
+    server.add_argument("--threshold", type=int, default=10, help="出力する候補の最低スコア")
+    _add_chords_argument(server)
+    server.add_argument("--top-k", type=positive_int, help="各要求の上位 K 件だけを返す")
+    server.add_argument("--profile", action="store_true", help="フェーズ別の計測を GET /metrics で公開する（--workers 0 のときのみ）")
+
+    args = parser.parse_args(argv)
+    if args.command == "batch":
+        run_batch(args)
+    elif args.command == "progression":
+        run_progression(args)
+    elif args.command == "voicings":
+        run_voicings(args)
+    elif args.command == "serve":
+        run_server(args)
+    else:
+        run_demo()
+
+# --- 実行テスト ---
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,96 @@
-import re
-from dataclasses import dataclass
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
 
-@dataclass
-class Note:
-    step: str
-    alter: int
-    octave: int
+# 綴りを持たない入力(MIDIノート番号・仮想ルート等)に使う既定の綴り: ピッチクラス -> (step, alter)
+DEFAULT_SPELLING = {0:('C',0), 1:('C',1), 2:('D',0), 3:('E',-1), 4:('E',0), 5:('F',0), 6:('F',1), 7:('G',0), 8:('A',-1), 9:('A',0), 10:('B',-1), 11:('B',0)}
 
-    def __post_init__(self):
-        self.step = self.step.upper()
+class Note:
+    """
+    音名1つ。音名・変化記号・オクターブを小さな整数で持ち、
+    探索の内側で頻繁に読むピッチクラスと絶対半音値は生成時（と音名・変化記号・オクターブの変更時）に計算しておく。
+    step / alter / octave は以前の dataclass のフィールドと同じく読み書きできる。
+    dataclass ではないので dataclasses.replace / asdict は使えない（Note(step, alter, octave) で作り直す）。
+    """
+    __slots__ = ('step_index', 'alter', '_octave', 'pitch_class', 'absolute_semitone')
 
     STEP_TO_SEMITONE = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
     STEP_TO_INDEX = {'C': 0, 'D': 1, 'E': 2, 'F': 3, 'G': 4, 'A': 5, 'B': 6}
+    INDEX_TO_STEP = "CDEFGAB"
+    INDEX_TO_SEMITONE = (0, 2, 4, 5, 7, 9, 11)
+
+    def __init__(self, step: str, alter: int, octave: int):
+        step_index = self.STEP_TO_INDEX.get(step.upper())
+        if step_index is None:
+            raise ValueError(f"Invalid step: '{step}'")
+        self._set(step_index, alter, octave)
+
+    @classmethod
+    def from_index(cls, step_index: int, alter: int, octave: int) -> 'Note':
+        """音名インデックス(C=0 ... B=6)から直接作る（文字列を経由しない）"""
+        note = cls.__new__(cls)
+        note._set(step_index, alter, octave)
+        return note
+
+    def _set(self, step_index: int, alter: int, octave: int):
+        # __setattr__ を経由せずにスロットへ直接書き込む（生成は探索の内側でも行うため）
+        in_octave = self.INDEX_TO_SEMITONE[step_index] + alter
+        _STEP_INDEX_SLOT(self, step_index)
+        _ALTER_SLOT(self, alter)
+        _OCTAVE_SLOT(self, octave)
+        _PITCH_CLASS_SLOT(self, in_octave % 12)
+        _ABSOLUTE_SEMITONE_SLOT(self, in_octave + octave * 12)
+
+    def __setattr__(self, name: str, value):
+        # 音名・変化記号を書き換えたら、ピッチクラスと絶対半音値も計算し直す（読み出しは速いスロットのまま）
+        if name == 'step_index' or name == 'alter':
+            object.__setattr__(self, name, value)
+            self._set(self.step_index, self.alter, self._octave)
+        elif name == 'pitch_class' or name == 'absolute_semitone':
+            raise AttributeError(f"'{name}' is computed from step_index, alter and octave")
+        else:
+            object.__setattr__(self, name, value)
+
+    def __reduce__(self):
+        return Note.from_index, (self.step_index, self.alter, self._octave)
+
+    @property
+    def step(self) -> str:
+        return self.INDEX_TO_STEP[self.step_index]
+
+    @step.setter
+    def step(self, step: str):
+        step_index = self.STEP_TO_INDEX.get(step.upper())
+        if step_index is None:
+            raise ValueError(f"Invalid step: '{step}'")
+        self.step_index = step_index
 
     @property
-    def pitch_class(self) -> int:
-        return (self.STEP_TO_SEMITONE[self.step] + self.alter) % 12
+    def octave(self) -> int:
+        return self._octave
+
+    @octave.setter
+    def octave(self, octave: int):
+        self._set(self.step_index, self.alter, octave)
 
     @property
-    def absolute_semitone(self) -> int:
-        base = self.STEP_TO_SEMITONE[self.step]
-        return base + self.alter + (self.octave * 12)
+    def midi_number(self) -> int:
+        # C4 = 60 (absolute_semitone は C0 = 0 基準なので 12 ずれる)
+        return self.absolute_semitone + 12
 
     @property
-    def step_index(self) -> int:
-        return self.STEP_TO_INDEX[self.step]
+    def pitch_name(self) -> str:
+        """オクターブを含まない表示名（ダブルシャープ・ダブルフラットは変化記号を省略する）"""
+        alter_str = "#" if self.alter == 1 else "b" if self.alter == -1 else ""
+        return f"{self.step}{alter_str}"
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.step_index, self.alter, self._octave) == (other.step_index, other.alter, other._octave)
+
+    __hash__ = None  # octave を変更できるためハッシュ不可（dataclass と同じ扱い）
+
+    def __repr__(self):
+        return f"Note(step='{self.step}', alter={self.alter}, octave={self.octave})"
 
     def __str__(self):
         alter_str = ""
@@ -37,28 +102,89 @@ class Note:
 
     @classmethod
     def from_string(cls, note_str: str, default_octave: Optional[int] = None) -> 'Note':
-        match = re.match(r"^([a-gA-G])([#bx]*)(-?\d+)?$", note_str.strip())
-        if not match: raise ValueError(f"Invalid format: '{note_str}'")
-        step_str, alter_str, octave_str = match.groups()
-        alter = {'': 0, '#': 1, 'b': -1, 'bb': -2, 'x': 2}.get(alter_str.lower(), 0)
-        octave = int(octave_str) if octave_str is not None else default_octave
-        if octave is None: octave = 4 
-        return cls(step=step_str, alter=alter, octave=octave)
+        parsed = _scan_note(note_str.strip())
+        if parsed is None: raise ValueError(f"Invalid format: '{note_str}'")
+        step_index, alter, octave = parsed
+        if octave is None: octave = default_octave
+        if octave is None: octave = 4
+        return cls.from_index(step_index, alter, octave)
 
-def parse_notes(notes_csv: str, start_octave: int = 4) -> List[Note]:
-    note_strs = [s.strip() for s in notes_csv.split(",")]
-    notes = []
+    @classmethod
+    def from_midi(cls, midi_number: int, alter: Optional[int] = None) -> 'Note':
+        """MIDIノート番号から Note を作る。alter 未指定なら DEFAULT_SPELLING で綴る"""
+        if alter is None:
+            step, alter = DEFAULT_SPELLING[midi_number % 12]
+        else:
+            natural = (midi_number - alter) % 12
+            step = next((s for s, semi in cls.STEP_TO_SEMITONE.items() if semi == natural), None)
+            if step is None:
+                raise ValueError(f"Invalid spelling: alter {alter} for MIDI note {midi_number}")
+        octave = (midi_number - 12 - alter - cls.STEP_TO_SEMITONE[step]) // 12
+        return cls(step=step, alter=alter, octave=octave)
+
+_STEP_INDEX_SLOT = Note.step_index.__set__
+_ALTER_SLOT = Note.alter.__set__
+_OCTAVE_SLOT = Note._octave.__set__
+_PITCH_CLASS_SLOT = Note.pitch_class.__set__
+_ABSOLUTE_SEMITONE_SLOT = Note.absolute_semitone.__set__
+
+# 音名1文字 -> 音名インデックス（小文字も受け付ける）
+_STEP_CHARS = {step: index for index, step in enumerate("CDEFGAB")}
+_STEP_CHARS.update({step.lower(): index for step, index in list(_STEP_CHARS.items())})
+# 変化記号の並び -> alter（'##' のような一覧に無い並びは 0 として扱う）
+_ALTER_VALUES = {'': 0, '#': 1, 'b': -1, 'bb': -2, 'x': 2}
+
+def _scan_note(token: str) -> Optional[Tuple[int, int, Optional[int]]]:
+    """
+    "Eb4" のような1音を (音名インデックス, alter, オクターブ) に分解する（オクターブ省略時は None）。
+    書式は 音名[a-gA-G] + 変化記号[#bx]* + 任意のオクターブ(-?数字+)。不正なら None。
+    """
+    n = len(token)
+    if n == 0:
+        return None
+    step_index = _STEP_CHARS.get(token[0])
+    if step_index is None:
+        return None
+    i = 1
+    while i < n and token[i] in "#bx":
+        i += 1
+    alter = _ALTER_VALUES.get(token[1:i], 0)
+    if i == n:
+        return step_index, alter, None
+    # isdecimal は正規表現の \d と同じく Unicode の数字も受け付ける（int() もそれを解釈できる）
+    digits = token[i + 1:] if token[i] == '-' else token[i:]
+    if not digits.isdecimal():
+        return None
+    return step_index, alter, int(token[i:])
+
+def _scan_notes(notes_csv: str, start_octave: int) -> Iterator[Tuple[int, int, int]]:
+    """
+    カンマ区切りの音名リストを (音名インデックス, alter, オクターブ) の列に変換する。
+    オクターブを省略した音は直前の音のオクターブを引き継ぎ、ピッチクラスが直前の音より下がったら1オクターブ上げる。
+    """
     current_octave = start_octave
     last_pc = -1
-    for n_str in note_strs:
-        temp_note = Note.from_string(n_str, default_octave=None)
-        if re.search(r"-?\d+$", n_str) is None:
-            if temp_note.pitch_class < last_pc:
+    semitones = Note.INDEX_TO_SEMITONE
+    for token in notes_csv.split(","):
+        token = token.strip()
+        parsed = _scan_note(token)
+        if parsed is None:
+            raise ValueError(f"Invalid format: '{token}'")
+        step_index, alter, octave = parsed
+        pitch_class = (semitones[step_index] + alter) % 12
+        if octave is None:
+            if pitch_class < last_pc:
                 current_octave += 1
-            temp_note.octave = current_octave
-            last_pc = temp_note.pitch_class
+            octave = current_octave
         else:
-            current_octave = temp_note.octave
-            last_pc = temp_note.pitch_class
-        notes.append(temp_note)
-    return notes
\ No newline at end of file
+            current_octave = octave
+        last_pc = pitch_class
+        yield step_index, alter, octave
+
+def parse_notes(notes_csv: str, start_octave: int = 4) -> List[Note]:
+    from_index = Note.from_index
+    return [from_index(step_index, alter, octave) for step_index, alter, octave in _scan_notes(notes_csv, start_octave)]
+
+def parse_note_tuples(notes_csv: str, start_octave: int = 4) -> List[Tuple[int, int, int]]:
+    """parse_notes と同じ規則で、Note を作らずに (音名インデックス, alter, オクターブ) のリストを返す"""
+    return list(_scan_notes(notes_csv, start_octave))
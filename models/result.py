@@ -0,0 +1,181 @@
+from dataclasses import dataclass, field
+from operator import attrgetter
+from typing import Dict, List, Optional, Tuple
+from models.note import Note
+
+# 出力時のカテゴリ順（この順でテキストに並ぶ）
+CATEGORIES = [
+    "基本形 (Root Position)",
+    "転回形 (Inversion)",
+    "オンコード (On-Chord)",
+    "ルートレス (Rootless)",
+    "特殊形 (Special)",
+]
+
+@dataclass(slots=True, frozen=True)
+class ChordCandidate:
+    """
+    1つのコード解釈。表示名は保持せず、name / label を参照したときに組み立てる。
+    kind: "dict"(辞書一致) / "omit5"(5度省略) / "rootless" / "ust" / "poly"(音域で分けたポリコード)
+          / "generated"(ルールベース生成)
+    解析キャッシュと共有されるため不変（変更は dataclasses.replace で行う）。
+    """
+    category: str
+    score: int
+    kind: str
+    root_pc: int
+    root_name: str
+    quality: str
+    bass_name: str
+    voicing_type: str
+    is_root_position: bool = False
+    # UST の上部構造（例: ルート "F#" + 種類 "Minor"）
+    upper_root_pc: int = -1
+    upper_root_name: str = ""
+    upper_quality: str = ""
+
+    @property
+    def upper(self) -> str:
+        """上部構造のコード名（メジャーは種類を省略する）"""
+        if not self.upper_root_name:
+            return ""
+        if self.upper_quality == "Major":
+            return self.upper_root_name
+        return f"{self.upper_root_name} {self.upper_quality}"
+
+    @property
+    def name(self) -> str:
+        """ボイシング種別などの注記を含まないコード名"""
+        if self.kind == "ust":
+            return f"{self.upper} / {self.root_name}{self.quality}"
+        if self.kind == "poly":
+            lower = self.root_name if self.quality == "Major" else f"{self.root_name} {self.quality}"
+            return f"{self.upper} | {lower}"
+        if self.kind == "rootless":
+            return f"{self.root_name} {self.quality}(Rootless) / {self.bass_name}"
+        if self.kind == "dict" and self.category == "特殊形 (Special)":
+            return f"{self.quality} on {self.bass_name}"
+        if self.is_root_position:
+            return f"{self.root_name} {self.quality}"
+        return f"{self.root_name} {self.quality} / {self.bass_name}"
+
+    @property
+    def label(self) -> str:
+        """テキスト出力に使う表示名"""
+        if self.kind == "ust":
+            return f"{self.name} (UST) ({self.voicing_type})"
+        if self.kind == "poly":
+            return f"{self.name} (Poly) ({self.voicing_type})"
+        if self.kind == "generated":
+            return f"{self.name} ({self.voicing_type}) [生成]"
+        return f"{self.name} ({self.voicing_type})"
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name, "root_pc": self.root_pc, "root": self.root_name,
+            "quality": self.quality, "category": self.category, "score": self.score,
+            "kind": self.kind, "voicing": self.voicing_type, "upper": self.upper,
+        }
+
+@dataclass(slots=True)
+class AnalysisResult:
+    """
+    ChordAnalyzer の解析結果。文字列への整形は to_text() を呼んだときだけ行う。
+    候補は CandidateCollector で集めるので、同じカテゴリに同じ名前の候補は2つ入らない。
+    """
+    notes: List[Note]
+    bass_name: str
+    voicing_type: str
+    candidates: Dict[str, List[ChordCandidate]] = field(default_factory=lambda: {c: [] for c in CATEGORIES})
+
+    def all_candidates(self) -> List[ChordCandidate]:
+        """カテゴリ順・追加順に並べた全候補"""
+        return [c for results in self.candidates.values() for c in results]
+
+    def ranked(self, threshold: int = 10) -> List[ChordCandidate]:
+        """閾値以上の候補をスコア順に並べる（同点はカテゴリ順・追加順）"""
+        return sorted((r for r in self.all_candidates() if r.score >= threshold), key=attrgetter("score"), reverse=True)
+
+    def keep_top(self, k: int, threshold: int = 10):
+        """ranked() の上位 k 件だけを残し、それ以外の候補を捨てる（カテゴリ内の順序は保つ）"""
+        kept = {id(c) for c in self.ranked(threshold)[:k]}
+        for category, results in self.candidates.items():
+            if results:
+                self.candidates[category] = [c for c in results if id(c) in kept]
+
+    def best(self, threshold: int = 10) -> Optional[ChordCandidate]:
+        ranked = self.ranked(threshold)
+        return ranked[0] if ranked else None
+
+    def to_dict(self, threshold: int = 10) -> dict:
+        return {
+            "notes": [str(n) for n in self.notes],
+            "bass": self.bass_name,
+            "voicing": self.voicing_type,
+            "candidates": [c.to_dict() for c in self.ranked(threshold)],
+        }
+
+    def to_text(self, threshold: int = 10) -> str:
+        if not self.notes:
+            return "No notes"
+
+        notes_str = ", ".join(str(n) for n in self.notes)
+        output_lines = [f"Input: [{notes_str}] (Bass: {self.bass_name})", "-"*40]
+
+        has_results = False
+        for category, results in self.candidates.items():
+            filtered_results = sorted([r for r in results if r.score >= threshold], key=lambda x: x.score, reverse=True)
+
+            if filtered_results:
+                has_results = True
+                output_lines.append(f"■ {category}")
+                for res in filtered_results:
+                    output_lines.append(f"  - {res.label} [Score: {res.score}]")
+
+        if not has_results:
+            output_lines.append(f"Analyzed: Unknown (No interpretation scored above {threshold})")
+
+        output_lines.append("-" * 40)
+        return "\n".join(output_lines)
+
+    def __str__(self) -> str:
+        return self.to_text()
+
+class CandidateCollector:
+    """
+    探索フェーズが候補を追加する先（1回の解析の全フェーズで1つを共有する）。
+    同じカテゴリで同じ名前(name)の解釈は1つにまとめ、スコアが高い方を最初に追加された位置に残す。
+    カテゴリが違えば同じ名前でも別の候補として残し、カテゴリをまたいだ順位は AnalysisResult.ranked の規則
+    （スコア順、同点はカテゴリ順・追加順）で決まる。重複判定は (カテゴリ, 名前) -> 位置 の辞書で行う。
+    位置を覚えているので、集め終わるまでは result.candidates のリストを直接書き換えないこと。
+    """
+    __slots__ = ("candidates", "_positions")
+
+    def __init__(self, result: AnalysisResult):
+        self.candidates = result.candidates
+        self._positions: Dict[Tuple[str, str], int] = {}
+
+    def add(self, candidate: ChordCandidate) -> bool:
+        """候補を追加する。同じ解釈が既にあり、そのスコア以下なら追加せず False を返す"""
+        key = (candidate.category, candidate.name)
+        results = self.candidates[candidate.category]
+        position = self._positions.get(key)
+        if position is None:
+            self._positions[key] = len(results)
+            results.append(candidate)
+            return True
+        if candidate.score > results[position].score:
+            results[position] = candidate
+            return True
+        return False
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        """(カテゴリ, 名前) の解釈が既にあるか"""
+        return key in self._positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def keys(self) -> List[Tuple[str, str]]:
+        """追加された順の (カテゴリ, 名前)"""
+        return list(self._positions)
@@ -0,0 +1,74 @@
+import random
+import unittest
+from engine.analyzer import ChordAnalyzer
+from models.note import Note, parse_notes
+from utils.interval_calc import add_interval
+
+def _transpose(notes, steps: int, semitones: int):
+    """音名を steps、音高を semitones だけずらす（ダブルシャープ・ダブルフラットになるなら None）"""
+    moved = []
+    for n in notes:
+        step_index = n.step_index + steps
+        octave = n.octave + step_index // 7
+        step_index %= 7
+        alter = n.absolute_semitone + semitones - Note.INDEX_TO_SEMITONE[step_index] - octave * 12
+        if not -1 <= alter <= 1:
+            return None
+        moved.append(Note.from_index(step_index, alter, octave))
+    return moved
+
+class AnalysisCacheTest(unittest.TestCase):
+    """移調した同じ形のボイシングで、キャッシュから作った結果がキャッシュなしの解析と一致する"""
+
+    def assert_same_as_uncached(self, cached: ChordAnalyzer, notes):
+        fresh = ChordAnalyzer(cache_size=0)
+        self.assertEqual(cached.analyze(notes), fresh.analyze(notes), ", ".join(map(str, notes)))
+
+    def test_polychord_lower_root_spelling(self):
+        analyzer = ChordAnalyzer()
+        analyzer.analyze(parse_notes("Bb2, D3, F3, F#4, A#4, C#5"))
+        self.assert_same_as_uncached(analyzer, parse_notes("C3, E3, G3, G#4, B#4, D#5"))
+        self.assertEqual(analyzer.cache_info().hits, 1)
+
+    def test_transposed_polychords(self):
+        analyzer = ChordAnalyzer()
+        for root in ("C", "Db", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B", "C#", "G#", "A#"):
+            lower = Note.from_string(root + "3")
+            for upper_interval in ("M2", "M3", "A4", "A5", "m6"):
+                upper = add_interval(Note.from_index(lower.step_index, lower.alter, 4), upper_interval)
+                for third in ("M3", "m3"):
+                    notes = [lower, add_interval(lower, third), add_interval(lower, "P5"),
+                             upper, add_interval(upper, "M3"), add_interval(upper, "P5")]
+                    with self.subTest(notes=", ".join(map(str, notes))):
+                        self.assert_same_as_uncached(analyzer, notes)
+
+    def test_transposed_random_voicings(self):
+        rng = random.Random(7)
+        names = [step + alter for step in "CDEFGAB" for alter in ("", "#", "b")]
+        analyzer = ChordAnalyzer()
+        for _ in range(150):
+            notes = [Note.from_string(rng.choice(names) + str(rng.randint(2, 5))) for _ in range(rng.randint(3, 7))]
+            for steps, semitones in ((0, 0), (1, 2), (2, 3), (3, 6), (4, 7), (6, 10)):
+                moved = _transpose(notes, steps, semitones)
+                if moved is not None:
+                    self.assert_same_as_uncached(analyzer, moved)
+        self.assertGreater(analyzer.cache_info().hits, 0)
+
+    def test_pitches(self):
+        rng = random.Random(11)
+        cached, fresh = ChordAnalyzer(), ChordAnalyzer(cache_size=0)
+        voicings = [sorted(rng.sample(range(36, 90), rng.randint(2, 7))) for _ in range(100)]
+        for _ in range(2):
+            for pitches in voicings:
+                for shift in (0, 12):
+                    for top_k in (None, 2):
+                        moved = [p + shift for p in pitches]
+                        with self.subTest(pitches=moved, top_k=top_k):
+                            self.assertEqual(cached.analyze_pitches(moved, top_k=top_k).to_dict(10),
+                                             fresh.analyze_pitches(moved, top_k=top_k).to_dict(10))
+        info = cached.cache_info()
+        self.assertEqual(info.misses, len({(p[0] % 12, tuple(x - p[0] for x in p)) for p in voicings}))
+        self.assertGreater(info.hits, info.misses)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from engine.analyzer import ChordAnalyzer
+from models.result import ChordCandidate
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+@unittest.skipIf(np is None, "NumPy が必要")
+class AnalyzeBatchTest(unittest.TestCase):
+
+    def test_unspelled_rows_are_analyzed_from_pitches(self):
+        result = ChordAnalyzer().analyze_batch([[61, 65, 68], [63, 66, 70], [66, 70, 73], [61, 65, 68]])
+        self.assertEqual(list(result['root_pc']), [1, 3, 6, 1])
+        self.assertEqual(list(result['quality']), ["Major", "Minor", "Major", "Major"])
+
+    def test_root_position_rows_match_per_row_analysis(self):
+        # 重複・オクターブ違いを含む基本形（表引きで決まる）と、探索が必要な行を混ぜる
+        rows = [[61, 65, 68, 73], [48, 64, 79, -1], [54, 58, 61, 66], [60, 64, 67, 71], [64, 67, 72, -1], [62, -1, -1, -1]]
+        result = ChordAnalyzer().analyze_batch(rows)
+        for row, got in zip(rows, result):
+            best = ChordAnalyzer(cache_size=0).analyze_pitches([p for p in row if p >= 0], top_k=1).best()
+            expected = ("", -1) if best is None else (best.label, best.root_pc)
+            self.assertEqual((got['name'], got['root_pc']), expected, row)
+
+    def test_added_phase_can_outscore_root_position(self):
+        analyzer = ChordAnalyzer()
+        analyzer.add_phase("custom", lambda ctx: ctx.collector.add(
+            ChordCandidate("特殊形 (Special)", 90, "dict", 0, "C", "Custom", ctx.bass_name, ctx.voicing_type)))
+        self.assertEqual(list(analyzer.analyze_batch([[61, 65, 68]])['quality']), ["Custom"])
+
+    def test_spellings(self):
+        analyzer = ChordAnalyzer()
+        self.assertEqual(analyzer.analyze_batch([[61, 65, 68]], spellings=[[-1, 0, -1]])[0]['root'], "Db")
+        with self.assertRaises(ValueError):
+            analyzer.analyze_batch([[61, 65, 68]], spellings=[[0, 0, 0]])
+
+if __name__ == "__main__":
+    unittest.main()
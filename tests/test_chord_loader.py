@@ -0,0 +1,24 @@
+import unittest
+from engine.analyzer import ChordAnalyzer
+from dictionaries.chord_loader import parse_chord_definitions, validate_intervals
+
+class ChordLoaderTest(unittest.TestCase):
+
+    def test_definitions(self):
+        additions, removals = parse_chord_definitions({"chords": {"Maj7#11": ["P1", "M3", "P5", "M7", "A11"]}, "remove": ["5"]})
+        self.assertEqual(additions, {frozenset(["P1", "M3", "P5", "M7", "A11"]): "Maj7#11"})
+        self.assertEqual(removals, ["5"])
+
+    def test_malformed_intervals_raise_value_error(self):
+        for intervals in (None, 5, 1.5, True, "P1", {"P1": 1}, ["P1", 3], ["P1", "X9"], ["M3", "P5"]):
+            with self.subTest(intervals=intervals), self.assertRaises(ValueError):
+                parse_chord_definitions({"chords": {"bad": intervals}})
+
+    def test_sets_are_accepted(self):
+        self.assertEqual(validate_intervals(("P1", "M3")), frozenset(["P1", "M3"]))
+        analyzer = ChordAnalyzer(cache_size=0)
+        analyzer.register_chord(frozenset(["P1", "M3", "A5", "M7"]), "Maj7#5")
+        self.assertEqual(analyzer.unregister_chord({"P1", "M3", "A5", "M7"}), "Maj7#5")
+
+if __name__ == "__main__":
+    unittest.main()
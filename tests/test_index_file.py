@@ -0,0 +1,54 @@
+import os
+import random
+import tempfile
+import unittest
+from dictionaries.chord_dict import CHORD_DICT
+from engine.analyzer import ChordAnalyzer
+from engine.chord_index import ChordIndex, PC_MASK_SIZE
+from engine.index_file import load_index, write_index
+from models.note import Note
+
+class MappedChordIndexTest(unittest.TestCase):
+    """書き出して mmap で読み込んだ索引が、メモリ上の ChordIndex と同じ表・同じ解析結果になる"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "chord_index.bin")
+        cls.index = ChordIndex(CHORD_DICT)
+        write_index(cls.index, cls.path)
+        cls.mapped = load_index(cls.path, CHORD_DICT)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.mapped = None
+        cls.directory.cleanup()
+
+    def test_tables(self):
+        self.assertEqual(self.mapped.qualities, self.index.qualities)
+        self.assertEqual(self.mapped.chord_dictionary, self.index.chord_dictionary)
+        for mask in range(PC_MASK_SIZE):
+            self.assertEqual(self.mapped.exact[mask], self.index.exact[mask])
+            self.assertEqual(self.mapped.omit5[mask], self.index.omit5[mask])
+            self.assertEqual(self.mapped.rootless[mask], self.index.rootless[mask])
+            self.assertEqual(self.mapped.rotations[mask], self.index.rotations[mask])
+            self.assertEqual(self.mapped.may_match(mask), self.index.may_match(mask))
+
+    def test_analysis(self):
+        rng = random.Random(3)
+        names = [step + alter for step in "CDEFGAB" for alter in ("", "#", "b")]
+        in_memory, mapped = ChordAnalyzer(cache_size=0, index=self.index), ChordAnalyzer(cache_size=0, index=self.mapped)
+        for _ in range(300):
+            notes = [Note.from_string(rng.choice(names) + str(rng.randint(2, 5))) for _ in range(rng.randint(2, 7))]
+            self.assertEqual(mapped.analyze(notes), in_memory.analyze(notes), ", ".join(map(str, notes)))
+            pitches = [n.midi_number for n in notes]
+            self.assertEqual(mapped.analyze_pitches(pitches).to_dict(), in_memory.analyze_pitches(pitches).to_dict())
+
+    def test_stale_file(self):
+        edited = dict(CHORD_DICT)
+        edited[frozenset({"P1", "M2", "P5"})] = "Test"
+        with self.assertRaisesRegex(ValueError, "stale"):
+            load_index(self.path, edited)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import struct
+import unittest
+from engine.analyzer import ChordAnalyzer
+from engine.streaming import StreamingChordAnalyzer
+from utils.midi_file import parse_midi_bytes
+
+def _track_bytes(events) -> bytes:
+    return b"".join(bytes([delta]) + event for delta, event in events)
+
+def _smf(*tracks: bytes, division: int = 480) -> bytes:
+    chunks = b"".join(b"MTrk" + struct.pack(">I", len(t)) + t for t in tracks)
+    return b"MThd" + struct.pack(">IHHH", 6, 1, len(tracks), division) + chunks
+
+# Db / F / Ab を 480 tick 鳴らす（2音目以降はランニングステータス）
+DB_MAJOR_EVENTS = [
+    (0, b"\xff\x51\x03\x07\xa1\x20"),
+    (0, bytes([0x90, 61, 100])), (0, bytes([65, 100])), (0, bytes([68, 100])),
+    (0x60, bytes([0x80, 61, 0])), (0, bytes([0x80, 65, 0])), (0, bytes([0x80, 68, 0])),
+    (0, b"\xff\x2f\x00"),
+]
+DB_MAJOR = _track_bytes(DB_MAJOR_EVENTS)
+
+class ParseMidiBytesTest(unittest.TestCase):
+
+    def test_events(self):
+        events = parse_midi_bytes(_smf(DB_MAJOR))
+        self.assertEqual([(e.kind, e.note) for e in events[:3]], [("on", 61), ("on", 65), ("on", 68)])
+        self.assertEqual(len(events), 6)
+
+    def test_truncated_track(self):
+        # イベントの途中で切れたトラックは ValueError になる（IndexError にしない）
+        boundaries = {len(_track_bytes(DB_MAJOR_EVENTS[:i])) for i in range(len(DB_MAJOR_EVENTS) + 1)}
+        for cut in sorted(set(range(1, len(DB_MAJOR))) - boundaries):
+            with self.subTest(cut=cut), self.assertRaisesRegex(ValueError, "truncated|Truncated"):
+                parse_midi_bytes(_smf(DB_MAJOR[:cut]))
+
+    def test_truncated_header(self):
+        with self.assertRaises(ValueError):
+            parse_midi_bytes(_smf(DB_MAJOR)[:10])
+
+    def test_invalid_division(self):
+        for division in (0, 0xE700):  # 0 tick / 4分音符、SMPTE 25fps で 0 tick / フレーム
+            with self.subTest(division=division), self.assertRaisesRegex(ValueError, "division"):
+                parse_midi_bytes(_smf(DB_MAJOR, division=division))
+        self.assertEqual(len(parse_midi_bytes(_smf(DB_MAJOR, division=0xE728))), 6)
+
+class StreamingChordAnalyzerTest(unittest.TestCase):
+
+    def test_flat_spelled_chord(self):
+        changes = list(StreamingChordAnalyzer().process(parse_midi_bytes(_smf(DB_MAJOR))))
+        self.assertEqual(changes[0].best.label, "Db Major (Closed)")
+        self.assertEqual([str(n) for n in changes[0].notes], ["Db4", "F4", "Ab4"])
+        self.assertIsNone(changes[-1].best)
+
+    def test_repeated_chords_reuse_the_analysis_cache(self):
+        analyzer = ChordAnalyzer()
+        # 4回弾く（2回目以降は休符を挟む）
+        repeat = [(0x30, DB_MAJOR_EVENTS[1][1])] + DB_MAJOR_EVENTS[2:-1]
+        track = _track_bytes(DB_MAJOR_EVENTS[:-1] + repeat * 3 + DB_MAJOR_EVENTS[-1:])
+        changes = list(StreamingChordAnalyzer(analyzer).process(parse_midi_bytes(_smf(track))))
+        self.assertEqual([c.best.label if c.best else None for c in changes], ["Db Major (Closed)", None] * 4)
+        self.assertEqual(analyzer.cache_info().misses, 1)
+        self.assertEqual(analyzer.cache_info().hits, 3)
+
+if __name__ == "__main__":
+    unittest.main()
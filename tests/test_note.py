@@ -0,0 +1,40 @@
+import copy
+import pickle
+import unittest
+from models.note import Note
+
+class NoteTest(unittest.TestCase):
+
+    def test_derived_fields_follow_spelling_changes(self):
+        note = Note.from_string("C4")
+        note.alter = 1
+        self.assertEqual((note.pitch_class, note.absolute_semitone, note.midi_number), (1, 49, 61))
+        note.step_index = Note.STEP_TO_INDEX["E"]
+        note.alter = -1
+        self.assertEqual((str(note), note.pitch_class, note.absolute_semitone), ("Eb4", 3, 51))
+        note.octave = 2
+        self.assertEqual((str(note), note.absolute_semitone), ("Eb2", 27))
+
+    def test_step_setter(self):
+        note = Note.from_string("Bb3")
+        note.step = "e"
+        self.assertEqual((str(note), note.step_index, note.pitch_class, note.absolute_semitone), ("Eb3", 2, 3, 39))
+        with self.assertRaises(ValueError):
+            note.step = "H"
+        self.assertEqual(str(note), "Eb3")
+
+    def test_derived_fields_are_read_only(self):
+        note = Note.from_string("C4")
+        with self.assertRaises(AttributeError):
+            note.pitch_class = 3
+        with self.assertRaises(AttributeError):
+            note.absolute_semitone = 0
+
+    def test_copy_and_pickle(self):
+        note = Note.from_string("F#3")
+        for other in (copy.copy(note), copy.deepcopy(note), pickle.loads(pickle.dumps(note))):
+            self.assertEqual(other, note)
+            self.assertEqual((other.pitch_class, other.absolute_semitone), (6, 42))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import unittest
+from engine.analyzer import ChordAnalyzer
+from engine.corpus import analyze_record
+from engine.server import AnalysisService, start_servers
+
+async def _post(port: int, path: str, payload) -> tuple:
+    """HTTP/1.1 の POST を1回送り、(ステータス, JSON) を返す"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    data = await reader.readexactly(int(headers["content-length"]))
+    writer.close()
+    return status, json.loads(data)
+
+class ServerRoundTripTest(unittest.IsolatedAsyncioTestCase):
+    """HTTP / TCP で送った和音の応答が、同じ行を analyze_record で解析した結果と一致する"""
+
+    LINES = ["C4, E4, G4", "D3, F3, A3, C4", "E3, Bb3, C4, D4, G4", "C4, X"]
+
+    async def asyncSetUp(self):
+        self.service = AnalysisService()
+        self.servers = await start_servers(self.service, "127.0.0.1", 0, 0)
+        self.http_port, self.tcp_port = (s.sockets[0].getsockname()[1] for s in self.servers)
+        analyzer = ChordAnalyzer(cache_size=0)
+        self.expected = [analyze_record(analyzer, line, 10) for line in self.LINES]
+
+    async def asyncTearDown(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.service.close()
+
+    async def test_http(self):
+        self.assertEqual(await _post(self.http_port, "/analyze", {"notes": self.LINES[0]}), (200, self.expected[0]))
+        self.assertEqual(await _post(self.http_port, "/analyze", {"notes": ["C4", "E4", "G4"]}), (200, self.expected[0]))
+        self.assertEqual(await _post(self.http_port, "/analyze", {"chords": self.LINES}), (200, {"results": self.expected}))
+        self.assertEqual((await _post(self.http_port, "/analyze", {"notes": 1}))[0], 400)
+
+    async def test_chord_definitions(self):
+        status, body = await _post(self.http_port, "/chords", {"chords": {"Test": ["P1", "M2", "P5"]}})
+        self.assertEqual((status, body["registered"]), (200, 1))
+        status, body = await _post(self.http_port, "/analyze", {"notes": "C4, D4, G4"})
+        self.assertEqual(body["candidates"][0]["quality"], "Test")
+
+    async def test_tcp_pipelined(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.tcp_port)
+        writer.write(("\n".join(self.LINES * 3) + "\n").encode("utf-8"))
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in range(len(self.LINES) * 3)]
+        writer.close()
+        self.assertEqual(responses, self.expected * 3)
+        # 同じ時間窓に届いた要求はまとめて解析する
+        self.assertLess(self.service.batches, len(responses))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import random
+import unittest
+from engine.analyzer import ChordAnalyzer
+from models.note import Note
+
+class TopKTest(unittest.TestCase):
+    """top_k を指定した結果が、全候補の ranked() の先頭 k 件と一致する（キャッシュの有無によらない）"""
+
+    def test_matches_ranked_prefix(self):
+        rng = random.Random(13)
+        names = [step + alter for step in "CDEFGAB" for alter in ("", "#", "b")]
+        full = ChordAnalyzer(cache_size=0)
+        analyzers = (ChordAnalyzer(cache_size=0), ChordAnalyzer())
+        for _ in range(300):
+            notes = [Note.from_string(rng.choice(names) + str(rng.randint(2, 5))) for _ in range(rng.randint(2, 7))]
+            pitches = [n.midi_number for n in notes]
+            for threshold in (10, 60):
+                expected = [c.to_dict() for c in full.analyze_result(notes, threshold).ranked(threshold)]
+                expected_pitches = [c.to_dict() for c in full.analyze_pitches(pitches, threshold).ranked(threshold)]
+                for analyzer in analyzers:
+                    for k in (1, 2, 5):
+                        with self.subTest(notes=", ".join(map(str, notes)), threshold=threshold, k=k):
+                            ranked = analyzer.analyze_result(notes, threshold, top_k=k).ranked(threshold)
+                            self.assertEqual([c.to_dict() for c in ranked], expected[:k])
+                            ranked = analyzer.analyze_pitches(pitches, threshold, top_k=k).ranked(threshold)
+                            self.assertEqual([c.to_dict() for c in ranked], expected_pitches[:k])
+
+    def test_rejects_non_positive(self):
+        with self.assertRaises(ValueError):
+            ChordAnalyzer().analyze_result([Note.from_string("C4")], top_k=0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import itertools
+import unittest
+from engine.analyzer import ChordAnalyzer
+from engine.chord_index import is_rootless_quality
+from engine.voicing_search import OMIT5_SUFFIX, ROOTLESS_SUFFIX, VoicingIndex
+
+class VoicingRoundTripTest(unittest.TestCase):
+    """voicings(シンボル) で列挙した音を解析すると、元のシンボルの解釈が候補に入る"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.index = VoicingIndex()
+        cls.analyzer = ChordAnalyzer()
+
+    def assert_round_trip(self, symbol: str, limit: int = 4):
+        parsed = self.index.parse_symbol(symbol)
+        root_pc = self.index.chord_tones(parsed.root_step_index, parsed.root_alter, parsed.quality)[0].pitch_class
+        kind, suffix = ("omit5", OMIT5_SUFFIX) if parsed.omit5 else ("rootless", "") if parsed.rootless else ("dict", "")
+        voicings = list(itertools.islice(self.index.voicings(parsed, "C2", "C6", max_spread=30), limit))
+        self.assertTrue(voicings, symbol)
+        for notes in voicings:
+            candidates = self.analyzer.analyze_result(notes, -10 ** 9).all_candidates()
+            found = [(c.kind, c.root_pc, c.quality) for c in candidates]
+            self.assertIn((kind, root_pc, parsed.quality + suffix), found, f"{symbol}: {', '.join(map(str, notes))}")
+
+    def test_compound_and_simple_intervals_are_distinct(self):
+        self.assertNotEqual(list(map(str, next(self.index.voicings("Csus2", "C3", "C5")))),
+                            list(map(str, next(self.index.voicings("C Quintal(3-note)", "C3", "C5")))))
+        # ルートの C3 の直上の D3 は add9 の9度にならない
+        for notes in self.index.voicings("Cadd9", "C3", "C5", bass="C"):
+            self.assertNotIn("D3", list(map(str, notes)))
+
+    def test_examples(self):
+        for symbol in ("Cadd9", "C9", "Csus2", "C Quintal(3-note)", "Ab It+6", "C6", "C13", "Cm7/Bb", "F#m7b5", "C/E", "G7/F"):
+            with self.subTest(symbol=symbol):
+                self.assert_round_trip(symbol)
+
+    def test_dictionary(self):
+        for quality, intervals in self.index.intervals.items():
+            for root in ("C", "Ab", "F#"):
+                with self.subTest(quality=quality, root=root):
+                    self.assert_round_trip(f"{root} {quality}")
+            # 5度を除いた音程集合が辞書の別のコードと同じなら、解析はそちらに判定する
+            omitted = frozenset(i for i in intervals if i != "P5")
+            if "P5" in intervals and not any(frozenset(i) == omitted for i in self.index.intervals.values()):
+                with self.subTest(quality=quality, omit5=True):
+                    self.assert_round_trip(f"C {quality}{OMIT5_SUFFIX}")
+            if is_rootless_quality(quality):
+                with self.subTest(quality=quality, rootless=True):
+                    self.assert_round_trip(f"D {quality}{ROOTLESS_SUFFIX}")
+
+if __name__ == "__main__":
+    unittest.main()
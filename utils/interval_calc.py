@@ -1,3 +1,5 @@
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Optional
 from models.note import Note
 
 INTERVAL_MAP = {
@@ -10,19 +12,101 @@ INTERVAL_MAP = {
     (6, 10): 'm7', (6, 11): 'M7', (6, 12): 'A7', (6, 9): 'd7'
 }
 
-def get_interval(root: Note, target: Note) -> str:
-    step_diff = (target.step_index - root.step_index) % 7
-    semi_diff = (target.absolute_semitone - root.absolute_semitone) % 12
-    
+# 音程名 -> 半音数(mod 12)。9, 11, 13度などの複合音程も2, 4, 6度と同じピッチクラスになる
+INTERVAL_SEMITONES = {}
+for (_step, _semi), _name in INTERVAL_MAP.items():
+    INTERVAL_SEMITONES[_name] = _semi % 12
+    if int(_name[1:]) in [2, 4, 6]:
+        INTERVAL_SEMITONES[f"{_name[0]}{int(_name[1:]) + 7}"] = _semi % 12
+
+def interval_semitone(interval: str) -> Optional[int]:
+    """音程名をルートからの半音数(mod 12)に変換する。未知の音程はNone"""
+    return INTERVAL_SEMITONES.get(interval)
+
+def _compute_interval_name(step_diff: int, semi_diff: int, is_compound: bool) -> str:
+    """(音名差 mod 7, 半音差 mod 12, 1オクターブ以上離れているか) から音程名を組み立てる"""
     base_interval = INTERVAL_MAP.get((step_diff, semi_diff))
     if not base_interval:
         return f"Unknown({step_diff},{semi_diff})"
-        
-    actual_semi_diff = target.absolute_semitone - root.absolute_semitone
-    quality = base_interval[0] 
-    number = int(base_interval[1:]) 
-    
-    if actual_semi_diff >= 12 and number in [2, 4, 6]:
+
+    quality = base_interval[0]
+    number = int(base_interval[1:])
+
+    if is_compound and number in [2, 4, 6]:
         return f"{quality}{number + 7}"
-        
-    return base_interval
\ No newline at end of file
+
+    return base_interval
+
+# --- 音程ID ---
+# 音程名を小さな整数IDに置き換え、音程の集合は ID のビットマスク（int）で表す。
+# 既知の音程名 -> 複合音程 -> Unknown の順に ID を振るので、通常の和音のマスクは小さな int に収まる。
+INTERVAL_NAMES: List[str] = list(INTERVAL_SEMITONES)
+for _step in range(7):
+    for _semi in range(12):
+        if (_step, _semi) not in INTERVAL_MAP:
+            INTERVAL_NAMES.append(_compute_interval_name(_step, _semi, False))
+INTERVAL_IDS = {name: i for i, name in enumerate(INTERVAL_NAMES)}
+
+# (音名差 mod 7, 半音差 mod 12, 複合フラグ) -> 音程ID の平坦な表
+_INTERVAL_TABLE: List[int] = [
+    INTERVAL_IDS[_compute_interval_name(_step, _semi, bool(_compound))]
+    for _step in range(7) for _semi in range(12) for _compound in range(2)
+]
+
+# 複合音程(9, 11, 13度)を1オクターブ内(2, 4, 6度)に丸めた音程ID
+SIMPLE_INTERVAL_IDS: List[int] = [
+    INTERVAL_IDS[f"{name[0]}{int(name[1:]) - 7}"] if name[1:] in ['9', '11', '13'] else i
+    for i, name in enumerate(INTERVAL_NAMES)
+]
+
+def interval_bit(name: str) -> int:
+    return 1 << INTERVAL_IDS[name]
+
+def interval_id(root_step_index: int, root_semitone: int, target_step_index: int, target_semitone: int) -> int:
+    """音名インデックスと絶対半音値（整数）から音程IDを表引きする。探索の最内ループ用"""
+    actual_semi_diff = target_semitone - root_semitone
+    return _INTERVAL_TABLE[(((target_step_index - root_step_index) % 7) * 12 + actual_semi_diff % 12) * 2 + (actual_semi_diff >= 12)]
+
+def interval_name(root_step_index: int, root_semitone: int, target_step_index: int, target_semitone: int) -> str:
+    """音名インデックスと絶対半音値（整数）から音程名を求める。Note を作らずに済む探索用の入口"""
+    return INTERVAL_NAMES[interval_id(root_step_index, root_semitone, target_step_index, target_semitone)]
+
+def intervals_to_bits(intervals: Iterable[str]) -> int:
+    """音程名の集合を音程IDのビットマスクに変換する（未知の名前は KeyError）"""
+    bits = 0
+    for name in intervals:
+        bits |= 1 << INTERVAL_IDS[name]
+    return bits
+
+@lru_cache(maxsize=4096)
+def bits_to_intervals(bits: int) -> FrozenSet[str]:
+    """音程IDのビットマスクを音程名の集合に戻す"""
+    names = []
+    while bits:
+        lowest = bits & -bits
+        names.append(INTERVAL_NAMES[lowest.bit_length() - 1])
+        bits ^= lowest
+    return frozenset(names)
+
+def get_interval(root: Note, target: Note) -> str:
+    return interval_name(root.step_index, root.absolute_semitone, target.step_index, target.absolute_semitone)
+
+def add_interval(root: Note, interval: str) -> Note:
+    """root から音程 interval だけ上の音を綴る（例: C4 + 'M9' -> D5, Ab3 + 'A6' -> F#4）"""
+    semitone = INTERVAL_SEMITONES.get(interval)
+    if semitone is None:
+        raise ValueError(f"Unknown interval: '{interval}'")
+    number = int(interval[1:])
+    step_offset = number - 1
+    if number >= 9:
+        semitone += 12
+    elif number == 7 and semitone == 0:
+        semitone = 12  # A7 は1オクターブ上と同じ高さ
+    elif number == 1 and semitone == 11:
+        semitone = -1  # d1 はルートより半音下
+    step_index = root.step_index + step_offset
+    octave = root.octave + step_index // 7
+    step_index %= 7
+    target_semitone = root.absolute_semitone + semitone
+    alter = target_semitone - octave * 12 - Note.INDEX_TO_SEMITONE[step_index]
+    return Note.from_index(step_index, alter, octave)
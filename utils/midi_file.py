@@ -0,0 +1,144 @@
+import struct
+from dataclasses import dataclass
+from typing import List, Tuple
+
+DEFAULT_TEMPO = 500000  # 4分音符あたりのマイクロ秒（120 BPM）
+
+# チャンネルメッセージのデータバイト数（上位4bitで決まる）
+CHANNEL_DATA_LENGTH = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+
+@dataclass(slots=True)
+class NoteEvent:
+    """ノートオン / オフ1件。velocity 0 のノートオンはノートオフとして扱う"""
+    time: float     # 秒
+    kind: str       # "on" / "off"
+    note: int       # MIDIノート番号
+    velocity: int = 64
+    channel: int = 0
+    tick: int = 0
+
+def _read_vlq(data: bytes, pos: int) -> Tuple[int, int]:
+    """可変長数値を読み、(値, 次の位置) を返す"""
+    value = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated variable-length quantity")
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+def _parse_track(data: bytes, track_index: int, notes: list, tempos: list):
+    pos = 0
+    tick = 0
+    running_status = None
+    end = len(data)
+    while pos < end:
+        delta, pos = _read_vlq(data, pos)
+        tick += delta
+        if pos >= end:
+            raise ValueError("truncated track")
+        status = data[pos]
+
+        if status == 0xFF:  # メタイベント
+            if pos + 1 >= end:
+                raise ValueError("truncated track")
+            meta_type = data[pos + 1]
+            length, pos = _read_vlq(data, pos + 2)
+            if pos + length > end:
+                raise ValueError("truncated track")
+            if meta_type == 0x51 and length == 3:
+                tempos.append((tick, int.from_bytes(data[pos:pos + 3], "big")))
+            pos += length
+            if meta_type == 0x2F:  # End of Track
+                break
+            continue
+        if status in (0xF0, 0xF7):  # SysEx
+            length, pos = _read_vlq(data, pos + 1)
+            if pos + length > end:
+                raise ValueError("truncated track")
+            pos += length
+            continue
+
+        if status & 0x80:
+            running_status = status
+            pos += 1
+        elif running_status is None:
+            raise ValueError(f"Data byte without status in track {track_index}")
+        status = running_status
+
+        kind = status & 0xF0
+        length = CHANNEL_DATA_LENGTH.get(kind)
+        if length is None:
+            raise ValueError(f"Unsupported status byte 0x{status:02X} in track {track_index}")
+        if pos + length > end:
+            raise ValueError("truncated track")
+        payload = data[pos:pos + length]
+        pos += length
+
+        if kind in (0x80, 0x90):
+            note, velocity = payload[0], payload[1]
+            is_on = kind == 0x90 and velocity > 0
+            # 同じ tick ではノートオフを先に処理する（鍵盤の押し直しを正しく扱うため）
+            notes.append((tick, 1 if is_on else 0, track_index, len(notes),
+                          "on" if is_on else "off", note, velocity, status & 0x0F))
+
+def _ticks_to_seconds(tempos: List[Tuple[int, int]], division: int):
+    """テンポマップから tick -> 秒 の変換関数を作る"""
+    if division & 0x8000:  # SMPTE 形式: 1秒あたりのフレーム数 × 1フレームあたりの tick
+        fps = 256 - (division >> 8)
+        seconds_per_tick = 1.0 / (fps * (division & 0xFF))
+        return lambda tick: tick * seconds_per_tick
+
+    segments = []  # (開始 tick, 開始秒, 1tick あたりの秒)
+    seconds = 0.0
+    last_tick, tempo = 0, DEFAULT_TEMPO
+    for tick, new_tempo in sorted(tempos):
+        seconds += (tick - last_tick) * tempo / 1e6 / division
+        last_tick, tempo = tick, new_tempo
+        segments.append((tick, seconds, tempo / 1e6 / division))
+
+    def convert(tick: int) -> float:
+        start_tick, start_seconds, per_tick = 0, 0.0, DEFAULT_TEMPO / 1e6 / division
+        for seg in segments:
+            if seg[0] > tick:
+                break
+            start_tick, start_seconds, per_tick = seg
+        return start_seconds + (tick - start_tick) * per_tick
+    return convert
+
+def parse_midi_bytes(data: bytes) -> List[NoteEvent]:
+    """Standard MIDI File (format 0/1) のバイト列から、全トラックのノートイベントを時刻順に返す"""
+    if data[:4] != b"MThd":
+        raise ValueError("Not a Standard MIDI File (missing MThd header)")
+    if len(data) < 14:
+        raise ValueError("truncated header")
+    header_length = struct.unpack(">I", data[4:8])[0]
+    _, track_count, division = struct.unpack(">HHH", data[8:14])
+    # 4分音符あたりの tick 数、または SMPTE 形式の1フレームあたりの tick 数が 0 だと時刻に換算できない
+    if division == 0 or (division & 0x8000 and division & 0xFF == 0):
+        raise ValueError(f"Invalid time division: 0x{division:04X}")
+
+    pos = 8 + header_length
+    notes: list = []
+    tempos: list = []
+    track_index = 0
+    while pos + 8 <= len(data) and track_index < track_count:
+        chunk_type = data[pos:pos + 4]
+        length = struct.unpack(">I", data[pos + 4:pos + 8])[0]
+        if chunk_type == b"MTrk":
+            _parse_track(data[pos + 8:pos + 8 + length], track_index, notes, tempos)
+            track_index += 1
+        pos += 8 + length
+
+    to_seconds = _ticks_to_seconds(tempos, division)
+    notes.sort()
+    return [
+        NoteEvent(to_seconds(tick), kind, note, velocity, channel, tick)
+        for tick, _, _, _, kind, note, velocity, channel in notes
+    ]
+
+def read_midi_file(path: str) -> List[NoteEvent]:
+    with open(path, "rb") as f:
+        return parse_midi_bytes(f.read())
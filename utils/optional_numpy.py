@@ -0,0 +1,13 @@
+"""
+NumPy は任意の依存（バッチ解析と粗さの計算でのみ使う）。
+使うモジュールはここから np を取り込み、使う直前に require_numpy で有無を確かめる。
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def require_numpy(feature: str):
+    """NumPy が無ければ、何に必要かを添えて ImportError を送出する"""
+    if np is None:
+        raise ImportError(f"NumPy が必要です: {feature} (pip install numpy)")